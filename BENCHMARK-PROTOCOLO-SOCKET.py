@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark do protocolo dos eventos Socket.IO
+Compara bytes por evento e custo de codificação entre JSON e o protocolo compacto (MessagePack)
+"""
+import os
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.compact_protocol import encode_event
+
+EVENTS_COUNT = 20000
+
+def build_events(rng):
+    """Gerar uma sequência de eventos com a proporção típica de uma live"""
+    start = datetime.utcnow()
+    events = []
+    for i in range(EVENTS_COUNT):
+        timestamp = (start + timedelta(milliseconds=i * 37)).isoformat()
+        kind = rng.random()
+        if kind < 0.35:
+            events.append(('new_message', {
+                'id': 100000 + i,
+                'fake_name': rng.choice(['Zé da Live', 'Moedor Anônimo', 'Fã Número 1', 'Curioso']),
+                'content': 'kkkkk ' * rng.randint(1, 12),
+                'likes': 0,
+                'timestamp': timestamp
+            }))
+        elif kind < 0.75:
+            events.append(('message_liked', {
+                'message_id': 100000 + rng.randrange(i + 1),
+                'likes_count': rng.randint(1, 500)
+            }))
+        elif kind < 0.95:
+            poll_id = rng.randint(1, 20)
+            events.append(('poll_tally', {
+                'poll_id': poll_id,
+                'votes': {str(poll_id * 4 + option): rng.randint(1, 5000) for option in range(4)},
+                'total_votes': rng.randint(5000, 20000)
+            }))
+        else:
+            events.append(('stats_update', {
+                'online_users': rng.randint(1000, 20000),
+                'total_messages': 100000 + i
+            }))
+    return events
+
+def json_packet(event, data):
+    """Pacote de texto que o Socket.IO envia hoje: 42["evento",{...}]"""
+    return ('42' + json.dumps([event, data], separators=(',', ':'))).encode('utf-8')
+
+def compact_packet(event, data):
+    """Pacote binário: cabeçalho 451-["c",{"_placeholder":true,"num":0}] + anexo MessagePack"""
+    header = b'451-["c",{"_placeholder":true,"num":0}]'
+    return header, encode_event(event, data)
+
+def measure(events, encode):
+    start = time.perf_counter()
+    for event, data in events:
+        encode(event, data)
+    return (time.perf_counter() - start) / len(events) * 1e6
+
+def run_benchmark():
+    """Executar benchmark"""
+    rng = random.Random(42)
+    events = build_events(rng)
+
+    json_us = measure(events, json_packet)
+    compact_us = measure(events, compact_packet)
+
+    print("🧪 Benchmark do protocolo dos eventos Socket.IO")
+    print(f"📋 Eventos: {len(events)}")
+    print(f"{'evento':<18}{'JSON (B)':>10}{'compacto (B)':>15}{'anexo (B)':>11}")
+
+    totals = {'json': 0, 'compact': 0, 'attachment': 0}
+    for name in ('new_message', 'message_liked', 'poll_tally', 'stats_update'):
+        sample = [(event, data) for event, data in events if event == name]
+        json_bytes = sum(len(json_packet(event, data)) for event, data in sample)
+        header_bytes = sum(len(compact_packet(event, data)[0]) for event, data in sample)
+        attachment_bytes = sum(len(compact_packet(event, data)[1]) for event, data in sample)
+        totals['json'] += json_bytes
+        totals['compact'] += header_bytes + attachment_bytes
+        totals['attachment'] += attachment_bytes
+        print(f"{name:<18}{json_bytes / len(sample):>10.1f}"
+              f"{(header_bytes + attachment_bytes) / len(sample):>15.1f}{attachment_bytes / len(sample):>11.1f}")
+
+    print(f"📦 Média JSON: {totals['json'] / len(events):.1f} B/evento")
+    print(f"📦 Média compacto: {totals['compact'] / len(events):.1f} B/evento "
+          f"({totals['attachment'] / len(events):.1f} B de anexo)")
+    print(f"📉 Redução: {100 - totals['compact'] / totals['json'] * 100:.0f}% "
+          f"(apenas anexo: {100 - totals['attachment'] / totals['json'] * 100:.0f}%)")
+    print(f"⚙️ Codificação JSON: {json_us:.2f} µs/evento")
+    print(f"⚙️ Codificação compacta: {compact_us:.2f} µs/evento")
+
+if __name__ == '__main__':
+    run_benchmark()
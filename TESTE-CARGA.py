@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da live
+Sobe o src/main.py localmente (com um Mercado Pago falso) e conecta milhares de clientes Socket.IO simulados
+que fazem login, mandam mensagens, curtem, votam e doam. Mede taxa de conexão, latência dos broadcasts
+(p50/p95/p99) e CPU/memória do servidor.
+
+Exemplos:
+    python TESTE-CARGA.py --scenario espectadores --clients 5000
+    python TESTE-CARGA.py --scenario pico --clients 20000 --ramp 500 --duration 120
+    python TESTE-CARGA.py --url http://127.0.0.1:5000 --pid 1234   (servidor já rodando, com os
+        assinantes carga0@moedor.test, carga1@moedor.test, ... já cadastrados)
+
+Para muitos clientes aumente o limite de arquivos abertos antes (ex.: ulimit -n 65535).
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import deque
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+import msgpack
+import psutil
+import socketio
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Ações por cliente por minuto em cada cenário
+SCENARIOS = {
+    'espectadores': {'clients': 1000, 'duration': 60, 'messages': 0.2, 'likes': 1, 'votes': 0.5, 'donations': 0.01},
+    'chat': {'clients': 1000, 'duration': 60, 'messages': 2, 'likes': 5, 'votes': 0.5, 'donations': 0.01},
+    'pico': {'clients': 5000, 'duration': 60, 'messages': 1, 'likes': 10, 'votes': 2, 'donations': 0.05},
+}
+
+def percentile(values, pct):
+    """Percentil de uma lista já ordenada"""
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+class LoadStats:
+    """Contadores compartilhados pelos clientes simulados"""
+
+    def __init__(self):
+        self.connect_times = []
+        self.connect_failures = 0
+        self.connect_started = None
+        self.connect_finished = None
+        self.actions = {'messages': 0, 'likes': 0, 'votes': 0, 'donations': 0}
+        self.action_errors = {'messages': 0, 'likes': 0, 'votes': 0, 'donations': 0}
+        self.server_errors = 0
+        self.disconnects = 0
+        self.latencies = []
+        # token da mensagem -> instante do envio
+        self.sent = {}
+        # IDs das mensagens recentes (alvo dos likes)
+        self.recent_messages = deque(maxlen=200)
+        self.poll = None
+        self.cpu_samples = []
+        self.rss_samples = []
+
+    def on_message(self, data):
+        message_id = data.get('id')
+        if message_id is not None:
+            self.recent_messages.append(message_id)
+        content = data.get('content') or ''
+        sent_at = self.sent.get(content.rsplit(' ', 1)[-1])
+        if sent_at is not None:
+            self.latencies.append((time.perf_counter() - sent_at) * 1000)
+
+class FakeMercadoPago:
+    """Mercado Pago falso: cria preferências e aprova o pagamento chamando o webhook do servidor"""
+
+    def __init__(self, port):
+        self.port = port
+        self.payments = {}
+        self.runner = None
+        self.session = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/checkout/preferences', self.create_preference)
+        app.router.add_get('/v1/payments/{payment_id}', self.get_payment)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', self.port).start()
+        self.session = aiohttp.ClientSession()
+
+    async def stop(self):
+        if self.session is not None:
+            await self.session.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def create_preference(self, request):
+        data = await request.json()
+        payment_id = f'CARGA-{len(self.payments) + 1}'
+        self.payments[payment_id] = data.get('external_reference')
+        # O "comprador" paga logo em seguida
+        asyncio.ensure_future(self.notify(data.get('notification_url'), payment_id))
+        return web.json_response({
+            'id': payment_id,
+            'init_point': f'{self.base_url}/checkout/{payment_id}',
+            'sandbox_init_point': f'{self.base_url}/checkout/{payment_id}'
+        }, status=201)
+
+    async def get_payment(self, request):
+        payment_id = request.match_info['payment_id']
+        if payment_id not in self.payments:
+            return web.json_response({'message': 'not found'}, status=404)
+        return web.json_response({
+            'id': payment_id,
+            'status': 'approved',
+            'external_reference': self.payments[payment_id]
+        })
+
+    async def notify(self, url, payment_id):
+        await asyncio.sleep(0.2)
+        try:
+            await self.session.post(url, json={'type': 'payment', 'data': {'id': payment_id}})
+        except Exception as e:
+            print(f"⚠️ Webhook do Mercado Pago falso falhou: {e}")
+
+class SimulatedViewer:
+    """Um espectador: login HTTP, socket conectado e ações aleatórias no ritmo do cenário"""
+
+    def __init__(self, index, base_url, stats, scenario, protocol, measure):
+        self.index = index
+        self.base_url = base_url
+        self.stats = stats
+        self.scenario = scenario
+        self.protocol = protocol
+        self.measure = measure
+        self.http = None
+        self.sio = None
+        self.schema = {}
+        self.closing = False
+
+    @property
+    def email(self):
+        return f'carga{self.index}@moedor.test'
+
+    async def connect(self):
+        start = time.perf_counter()
+        try:
+            self.http = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+            async with self.http.post(f'{self.base_url}/api/auth/login', json={'email': self.email}) as response:
+                if response.status != 200:
+                    raise RuntimeError(f'login {response.status}')
+
+            self.sio = socketio.AsyncClient(reconnection=False, handle_sigint=False, http_session=self.http)
+            self._register_handlers()
+            await self.sio.connect(
+                f'{self.base_url}?protocol={self.protocol}',
+                transports=['websocket'],
+                wait_timeout=10
+            )
+            self.stats.connect_times.append((time.perf_counter() - start) * 1000)
+            return True
+        except Exception:
+            self.stats.connect_failures += 1
+            await self.close()
+            return False
+
+    def _register_handlers(self):
+        sio = self.sio
+        measure = self.measure
+
+        @sio.on('connected')
+        async def on_connected(data):
+            self.schema = {int(code): entry for code, entry in (data.get('schema') or {}).items()}
+
+        @sio.on('new_message')
+        async def on_new_message(data):
+            if measure:
+                self.stats.on_message(data)
+
+        @sio.on('batch')
+        async def on_batch(events):
+            if measure:
+                for event, data in events:
+                    if event == 'new_message':
+                        self.stats.on_message(data)
+
+        @sio.on('c')
+        async def on_compact(buffer):
+            if measure:
+                self._on_frames([msgpack.unpackb(buffer)])
+
+        @sio.on('cb')
+        async def on_compact_batch(buffer):
+            if measure:
+                self._on_frames(msgpack.unpackb(buffer))
+
+        @sio.on('error')
+        async def on_error(data):
+            self.stats.server_errors += 1
+
+        @sio.on('disconnect')
+        async def on_disconnect():
+            if not self.closing:
+                self.stats.disconnects += 1
+
+    def _on_frames(self, frames):
+        for frame in frames:
+            entry = self.schema.get(frame[0])
+            if entry is not None and entry[0] == 'new_message':
+                self.stats.on_message(dict(zip(entry[1], frame[2:])))
+
+    async def run(self, until):
+        """Executar ações até o instante informado (intervalos exponenciais, como chegadas independentes)"""
+        rates = {action: self.scenario[action] / 60.0 for action in self.stats.actions}
+        total_rate = sum(rates.values())
+        if total_rate <= 0:
+            await asyncio.sleep(max(0, until - time.perf_counter()))
+            return
+
+        actions = list(rates)
+        weights = [rates[action] for action in actions]
+        while True:
+            await asyncio.sleep(random.expovariate(total_rate))
+            if time.perf_counter() >= until or not self.sio.connected:
+                return
+            action = random.choices(actions, weights)[0]
+            try:
+                ok = await getattr(self, f'do_{action}')()
+            except Exception:
+                ok = False
+            self.stats.actions[action] += 1
+            if not ok:
+                self.stats.action_errors[action] += 1
+
+    async def do_messages(self):
+        token = f'{self.index}-{random.getrandbits(40):x}'
+        self.stats.sent[token] = time.perf_counter()
+        await self.sio.emit('send_message', {
+            'fake_name': f'Carga {self.index}',
+            'content': f'mensagem de teste de carga {token}'
+        })
+        return True
+
+    async def do_likes(self):
+        if not self.stats.recent_messages:
+            return True
+        await self.sio.emit('like_message', {'message_id': random.choice(self.stats.recent_messages)})
+        return True
+
+    async def do_votes(self):
+        poll = self.stats.poll
+        if poll is None:
+            return True
+        option = random.choice(poll['options'])
+        async with self.http.post(f"{self.base_url}/api/polls/{poll['id']}/vote",
+                                  json={'option_id': option['id']}) as response:
+            # 400: o usuário já votou nesta enquete
+            return response.status in (200, 400)
+
+    async def do_donations(self):
+        async with self.http.post(f'{self.base_url}/api/donations/create',
+                                  json={'amount': random.choice([2, 5, 10, 20])}) as response:
+            return response.status == 200
+
+    async def close(self):
+        self.closing = True
+        try:
+            if self.sio is not None and self.sio.connected:
+                await self.sio.disconnect()
+        except Exception:
+            pass
+        if self.http is not None:
+            await self.http.close()
+
+def start_server(port, database_path, mercadopago_url):
+    """Subir o src/main.py em um processo separado, com banco próprio e limites de taxa liberados"""
+    env = dict(
+        os.environ,
+        DATABASE_URL=f'sqlite:///{database_path}',
+        STATE_BACKEND='memory',
+        MERCADOPAGO_API_BASE_URL=mercadopago_url,
+        FLASK_ENV='development',
+        LOGIN_RATE_LIMIT='1000000',
+        MESSAGE_RATE_LIMIT='1000',
+        LIKE_RATE_LIMIT='1000',
+        VOTE_RATE_LIMIT='1000',
+    )
+    code = (
+        "from src.main import app, socketio; "
+        f"socketio.run(app, host='127.0.0.1', port={port}, log_output=False)"
+    )
+    return subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+async def wait_for_server(base_url, process=None, timeout=60):
+    """Aguardar o /health responder"""
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.perf_counter() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f'servidor encerrou com código {process.returncode}')
+            try:
+                async with http.get(f'{base_url}/health') as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError('servidor não respondeu ao /health')
+
+def seed_users(database_path, count):
+    """Criar os assinantes usados pelos clientes simulados"""
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
+    with sqlite3.connect(database_path) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (hotmart_id, name, email, created_at, last_login, is_active) "
+            "VALUES (?, ?, ?, ?, ?, 1)",
+            [(f'carga_{i}', f'Carga {i}', f'carga{i}@moedor.test', now, now) for i in range(count)]
+        )
+
+async def create_poll(base_url, stats):
+    """Abrir uma enquete para os votos do teste"""
+    async with aiohttp.ClientSession() as http:
+        async with http.post(f'{base_url}/api/polls/create', json={
+            'question': 'Teste de carga: qual opção?',
+            'options': ['Opção A', 'Opção B', 'Opção C'],
+            'duration_minutes': 60
+        }) as response:
+            if response.status == 200:
+                stats.poll = await response.json()
+
+async def sample_process(pid, stats, stop):
+    """Amostrar CPU e memória do servidor a cada segundo"""
+    process = psutil.Process(pid)
+    process.cpu_percent()
+    while not stop.is_set():
+        await asyncio.sleep(1)
+        try:
+            stats.cpu_samples.append(process.cpu_percent())
+            stats.rss_samples.append(process.memory_info().rss)
+        except psutil.Error:
+            return
+
+async def fetch_health(base_url):
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f'{base_url}/health') as response:
+                return await response.json()
+    except Exception:
+        return {}
+
+async def run_load_test(args):
+    """Executar teste de carga"""
+    scenario = dict(SCENARIOS[args.scenario])
+    for key in ('clients', 'duration'):
+        if getattr(args, key) is not None:
+            scenario[key] = getattr(args, key)
+
+    stats = LoadStats()
+    mercadopago = None
+    server = None
+    workdir = tempfile.mkdtemp(prefix='moedor-carga-')
+    database_path = os.path.join(workdir, 'carga.db')
+
+    base_url = args.url
+    pid = args.pid
+    if base_url is None:
+        mercadopago = FakeMercadoPago(args.mp_port)
+        await mercadopago.start()
+        print(f"💳 Mercado Pago falso em {mercadopago.base_url}")
+
+        server = start_server(args.port, database_path, mercadopago.base_url)
+        base_url = f'http://127.0.0.1:{args.port}'
+        pid = server.pid
+        print(f"🚀 Servidor iniciado (pid {pid}), banco em {database_path}")
+
+    viewers = []
+    stop = asyncio.Event()
+    sampler = None
+    try:
+        await wait_for_server(base_url, server)
+        if server is not None:
+            seed_users(database_path, scenario['clients'])
+        await create_poll(base_url, stats)
+        if pid:
+            sampler = asyncio.ensure_future(sample_process(pid, stats, stop))
+
+        print(f"🧪 Cenário {args.scenario}: {scenario['clients']} clientes, {args.ramp}/s, "
+              f"{scenario['duration']}s, protocolo {args.protocol}")
+
+        # Conexão em ondas de `ramp` clientes por segundo
+        stats.connect_started = time.perf_counter()
+        connecting = []
+        for index in range(scenario['clients']):
+            viewer = SimulatedViewer(index, base_url, stats, scenario, args.protocol, index < args.measure)
+            viewers.append(viewer)
+            connecting.append(asyncio.ensure_future(viewer.connect()))
+            if (index + 1) % args.ramp == 0:
+                await asyncio.sleep(1)
+        results = await asyncio.gather(*connecting)
+        stats.connect_finished = time.perf_counter()
+        connected = [viewer for viewer, ok in zip(viewers, results) if ok]
+        print(f"🔌 Conectados: {len(connected)} / {len(viewers)}")
+
+        until = time.perf_counter() + scenario['duration']
+        await asyncio.gather(*(viewer.run(until) for viewer in connected))
+        # Últimos broadcasts ainda a caminho
+        await asyncio.sleep(2)
+        health = await fetch_health(base_url)
+    finally:
+        stop.set()
+        if sampler is not None:
+            await sampler
+        await asyncio.gather(*(viewer.close() for viewer in viewers), return_exceptions=True)
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if mercadopago is not None:
+            await mercadopago.stop()
+
+    report = build_report(args, scenario, stats, health)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Relatório salvo em {args.json}")
+
+def build_report(args, scenario, stats, health):
+    """Montar o relatório final"""
+    connect_times = sorted(stats.connect_times)
+    latencies = sorted(stats.latencies)
+    connect_seconds = (stats.connect_finished or 0) - (stats.connect_started or 0)
+    return {
+        'scenario': args.scenario,
+        'clients': scenario['clients'],
+        'duration_seconds': scenario['duration'],
+        'protocol': args.protocol,
+        'connect': {
+            'connected': len(connect_times),
+            'failed': stats.connect_failures,
+            'rate_per_second': round(len(connect_times) / connect_seconds, 1) if connect_seconds > 0 else 0,
+            'p50_ms': round(percentile(connect_times, 50), 1),
+            'p95_ms': round(percentile(connect_times, 95), 1),
+            'p99_ms': round(percentile(connect_times, 99), 1)
+        },
+        'broadcast_latency': {
+            'samples': len(latencies),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'max_ms': round(latencies[-1], 1) if latencies else 0
+        },
+        'actions': stats.actions,
+        'action_errors': stats.action_errors,
+        'server_errors': stats.server_errors,
+        'disconnects': stats.disconnects,
+        'server': {
+            'cpu_avg_percent': round(sum(stats.cpu_samples) / len(stats.cpu_samples), 1) if stats.cpu_samples else None,
+            'cpu_max_percent': max(stats.cpu_samples) if stats.cpu_samples else None,
+            'rss_max_mb': round(max(stats.rss_samples) / 1024 / 1024, 1) if stats.rss_samples else None
+        },
+        'health': {
+            key: health.get(key)
+            for key in ('connected_users', 'event_batcher', 'slow_consumers', 'room_shards')
+            if key in health
+        }
+    }
+
+def print_report(report):
+    connect = report['connect']
+    latency = report['broadcast_latency']
+    server = report['server']
+    print("📊 Resultado")
+    print(f"🔌 Conexões: {connect['connected']} ok, {connect['failed']} falhas, {connect['rate_per_second']}/s "
+          f"(p50 {connect['p50_ms']} ms, p95 {connect['p95_ms']} ms, p99 {connect['p99_ms']} ms)")
+    print(f"📡 Latência do broadcast ({latency['samples']} amostras): p50 {latency['p50_ms']} ms, "
+          f"p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms, máx {latency['max_ms']} ms")
+    print(f"🎬 Ações: {report['actions']} (erros: {report['action_errors']}, erros do servidor: {report['server_errors']})")
+    print(f"⚠️ Desconexões: {report['disconnects']}")
+    if server['cpu_avg_percent'] is not None:
+        print(f"🖥️ CPU do servidor: média {server['cpu_avg_percent']}%, máx {server['cpu_max_percent']}%")
+        print(f"💾 Memória do servidor: máx {server['rss_max_mb']} MB")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Teste de carga da live (Socket.IO)')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='espectadores')
+    parser.add_argument('--clients', type=int, help='quantidade de clientes (padrão do cenário)')
+    parser.add_argument('--duration', type=int, help='segundos de ações após conectar (padrão do cenário)')
+    parser.add_argument('--ramp', type=int, default=200, help='novas conexões por segundo')
+    parser.add_argument('--protocol', choices=['json', 'compact'], default='json')
+    parser.add_argument('--measure', type=int, default=200, help='clientes que medem a latência dos broadcasts')
+    parser.add_argument('--port', type=int, default=5055, help='porta do servidor iniciado pelo teste')
+    parser.add_argument('--mp-port', type=int, default=5056, help='porta do Mercado Pago falso')
+    parser.add_argument('--url', help='usar um servidor já rodando em vez de iniciar um')
+    parser.add_argument('--pid', type=int, help='pid do servidor já rodando (para CPU/memória)')
+    parser.add_argument('--json', help='salvar o relatório neste arquivo')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    asyncio.run(run_load_test(parse_args()))
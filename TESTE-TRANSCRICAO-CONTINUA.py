@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Teste da transcrição contínua em trechos sobrepostos
+Roda o loop de transcrição com um modelo falso sobre falas que cruzam o fim dos trechos
+e confere que cada fala sai inteira, uma única vez e na ordem
+"""
+import os
+import sys
+import time
+import threading
+import importlib.util
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+# O serviço não tem nome de módulo próprio: carregado direto do arquivo
+_spec = importlib.util.spec_from_file_location(
+    'transcricao_whisper', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'services', 'TRANSCRICAO-WHISPER.py')
+)
+transcricao = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(transcricao)
+
+SAMPLE_RATE = transcricao.SAMPLE_RATE
+STREAM_SECONDS = 75
+
+# (início, fim, texto) em segundos do stream; a 3ª e a 5ª cruzam o fim de um trecho
+UTTERANCES = [
+    (2.0, 9.0, 'bom dia pessoal'),
+    (10.0, 16.5, 'hoje vamos falar de futebol'),
+    (18.0, 29.5, 'o jogo de ontem foi muito disputado até o último minuto'),
+    (31.0, 38.0, 'o juiz anulou dois gols'),
+    (40.0, 54.6, 'e a torcida ficou revoltada com a arbitragem do começo ao fim'),
+    (56.0, 62.0, 'mandem suas opiniões no chat'),
+]
+
+class FakeWhisper:
+    """Modelo falso: devolve as falas que caem no trecho, cortando as palavras fora dele"""
+
+    def __init__(self, utterances):
+        self.utterances = utterances
+        self.calls = []
+
+    def transcribe(self, samples, **options):
+        # O sinal carrega o próprio instante (segundos / 1000) em cada amostra
+        offset = round(float(samples[0]) * 1000, 3)
+        duration = len(samples) / SAMPLE_RATE
+        self.calls.append(offset)
+
+        segments = []
+        for start, end, text in self.utterances:
+            if end <= offset or start >= offset + duration:
+                continue
+            words = text.split()
+            first = int(len(words) * max(0.0, offset - start) / (end - start))
+            last = len(words) - int(len(words) * max(0.0, end - offset - duration) / (end - start))
+            segments.append({
+                'start': max(start, offset) - offset,
+                'end': min(end, offset + duration) - offset,
+                'text': ' ' + ' '.join(words[first:last]),
+                'avg_logprob': -0.2
+            })
+        return {'segments': segments}
+
+def run_stream(service):
+    """Encher o buffer com o stream todo e rodar o loop até ele esperar por mais áudio"""
+    service.audio = transcricao.AudioRingBuffer(STREAM_SECONDS + 30)
+    stream = (np.arange(STREAM_SECONDS * SAMPLE_RATE) / SAMPLE_RATE / 1000).astype(np.float32)
+    service.audio.write(stream)
+
+    service.is_running = True
+    thread = threading.Thread(target=service._transcribe_stream_loop, daemon=True)
+    thread.start()
+
+    calls = -1
+    while calls != len(service.model.calls):
+        calls = len(service.model.calls)
+        time.sleep(0.5)
+    service.is_running = False
+    thread.join(timeout=5)
+
+def test_overlapping_chunks():
+    """Falas cortadas no fim de um trecho saem inteiras no próximo"""
+    service = transcricao.WhisperTranscriptionService()
+    service.model = FakeWhisper(UTTERANCES)
+    service.chunk_samples = 30 * SAMPLE_RATE
+    service.step_samples = 25 * SAMPLE_RATE
+    emitted = []
+    service._handle_stream_segments = emitted.extend
+
+    run_stream(service)
+
+    texts = [segment['text'] for segment in emitted]
+    assert texts == [text for _, _, text in UTTERANCES], texts
+    assert [round(segment['start'], 1) for segment in emitted] == [start for start, _, _ in UTTERANCES]
+    # Trechos recomeçam no início da fala cortada
+    assert service.model.calls[:3] == [0.0, 18.0, 40.0], service.model.calls
+    return service.model.calls
+
+def test_next_chunk_start():
+    """Próximo trecho limitado a [início + 1 amostra, início + passo]"""
+    service = transcricao.WhisperTranscriptionService()
+    service.step_samples = 25 * SAMPLE_RATE
+    start = 10 * SAMPLE_RATE
+    assert service._next_chunk_start(start, None) == start + service.step_samples
+    assert service._next_chunk_start(start, 28.0) == 28 * SAMPLE_RATE
+    assert service._next_chunk_start(start, 5.0) == start + 1
+    assert service._next_chunk_start(start, 60.0) == start + service.step_samples
+
+if __name__ == '__main__':
+    print("🧪 Teste da transcrição contínua")
+    test_next_chunk_start()
+    print("✅ Início do próximo trecho limitado ao passo")
+    calls = test_overlapping_chunks()
+    print(f"✅ {len(UTTERANCES)} falas inteiras em {len(calls)} trechos (inícios: {', '.join(f'{c:.0f}s' for c in calls)})")
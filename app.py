@@ -5,13 +5,16 @@ Recebe tokens do servidor de autenticação e executa sistema principal
 """
 
 from flask import Flask, render_template_string, send_from_directory, request, session, redirect, url_for, jsonify
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from datetime import datetime
 import os
 import json
 import requests
 import jwt
 from dotenv import load_dotenv
+from src.services.ring_buffer import RingBuffer, ObsMessageRecord, CaptureRecord
+from src.services.presence import PresenceService
+from src.services.state_backend import state_backend, create_client_manager, SharedDict
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -21,16 +24,25 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'moedor-local-2024-secure')
 
 # Configurar SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=create_client_manager())
+
+# Contagem de usuários online publicada no máximo uma vez por intervalo
+presence = PresenceService(backend=state_backend)
+presence.register_room('viewers', 'user_count_update', lambda count: {'count': count})
+presence.init_app(app, socketio)
 
 # Configurações
 JWT_SECRET = os.environ.get('JWT_SECRET', 'moedor-jwt-secret-2024')
 AUTH_SERVER_URL = os.environ.get('AUTH_SERVER_URL', 'https://moedor-ao-vivo.onrender.com')
 
+# Tamanho dos buffers em memória e quantos itens enviar ao conectar
+LIVE_BUFFER_SIZE = int(os.environ.get('LIVE_BUFFER_SIZE', 50))
+BACKFILL_SIZE = int(os.environ.get('BACKFILL_SIZE', 50))
+
 # Dados em memória (mesmo sistema anterior)
-users_online = 0
-messages = []  # Mensagens para OBS
-authenticated_users = {}
+messages = RingBuffer(LIVE_BUFFER_SIZE)  # Mensagens para OBS
+next_message_id = 1
+authenticated_users = SharedDict(state_backend, 'local_authenticated_users')
 cameras = [
     {"id": 1, "name": "Câmera 1", "url": "", "active": True},
     {"id": 2, "name": "Câmera 2", "url": "", "active": True},
@@ -40,7 +52,7 @@ cameras = [
     {"id": 6, "name": "Câmera 6", "url": "", "active": True}
 ]
 next_camera_id = 7
-captures = []
+captures = RingBuffer(LIVE_BUFFER_SIZE)
 next_capture_id = 1
 
 def verify_jwt_token(token):
@@ -185,34 +197,34 @@ def delete_camera(camera_id):
 @app.route('/api/captures', methods=['GET'])
 @login_required
 def get_captures():
-    return jsonify({"captures": captures})
+    return jsonify({"captures": captures.dicts()})
 
 @app.route('/api/obs-messages', methods=['GET'])
 @login_required
 def get_obs_messages():
-    return jsonify({"messages": messages})
+    return jsonify({"messages": messages.dicts()})
 
 @app.route('/api/obs-messages', methods=['POST'])
 @login_required
 def send_obs_message():
+    global next_message_id
     data = request.get_json()
     message_text = data.get('message', '').strip()
     
     if message_text and len(message_text) <= 200:
-        message_data = {
-            'id': len(messages) + 1,
-            'message': message_text,
-            'timestamp': datetime.now().strftime('%H:%M:%S'),
-            'user_email': session.get('user_email', 'Usuário'),
-            'user_name': session.get('user_name', 'Usuário'),
-            'status': 'sent',
-            'created_at': datetime.now().isoformat()
-        }
-        
-        messages.append(message_data)
+        record = ObsMessageRecord(
+            id=next_message_id,
+            message=message_text,
+            timestamp=datetime.now().strftime('%H:%M:%S'),
+            user_email=session.get('user_email', 'Usuário'),
+            user_name=session.get('user_name', 'Usuário'),
+            status='sent',
+            created_at=datetime.now().isoformat()
+        )
         
-        if len(messages) > 50:
-            messages.pop(0)
+        messages.append(record)
+        next_message_id += 1
+        message_data = record.to_dict()
         
         socketio.emit('obs_message_sent', message_data)
         
@@ -250,22 +262,19 @@ def simulate_capture():
     
     selected_camera = random.choice(active_cameras)
     
-    capture_data = {
-        'id': next_capture_id,
-        'camera_name': selected_camera['name'],
-        'reaction': random.choice(reactions),
-        'timestamp': datetime.now().strftime('%H:%M:%S'),
-        'created_at': datetime.now().isoformat()
-    }
+    record = CaptureRecord(
+        id=next_capture_id,
+        camera_name=selected_camera['name'],
+        reaction=random.choice(reactions),
+        timestamp=datetime.now().strftime('%H:%M:%S'),
+        created_at=datetime.now().isoformat()
+    )
     
-    captures.append(capture_data)
+    captures.append(record)
     next_capture_id += 1
     
-    if len(captures) > 50:
-        captures.pop(0)
-    
-    socketio.emit('captures_updated', {"captures": captures})
-    return jsonify({"success": True, "capture": capture_data})
+    socketio.emit('captures_updated', {"captures": captures.dicts()})
+    return jsonify({"success": True, "capture": record.to_dict()})
 
 @app.route('/admin')
 @login_required
@@ -280,7 +289,7 @@ def status():
         'service': 'MOEDOR AO VIVO - Local Server',
         'auth_server': AUTH_SERVER_URL,
         'authenticated_users': len(authenticated_users),
-        'users_online': users_online,
+        'users_online': presence.count('viewers'),
         'cameras': len([c for c in cameras if c['active']]),
         'messages': len(messages),
         'captures': len(captures),
@@ -290,15 +299,19 @@ def status():
 # EVENTOS WEBSOCKET (mesmos do sistema anterior)
 @socketio.on('connect')
 def handle_connect():
-    global users_online
-    users_online += 1
-    emit('user_count_update', {'count': users_online}, broadcast=True)
+    # A contagem é enviada aos espectadores no próximo intervalo de presença
+    join_room('viewers')
+    presence.join(request.sid, 'viewers')
+    
+    # Enviar estado recente em um único evento para o cliente que conectou
+    emit('backfill', {
+        'messages': messages.dicts(BACKFILL_SIZE),
+        'captures': captures.dicts(BACKFILL_SIZE)
+    })
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    global users_online
-    users_online = max(0, users_online - 1)
-    emit('user_count_update', {'count': users_online}, broadcast=True)
+    presence.leave(request.sid)
 
 # TEMPLATES HTML
 
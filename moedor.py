@@ -12,11 +12,13 @@ import hashlib
 import hmac
 from datetime import datetime, timedelta
 from functools import wraps
+from src.services.ring_buffer import RingBuffer, TextMessageRecord
+from src.services.state_backend import state_backend, create_client_manager, SharedDict, SharedSet
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'moedor-ao-vivo-2024-secure'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=30)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=create_client_manager())
 
 # Lista inicial de compradores (será atualizada pelo webhook)
 authorized_buyers = {
@@ -27,12 +29,16 @@ authorized_buyers = {
 
 # Log de webhooks recebidos
 webhook_logs = []
-hotmart_buyers = set()  # Compradores vindos da Hotmart
+hotmart_buyers = SharedSet(state_backend, 'hotmart_buyers')  # Compradores vindos da Hotmart
+
+# Tamanho do histórico em memória e quantas mensagens enviar ao conectar
+LIVE_BUFFER_SIZE = int(os.environ.get('LIVE_BUFFER_SIZE', 200))
+BACKFILL_SIZE = int(os.environ.get('BACKFILL_SIZE', 50))
 
 # Dados em memória
 users_online = 0
-messages = []
-authenticated_users = {}
+messages = RingBuffer(LIVE_BUFFER_SIZE)
+authenticated_users = SharedDict(state_backend, 'authenticated_users')
 
 def login_required(f):
     """Decorator para proteger rotas que precisam de autenticação"""
@@ -371,8 +377,8 @@ def login():
             
             authenticated_users[email] = {
                 'email': email,
-                'login_time': datetime.now(),
-                'last_activity': datetime.now()
+                'login_time': datetime.now().isoformat(),
+                'last_activity': datetime.now().isoformat()
             }
             
             print(f"✅ LOGIN AUTORIZADO: {email}")
@@ -1275,7 +1281,7 @@ main_template = '''
         });
         
         // Receber mensagens
-        socket.on('new_message', function(data) {
+        function renderMessage(data) {
             const messagesContainer = document.getElementById('messages');
             const messageDiv = document.createElement('div');
             messageDiv.className = 'message';
@@ -1292,6 +1298,14 @@ main_template = '''
             
             messagesContainer.appendChild(messageDiv);
             messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        }
+        
+        socket.on('new_message', renderMessage);
+        
+        // Histórico recente enviado ao conectar
+        socket.on('backfill', function(data) {
+            document.getElementById('messages').innerHTML = '';
+            (data.messages || []).forEach(renderMessage);
         });
         
         // Receber notificação de novo comprador
@@ -1532,15 +1546,23 @@ admin_template = '''
 '''
 
 # WebSocket events
+@socketio.on('connect')
+def handle_connect():
+    # Enviar as últimas mensagens em um único evento
+    emit('backfill', {'messages': messages.dicts(BACKFILL_SIZE)})
+
 @socketio.on('send_message')
 def handle_message(data):
-    global messages
     if 'user_email' not in session or not session.get('authenticated'):
         return
     
-    data['user_email'] = session['user_email']
-    messages.append(data)
-    emit('new_message', data, broadcast=True)
+    record = TextMessageRecord(
+        text=data.get('text'),
+        timestamp=data.get('timestamp'),
+        user_email=session['user_email']
+    )
+    messages.append(record)
+    emit('new_message', record.to_dict(), broadcast=True)
 
 if __name__ == '__main__':
     print("🚀 MOEDOR AO VIVO - Debug de Webhook Hotmart")
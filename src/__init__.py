@@ -0,0 +1,52 @@
+import os
+import sys
+import importlib.abc
+import importlib.util
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Nome de import -> arquivo (os arquivos do projeto têm nomes descritivos em português)
+MODULE_FILES = {
+    'src.services.ring_buffer': 'services/BUFFER-CIRCULAR.py',
+    'src.services.presence': 'services/PRESENCA.py',
+    'src.services.state_backend': 'services/ESTADO-COMPARTILHADO.py',
+    'src.services.compact_protocol': 'services/PROTOCOLO-COMPACTO.py',
+    'src.services.content_filter': 'services/FILTRO-CONTEUDO.py',
+    'src.services.rate_limiter': 'services/LIMITADOR-TAXA.py',
+    'src.services.message_ranking': 'services/RANKING-MENSAGENS.py',
+    'src.services.like_aggregator': 'services/AGREGADOR-LIKES.py',
+    'src.services.message_stats': 'services/ESTATISTICAS-MENSAGENS.py',
+    'src.services.cleanup_service': 'services/LIMPEZA-BANCO.py',
+    'src.services.message_writer': 'services/PERSISTENCIA-MENSAGENS.py',
+    'src.services.payload_cache': 'services/CACHE-PAYLOADS.py',
+    'src.services.event_log': 'services/LOG-EVENTOS.py',
+    'src.services.event_batcher': 'services/LOTES-EVENTOS.py',
+    'src.services.slow_consumers': 'services/CONSUMIDORES-LENTOS.py',
+    'src.services.room_shards': 'services/SALAS-FRAGMENTADAS.py',
+    'src.services.scheduler': 'services/AGENDADOR.py',
+    'src.services.vote_tally': 'services/APURACAO-VOTOS.py',
+    'src.services.poll_publisher': 'services/PUBLICADOR-ENQUETES.py',
+    'src.services.poll_service': 'services/ENQUETES-AUTOMATICAS-SERVICE.py',
+    'src.services.keyword_engine': 'services/PALAVRAS-CHAVE.py',
+    'src.models.database': 'models/BANCO-DE-DADOS.py',
+    'src.models.user': 'models/MODELO-USUARIO.py',
+    'src.routes.auth': 'routes/AUTENTICACAO-HOTMART.py',
+    'src.routes.messages': 'routes/CHAT-MENSAGENS.py',
+    'src.routes.admin': 'routes/PAINEL-ADMIN.py',
+    'src.routes.donations': 'routes/DOACOES-MERCADOPAGO.py',
+    'src.routes.cameras': 'routes/CAMERAS-RTSP.py',
+    'src.routes.overlays': 'routes/OVERLAYS-OBS.py',
+    'src.routes.polls': 'routes/ENQUETES-AUTOMATICAS.py',
+}
+
+class _ModuleFileFinder(importlib.abc.MetaPathFinder):
+    """Resolver os nomes de import do projeto para os arquivos correspondentes"""
+
+    def find_spec(self, fullname, path=None, target=None):
+        filename = MODULE_FILES.get(fullname)
+        if filename is None:
+            return None
+        return importlib.util.spec_from_file_location(fullname, os.path.join(_ROOT, filename))
+
+if not any(isinstance(finder, _ModuleFileFinder) for finder in sys.meta_path):
+    sys.meta_path.append(_ModuleFileFinder())
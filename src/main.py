@@ -1,3 +1,7 @@
+# Servidor eventlet: threads, sleeps, filas e sockets viram cooperativos (antes de qualquer outro import)
+import eventlet
+eventlet.monkey_patch()
+
 import os
 import sys
 # DON'T CHANGE THIS !!!
@@ -22,6 +26,25 @@ from src.routes.donations import donations_bp
 from src.routes.cameras import cameras_bp
 from src.routes.overlays import overlays_bp
 from src.routes.polls import polls_bp
+from src.services.rate_limiter import check_rate_limit
+from src.services.message_ranking import message_ranking
+from src.services.like_aggregator import like_aggregator
+from src.services.message_stats import message_stats
+from src.services.cleanup_service import cleanup_service
+from src.services.content_filter import find_forbidden_words
+from src.services.message_writer import message_writer
+from src.services.ring_buffer import RingBuffer, ChatMessageRecord, OverlayEventRecord
+from src.services.payload_cache import payload_cache
+from src.services.presence import presence
+from src.services.state_backend import state_backend, create_client_manager, WORKER_ID
+from src.services.compact_protocol import COMPACT_EVENT, COMPACT_BATCH_EVENT, encode_event, encode_batch, get_schema, wants_compact
+from src.services.event_log import event_log
+from src.services.poll_service import poll_service, get_active_polls
+from src.services.scheduler import scheduler
+from src.services.event_batcher import event_batcher
+from src.services.slow_consumers import slow_consumers, degraded_room
+from src.services.room_shards import room_shards
+from src.services.poll_publisher import poll_publisher, POLL_TALLY_HZ, POLL_TALLY_OVERLAY_HZ
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -32,14 +55,22 @@ app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'sta
 
 # Configurações
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'moedor-ao-vivo-secret-key-2024')
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Configurar CORS
 CORS(app, origins="*")
 
-# Configurar SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+# Configurar SocketIO (com backend compartilhado, eventos são repassados entre workers)
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode='eventlet',
+    client_manager=create_client_manager()
+)
 
 # Registrar blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -56,27 +87,91 @@ with app.app_context():
     db.create_all()
     logger.info("Banco de dados inicializado")
 
+# Gravação das mensagens do chat em lote (write-behind)
+message_writer.init_app(app)
+
+# Fila de mensagens do OBS (com vários workers, reconstruída do banco periodicamente)
+message_ranking.init_app(app)
+
+# Persistência e transmissão de likes em lote
+like_aggregator.init_app(app)
+
+# Estatísticas de mensagens em memória
+message_stats.init_app(app)
+
+# Limpeza periódica do banco em lotes
+cleanup_service.init_app(app)
+
+# Encerramento das enquetes por um único agendador (reagenda as abertas ao iniciar)
+poll_service.init_app(app)
+
+# Presença e estatísticas publicadas no máximo uma vez por intervalo
+presence.register_room('live_room', 'stats_update', lambda count: {
+    'online_users': count,
+    'total_messages': message_stats.total
+})
+# (contagens não entram no log de eventos: o snapshot já traz o valor atual)
+presence.init_app(app, socketio, emit=lambda event, data, room, **kwargs: emit_to_room(event, data, room, logged=False, immediate=True, **kwargs))
+
+# Apuração das enquetes em cadência fixa (contagens não entram no log de eventos)
+poll_publisher.register_room('live_room', POLL_TALLY_HZ)
+poll_publisher.register_room('overlay_room', POLL_TALLY_OVERLAY_HZ)
+poll_publisher.init_app(app, emit=lambda event, data, room, **kwargs: emit_to_room(event, data, room, logged=False, immediate=True, **kwargs))
+
+# Eventos das salas acumulados e enviados em um único quadro por intervalo
+event_batcher.init_app(app, send=lambda room, events: send_batch(room, events))
+
+# Clientes com fila de saída longa recebem eventos reduzidos (ou são desconectados)
+slow_consumers.init_app(app, socketio, send=lambda room, events: send_degraded(room, events))
+
+# Audiência da live dividida em sub-salas que recebem os eventos em paralelo
+room_shards.register_room('live_room')
+
+# Salas com canal paralelo para o protocolo compacto
+COMPACT_ROOMS = {'live_room'}
+
+# Eventos do overlay que aparecem na tela na hora (não esperam o próximo lote)
+OVERLAY_PRIORITY_EVENTS = {'new_subscriber', 'donation_approved', 'embarrassing_ready', 'embarrassing_approved'}
+
 # Variáveis globais para controle da live
-connected_users = {}
 current_live_session = None
-message_queue = []
-overlay_queue = []
+
+# Estado recente da live em buffers circulares (tamanho limitado)
+LIVE_BUFFER_SIZE = int(os.getenv('LIVE_BUFFER_SIZE', 200))
+BACKFILL_SIZE = int(os.getenv('BACKFILL_SIZE', 50))
+message_queue = RingBuffer(LIVE_BUFFER_SIZE)
+overlay_queue = RingBuffer(LIVE_BUFFER_SIZE)
 
 # Eventos WebSocket
 @socketio.on('connect')
-def handle_connect():
-    """Usuário conectou"""
+def handle_connect(auth=None):
+    """Usuário conectou (auth.last_seq e auth.epoch informam o último evento recebido antes de cair)"""
     user_id = session.get('user_id')
     if user_id:
-        connected_users[request.sid] = user_id
-        join_room('live_room')
-        emit('connected', {'status': 'success', 'message': 'Conectado à live!'})
+        # Clientes do protocolo compacto ficam em uma sala paralela que recebe quadros binários
+        compact = wants_compact(request.args)
+        room = room_shards.assign(request.sid, 'live_room')
+        if compact:
+            room = compact_room(room)
+        join_room(room)
+        slow_consumers.track(request.sid, room)
         
-        # Enviar estatísticas atuais
-        emit('stats_update', {
-            'online_users': len(connected_users),
-            'total_messages': len(message_queue)
-        }, room='live_room')
+        connected = {'status': 'success', 'message': 'Conectado à live!', 'protocol': 'json'}
+        if compact:
+            connected.update(protocol='compact', schema=get_schema())
+        emit('connected', connected)
+        
+        # Reconexão na mesma época e dentro da janela: apenas os eventos perdidos; senão, snapshot completo
+        auth = auth or {}
+        last_seq = parse_seq(auth.get('last_seq'))
+        missed = event_log.since('live_room', last_seq, auth.get('epoch')) if last_seq is not None else None
+        if missed is not None:
+            emit('resync', {'events': missed, 'seq': last_seq + len(missed), 'epoch': event_log.epoch})
+        else:
+            emit('backfill', get_live_snapshot())
+        
+        # Estatísticas vão para a sala no próximo intervalo de presença
+        presence.join(request.sid, 'live_room', user_id)
         
         logger.info(f"Usuário {user_id} conectado - SID: {request.sid}")
     else:
@@ -85,15 +180,12 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     """Usuário desconectou"""
-    user_id = connected_users.pop(request.sid, None)
+    user_id = presence.leave(request.sid)
+    slow_consumers.forget(request.sid)
+    room_shards.release(request.sid)
     if user_id:
         leave_room('live_room')
         
-        # Atualizar estatísticas
-        emit('stats_update', {
-            'online_users': len(connected_users)
-        }, room='live_room')
-        
         logger.info(f"Usuário {user_id} desconectado - SID: {request.sid}")
 
 @socketio.on('send_message')
@@ -116,42 +208,46 @@ def handle_message(data):
         emit('error', {'message': 'Mensagem inválida (máximo 250 caracteres)'})
         return
     
-    # TODO: Implementar rate limiting
+    forbidden = find_forbidden_words(fake_name) + find_forbidden_words(content)
+    if forbidden:
+        emit('error', {'message': f'Palavra não permitida: {forbidden[0]}'})
+        return
+    
+    allowed, retry_after = check_rate_limit(user_id, 'message')
+    if not allowed:
+        emit('error', {
+            'message': 'Muitas mensagens em pouco tempo. Aguarde um momento.',
+            'retry_after': retry_after
+        })
+        return
+    
+    # Reservar ID e enfileirar gravação; o banco é atualizado em lote
+    row = message_writer.submit(user_id, fake_name, content)
+    if row is None:
+        emit('error', {'message': 'Chat sobrecarregado. Tente novamente em instantes.'})
+        return
     
-    # Salvar mensagem no banco
-    from src.models.database import Message
-    message = Message(
-        user_id=user_id,
+    # Adicionar à fila de mensagens
+    record = ChatMessageRecord(
+        id=row['id'],
         fake_name=fake_name,
-        content=content
+        content=content,
+        likes=0,
+        timestamp=row['created_at'].isoformat()
     )
+    message_queue.append(record)
+    message_data = payload_cache.get(record.id, 'live', (0,), record.to_dict).data
+    message_ranking.add(row['id'], fake_name, content, row['created_at'])
+    message_stats.on_message_created(row['id'], fake_name, content, row['created_at'])
+    presence.touch('live_room')
     
-    try:
-        db.session.add(message)
-        db.session.commit()
-        
-        # Adicionar à fila de mensagens
-        message_data = {
-            'id': message.id,
-            'fake_name': fake_name,
-            'content': content,
-            'likes': 0,
-            'timestamp': datetime.utcnow().isoformat()
-        }
-        message_queue.append(message_data)
-        
-        # Notificar todos os usuários
-        emit('new_message', message_data, room='live_room')
-        
-        # Notificar overlay (se configurado)
-        emit('overlay_message', message_data, room='overlay_room')
-        
-        logger.info(f"Nova mensagem de {fake_name}: {content}")
-        
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Erro ao salvar mensagem: {e}")
-        emit('error', {'message': 'Erro ao enviar mensagem'})
+    # Notificar todos os usuários
+    broadcast_to_users('new_message', message_data)
+    
+    # Notificar overlay (se configurado)
+    broadcast_to_overlay('overlay_message', message_data)
+    
+    logger.info(f"Nova mensagem de {fake_name}: {content}")
 
 @socketio.on('like_message')
 def handle_like_message(data):
@@ -161,23 +257,33 @@ def handle_like_message(data):
         emit('error', {'message': 'Usuário não autenticado'})
         return
     
-    message_id = data.get('message_id')
-    if not message_id:
+    try:
+        message_id = int(data.get('message_id'))
+    except (TypeError, ValueError):
         emit('error', {'message': 'ID da mensagem inválido'})
         return
     
-    # TODO: Implementar sistema de likes no banco
-    # Por enquanto, apenas emitir atualização
-    emit('message_liked', {
-        'message_id': message_id,
-        'likes': 1  # Placeholder
-    }, room='live_room')
+    allowed, retry_after = check_rate_limit(user_id, 'like')
+    if not allowed:
+        emit('error', {
+            'message': 'Muitos likes em pouco tempo. Aguarde um momento.',
+            'retry_after': retry_after
+        })
+        return
+    
+    # O agregador transmite 'message_liked' uma vez por janela
+    result = like_aggregator.toggle(message_id, user_id)
+    if result is None:
+        emit('error', {'message': 'Mensagem não encontrada'})
 
 @socketio.on('join_overlay')
 def handle_join_overlay():
     """OBS conectou para receber overlays"""
     join_room('overlay_room')
     emit('overlay_connected', {'status': 'success'})
+    
+    # Reenviar eventos recentes para o OBS recém-conectado
+    emit('backfill', {'events': overlay_queue.dicts(BACKFILL_SIZE)})
     logger.info("OBS conectado para overlays")
 
 @socketio.on('vote_poll')
@@ -189,18 +295,27 @@ def handle_vote_poll(data):
         return
     
     poll_id = data.get('poll_id')
-    option = data.get('option')  # 'A' ou 'B'
+    option_id = data.get('option_id')
     
-    if not poll_id or option not in ['A', 'B']:
+    if not isinstance(poll_id, int) or not isinstance(option_id, int):
         emit('error', {'message': 'Dados de votação inválidos'})
         return
     
-    # TODO: Implementar votação no banco
-    # Por enquanto, apenas emitir atualização
-    emit('poll_vote_update', {
-        'poll_id': poll_id,
-        'option': option
-    }, room='live_room')
+    allowed, retry_after = check_rate_limit(user_id, 'vote')
+    if not allowed:
+        emit('error', {
+            'message': 'Muitos votos em pouco tempo. Aguarde um momento.',
+            'retry_after': retry_after
+        })
+        return
+    
+    # Mesma apuração da rota HTTP (a contagem sai no próximo 'poll_tally')
+    result = poll_service.vote_on_poll(poll_id, option_id, user_id)
+    if 'error' in result:
+        emit('error', {'message': result['error']})
+        return
+    
+    emit('vote_registered', {'poll_id': poll_id, 'option_id': option_id})
 
 # Rotas principais
 @app.route('/', defaults={'path': ''})
@@ -226,22 +341,140 @@ def health_check():
     return {
         'status': 'ok',
         'timestamp': datetime.utcnow().isoformat(),
-        'connected_users': len(connected_users),
-        'message_queue_size': len(message_queue)
+        'worker': WORKER_ID,
+        'state_backend': type(state_backend).__name__,
+        'connected_users': presence.count('live_room'),
+        'presence': presence.get_stats(),
+        'message_queue_size': len(message_queue),
+        'message_writer': message_writer.get_stats(),
+        'payload_cache': payload_cache.get_stats(),
+        'event_batcher': event_batcher.get_stats(),
+        'slow_consumers': slow_consumers.get_stats(),
+        'room_shards': room_shards.get_stats(),
+        'scheduler': scheduler.get_stats(),
+        'vote_tally': poll_service.tally.get_stats(),
+        'poll_tally': poll_publisher.get_stats()
+    }
+
+@app.route('/api/presence')
+def presence_count():
+    """Usuários online (contagem mantida em memória)"""
+    return {
+        'online_users': presence.count('live_room'),
+        'rooms': presence.get_counts()
     }
 
 # Funções utilitárias para outros módulos
-def broadcast_to_overlay(event, data):
-    """Enviar dados para overlay do OBS"""
-    socketio.emit(event, data, room='overlay_room')
+def parse_seq(value):
+    """Converter seq enviado pelo cliente (None se ausente/inválido)"""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def get_live_snapshot():
+    """Estado completo da live para quem conecta ou ficou fora da janela do log"""
+    seq = event_log.current_seq('live_room')
+    return {
+        'seq': seq,
+        'epoch': event_log.epoch,
+        'messages': get_backfill_messages(),
+        'stats': {
+            'online_users': presence.count('live_room'),
+            'total_messages': message_stats.total
+        },
+        'polls': get_active_polls()
+    }
+
+def get_backfill_messages():
+    """Últimas mensagens da live com a contagem de likes atual (payloads em cache)"""
+    messages = []
+    for record in message_queue.last(BACKFILL_SIZE):
+        likes = like_aggregator.get_likes_count(record.id)
+        if likes is None:
+            likes = record.likes
+        payload = payload_cache.get(
+            record.id, 'live', (likes,),
+            lambda record=record, likes=likes: dict(record.to_dict(), likes=likes)
+        )
+        messages.append(payload.data)
+    return messages
+
+def broadcast_to_overlay(event, data, priority=None):
+    """Enviar dados para overlay do OBS (eventos prioritários não esperam o lote)"""
+    overlay_queue.append(OverlayEventRecord(
+        event=event,
+        data=data,
+        timestamp=datetime.utcnow().isoformat()
+    ))
+    if priority is None:
+        priority = event in OVERLAY_PRIORITY_EVENTS
+    emit_to_room(event, data, 'overlay_room', logged=False, immediate=priority)
+
+def compact_room(room):
+    """Sala paralela dos clientes que negociaram o protocolo compacto"""
+    return f'{room}:compact'
+
+def is_compact_room(room):
+    """Verificar se a sala (ou sub-sala) é a paralela do protocolo compacto"""
+    return room.endswith(':compact')
+
+def emit_to_room(event, data, room, logged=True, immediate=False, **kwargs):
+    """Enviar evento para a sala em JSON e, uma única vez codificado, em binário para os clientes compactos"""
+    if logged:
+        # Número de sequência para o cliente pedir só o que perdeu ao reconectar
+        seq = event_log.append(room, event, data)
+        data = dict(data, seq=seq)
+
+    # Opções do emit (ex.: ignore_queue) valem só para este evento, então ele não entra no lote
+    if not immediate and not kwargs:
+        event_batcher.queue(room, event, data)
+        return
+
+    compact = encode_event(event, data) if room in COMPACT_ROOMS else None
+    room_shards.fan_out(room, lambda shard: emit_frames(shard, event, data, COMPACT_EVENT, compact, **kwargs))
+    shed_to_degraded(room, [(event, data)])
+
+def send_batch(room, events):
+    """Enviar os eventos acumulados da sala: ['batch', [[evento, dados], ...]] e um único binário compacto"""
+    shed_to_degraded(room, events)
+    if len(events) == 1:
+        event, data = events[0]
+        compact = encode_event(event, data) if room in COMPACT_ROOMS else None
+        room_shards.fan_out(room, lambda shard: emit_frames(shard, event, data, COMPACT_EVENT, compact))
+        return
+
+    batch = [[event, data] for event, data in events]
+    compact = encode_batch(events) if room in COMPACT_ROOMS else None
+    room_shards.fan_out(room, lambda shard: emit_frames(shard, 'batch', batch, COMPACT_BATCH_EVENT, compact))
+
+def emit_frames(room, event, data, compact_event, compact, **kwargs):
+    """Enviar a (sub-)sala o evento JSON e, se houver, o binário já codificado para os clientes compactos"""
+    socketio.emit(event, data, room=room, **kwargs)
+    if compact is not None:
+        socketio.emit(compact_event, compact, room=compact_room(room), **kwargs)
+
+def shed_to_degraded(room, events):
+    """Repassar eventos da sala ao monitor, que os reduz para os clientes lentos"""
+    for shard in room_shards.rooms(room):
+        slow_consumers.shed(shard, events)
+        if room in COMPACT_ROOMS:
+            slow_consumers.shed(compact_room(shard), events)
+
+def send_degraded(room, events):
+    """Enviar lote reduzido aos clientes lentos da sala (binário para os do protocolo compacto)"""
+    if is_compact_room(room):
+        socketio.emit(COMPACT_BATCH_EVENT, encode_batch(events), room=degraded_room(room))
+    else:
+        socketio.emit('batch', [[event, data] for event, data in events], room=degraded_room(room))
 
 def broadcast_to_users(event, data):
     """Enviar dados para todos os usuários"""
-    socketio.emit(event, data, room='live_room')
+    emit_to_room(event, data, 'live_room')
 
 def get_connected_users_count():
     """Obter número de usuários conectados"""
-    return len(connected_users)
+    return presence.count('live_room')
 
 if __name__ == '__main__':
     logger.info("Iniciando MOEDOR AO VIVO...")
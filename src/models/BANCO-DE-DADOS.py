@@ -3,6 +3,17 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+def insert_ignoring_conflicts(table):
+    """INSERT que descarta linhas repetidas (constraints unique) no dialeto do banco em uso"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"INSERT ignorando conflitos não suportado no banco {dialect}")
+    return insert(table).on_conflict_do_nothing()
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -34,6 +45,9 @@ class Message(db.Model):
     displayed_at = db.Column(db.DateTime, nullable=True)
     is_displayed = db.Column(db.Boolean, default=False)
     
+    # Índice para paginação por cursor (likes, data, id)
+    __table_args__ = (db.Index('ix_messages_ranking', 'likes_count', 'created_at', 'id'),)
+    
     def __repr__(self):
         return f'<Message {self.fake_name}: {self.content[:50]}>'
 
@@ -69,28 +83,39 @@ class Poll(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
-    option_a = db.Column(db.String(200), nullable=False)
-    option_b = db.Column(db.String(200), nullable=False)
-    votes_a = db.Column(db.Integer, default=0)
-    votes_b = db.Column(db.Integer, default=0)
+    context = db.Column(db.String(50), nullable=True)  # momento_polemico, manual, ...
+    source_content = db.Column(db.Text, nullable=True)  # Trecho da transcrição que gerou a enquete
+    source_timestamp = db.Column(db.Float, nullable=True)  # Segundos da transcrição
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    ends_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    closed_at = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
-    is_automatic = db.Column(db.Boolean, default=False)  # Gerada automaticamente pelo Whisper
     
     # Relacionamentos
+    options = db.relationship('PollOption', backref='poll', lazy=True, order_by='PollOption.position')
     votes = db.relationship('PollVote', backref='poll', lazy=True)
     
     def __repr__(self):
         return f'<Poll: {self.question[:50]}>'
 
+class PollOption(db.Model):
+    __tablename__ = 'poll_options'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    poll_id = db.Column(db.Integer, db.ForeignKey('polls.id'), nullable=False, index=True)
+    text = db.Column(db.String(200), nullable=False)
+    position = db.Column(db.Integer, default=0)  # Ordem de exibição
+    
+    def __repr__(self):
+        return f'<PollOption {self.poll_id}: {self.text}>'
+
 class PollVote(db.Model):
     __tablename__ = 'poll_votes'
     
     id = db.Column(db.Integer, primary_key=True)
     poll_id = db.Column(db.Integer, db.ForeignKey('polls.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    option = db.Column(db.String(1), nullable=False)  # 'A' ou 'B'
+    option_id = db.Column(db.Integer, db.ForeignKey('poll_options.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Constraint para evitar voto duplo
@@ -182,3 +207,27 @@ class FunnyFace(db.Model):
     def __repr__(self):
         return f'<FunnyFace {self.expression_type} - {self.confidence_score}>'
 
+
+class PollResultSnapshot(db.Model):
+    __tablename__ = 'poll_result_snapshots'
+    
+    poll_id = db.Column(db.Integer, db.ForeignKey('polls.id'), primary_key=True)
+    question = db.Column(db.Text, nullable=False)
+    results = db.Column(db.Text, nullable=False)  # JSON com votos e porcentagem por opção
+    total_votes = db.Column(db.Integer, default=0)
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PollResultSnapshot {self.poll_id} - {self.total_votes} votos>'
+
+class PollLeaderboard(db.Model):
+    __tablename__ = 'poll_leaderboard'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Linha única (id 1)
+    closed_polls = db.Column(db.Integer, default=0)
+    total_votes = db.Column(db.Integer, default=0)  # Votos das enquetes encerradas
+    popular = db.Column(db.Text, nullable=False, default='[]')  # JSON com as enquetes mais votadas
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PollLeaderboard {self.closed_polls} enquetes>'
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.database import db, User, LiveSession
+from src.services.rate_limiter import check_rate_limit
 import requests
 import logging
 import hashlib
 import hmac
 import json
 from datetime import datetime
+from functools import wraps
 import os
 
 logger = logging.getLogger(__name__)
@@ -17,6 +19,24 @@ HOTMART_HOTTOK = os.getenv('HOTMART_WEBHOOK_SECRET', 'your_hottok_here')
 HOTMART_CLIENT_ID = os.getenv('HOTMART_CLIENT_ID', 'your_client_id')
 HOTMART_CLIENT_SECRET = os.getenv('HOTMART_CLIENT_SECRET', 'your_client_secret')
 
+# E-mails (separados por vírgula) dos usuários com acesso às rotas de administração
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+def is_admin():
+    """Verificar se a sessão atual é de um administrador"""
+    return (session.get('user_email') or '').lower() in ADMIN_EMAILS
+
+def admin_required(view):
+    """Restringir a rota a administradores logados"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not session.get('user_id'):
+            return jsonify({'error': 'Login necessário'}), 401
+        if not is_admin():
+            return jsonify({'error': 'Acesso restrito a administradores'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 def verify_hotmart_signature(request_data, signature):
     """Verificar assinatura do webhook Hotmart usando hottok"""
     try:
@@ -172,6 +192,14 @@ def login():
         if not email:
             return jsonify({'error': 'Email é obrigatório'}), 400
         
+        # Limitar tentativas por IP para evitar varredura de emails
+        allowed, retry_after = check_rate_limit(request.remote_addr, 'login')
+        if not allowed:
+            return jsonify({
+                'error': 'Muitas tentativas de login. Aguarde um momento.',
+                'retry_after': retry_after
+            }), 429
+        
         # Buscar usuário no banco
         user = User.query.filter_by(email=email).first()
         
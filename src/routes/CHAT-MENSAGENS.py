@@ -1,43 +1,60 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response
 from src.models.database import db, Message, MessageLike, User
+from src.services.rate_limiter import check_rate_limit
+from src.services.message_ranking import message_ranking
+from src.services.like_aggregator import like_aggregator
+from src.services.message_stats import message_stats
+from src.services.cleanup_service import cleanup_service
+from src.services.content_filter import find_forbidden_words
+from src.services.payload_cache import payload_cache, message_payload, assemble
+from sqlalchemy import or_, and_
 from datetime import datetime, timedelta
 import logging
+import base64
 import json
 
 logger = logging.getLogger(__name__)
 
 messages_bp = Blueprint('messages', __name__)
 
-# Rate limiting em memória (em produção, usar Redis)
-user_message_timestamps = {}
-user_like_timestamps = {}
+def encode_cursor(message):
+    """Codificar posição (likes, data, id) de uma mensagem em um cursor opaco"""
+    raw = json.dumps([message.likes_count, message.created_at.isoformat(), message.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
 
-def check_rate_limit(user_id, action='message', limit_per_minute=1):
-    """Verificar rate limiting para ações do usuário"""
-    now = datetime.utcnow()
-    
-    if action == 'message':
-        timestamps = user_message_timestamps.get(user_id, [])
-    else:  # likes
-        timestamps = user_like_timestamps.get(user_id, [])
-    
-    # Remover timestamps antigos (mais de 1 minuto)
-    recent_timestamps = [ts for ts in timestamps if now - ts < timedelta(minutes=1)]
-    
-    # Verificar se excedeu o limite
-    if len(recent_timestamps) >= limit_per_minute:
-        return False, recent_timestamps
-    
-    # Adicionar timestamp atual
-    recent_timestamps.append(now)
+def decode_cursor(cursor):
+    """Decodificar cursor em (likes, data, id); ValueError se inválido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        likes_count, created_at, message_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(likes_count), datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+def get_messages_by_cursor(cursor, per_page):
+    """Página por keyset: sem COUNT nem OFFSET, custo constante em qualquer profundidade"""
+    query = Message.query.order_by(
+        Message.likes_count.desc(),
+        Message.created_at.desc(),
+        Message.id.desc()
+    )
     
-    # Atualizar cache
-    if action == 'message':
-        user_message_timestamps[user_id] = recent_timestamps
-    else:
-        user_like_timestamps[user_id] = recent_timestamps
+    if cursor:
+        likes_count, created_at, message_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Message.likes_count < likes_count,
+            and_(Message.likes_count == likes_count, Message.created_at < created_at),
+            and_(Message.likes_count == likes_count, Message.created_at == created_at, Message.id < message_id)
+        ))
     
-    return True, recent_timestamps
+    # Buscar um item a mais para saber se existe próxima página
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    return rows[:per_page], has_more
+
+def json_bytes(payload, status=200):
+    """Resposta JSON a partir de bytes já montados"""
+    return Response(payload, status=status, mimetype='application/json')
 
 @messages_bp.route('/', methods=['GET'])
 def get_messages():
@@ -46,9 +63,27 @@ def get_messages():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        # Limitar per_page
-        per_page = min(per_page, 50)
-        
+        # Limitar per_page (zero ou negativo deixaria o cursor sem último item)
+        per_page = max(1, min(per_page, 50))
+        
+        # Modo cursor (keyset): ?mode=cursor ou ?cursor=<token>
+        cursor = request.args.get('cursor')
+        if cursor is not None or request.args.get('mode') == 'cursor':
+            try:
+                items, has_more = get_messages_by_cursor(cursor, per_page)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return json_bytes(assemble(
+                messages=[message_payload(message) for message in items],
+                pagination={
+                    'per_page': per_page,
+                    'next_cursor': encode_cursor(items[-1]) if has_more else None,
+                    'has_next': has_more
+                }
+            ))
+        
+        # Modo offset (painel admin)
         # Buscar mensagens ordenadas por likes e data
         messages = Message.query.order_by(
             Message.likes_count.desc(),
@@ -59,21 +94,11 @@ def get_messages():
             error_out=False
         )
         
-        messages_data = []
-        for message in messages.items:
-            messages_data.append({
-                'id': message.id,
-                'fake_name': message.fake_name,
-                'content': message.content,
-                'likes_count': message.likes_count,
-                'created_at': message.created_at.isoformat(),
-                'displayed_at': message.displayed_at.isoformat() if message.displayed_at else None,
-                'is_displayed': message.is_displayed
-            })
+        messages_data = [message_payload(message) for message in messages.items]
         
-        return jsonify({
-            'messages': messages_data,
-            'pagination': {
+        return json_bytes(assemble(
+            messages=messages_data,
+            pagination={
                 'page': page,
                 'per_page': per_page,
                 'total': messages.total,
@@ -81,7 +106,7 @@ def get_messages():
                 'has_next': messages.has_next,
                 'has_prev': messages.has_prev
             }
-        })
+        ))
         
     except Exception as e:
         logger.error(f"Erro ao buscar mensagens: {e}")
@@ -96,53 +121,24 @@ def like_message(message_id):
     
     try:
         # Verificar rate limiting
-        allowed, timestamps = check_rate_limit(user_id, 'like', limit_per_minute=10)
+        allowed, retry_after = check_rate_limit(user_id, 'like')
         if not allowed:
             return jsonify({
                 'error': 'Muitos likes em pouco tempo. Aguarde um momento.',
-                'retry_after': 60
+                'retry_after': retry_after
             }), 429
         
-        # Verificar se mensagem existe
-        message = Message.query.get(message_id)
-        if not message:
+        # Likes são agregados em memória e persistidos/transmitidos em lote
+        result = like_aggregator.toggle(message_id, user_id)
+        if result is None:
             return jsonify({'error': 'Mensagem não encontrada'}), 404
         
-        # Verificar se usuário já curtiu
-        existing_like = MessageLike.query.filter_by(
-            message_id=message_id,
-            user_id=user_id
-        ).first()
-        
-        if existing_like:
-            # Remover like (descurtir)
-            db.session.delete(existing_like)
-            message.likes_count = max(0, message.likes_count - 1)
-            action = 'unliked'
-        else:
-            # Adicionar like
-            new_like = MessageLike(
-                message_id=message_id,
-                user_id=user_id
-            )
-            db.session.add(new_like)
-            message.likes_count += 1
-            action = 'liked'
-        
-        db.session.commit()
-        
-        # Notificar via WebSocket
-        from src.main import broadcast_to_users
-        broadcast_to_users('message_liked', {
-            'message_id': message_id,
-            'likes_count': message.likes_count,
-            'action': action
-        })
+        action, likes_count = result
         
         return jsonify({
             'status': 'success',
             'action': action,
-            'likes_count': message.likes_count
+            'likes_count': likes_count
         })
         
     except Exception as e:
@@ -154,24 +150,13 @@ def like_message(message_id):
 def get_top_message():
     """Obter mensagem com mais likes (para exibir no OBS)"""
     try:
-        # Buscar mensagem com mais likes que ainda não foi exibida
-        top_message = Message.query.filter_by(is_displayed=False).order_by(
-            Message.likes_count.desc(),
-            Message.created_at.desc()
-        ).first()
+        # Mensagem com mais likes que ainda não foi exibida (índice em memória)
+        top_message = message_ranking.get_top()
         
         if not top_message:
             return jsonify({'message': None})
         
-        return jsonify({
-            'message': {
-                'id': top_message.id,
-                'fake_name': top_message.fake_name,
-                'content': top_message.content,
-                'likes_count': top_message.likes_count,
-                'created_at': top_message.created_at.isoformat()
-            }
-        })
+        return json_bytes(assemble(message=message_payload(top_message, 'top')))
         
     except Exception as e:
         logger.error(f"Erro ao buscar mensagem top: {e}")
@@ -185,10 +170,16 @@ def mark_message_displayed(message_id):
         if not message:
             return jsonify({'error': 'Mensagem não encontrada'}), 404
         
+        was_displayed = message.is_displayed
         message.is_displayed = True
         message.displayed_at = datetime.utcnow()
         db.session.commit()
         
+        message_ranking.remove(message_id)
+        payload_cache.invalidate(message_id)
+        if not was_displayed:
+            message_stats.on_displayed()
+        
         return jsonify({'status': 'success'})
         
     except Exception as e:
@@ -200,37 +191,8 @@ def mark_message_displayed(message_id):
 def get_message_stats():
     """Obter estatísticas de mensagens"""
     try:
-        total_messages = Message.query.count()
-        displayed_messages = Message.query.filter_by(is_displayed=True).count()
-        pending_messages = total_messages - displayed_messages
-        
-        # Mensagens por hora (últimas 24h)
-        last_24h = datetime.utcnow() - timedelta(hours=24)
-        recent_messages = Message.query.filter(
-            Message.created_at >= last_24h
-        ).count()
-        
-        # Top 5 mensagens por likes
-        top_messages = Message.query.order_by(
-            Message.likes_count.desc()
-        ).limit(5).all()
-        
-        top_messages_data = []
-        for msg in top_messages:
-            top_messages_data.append({
-                'id': msg.id,
-                'fake_name': msg.fake_name,
-                'content': msg.content[:100] + '...' if len(msg.content) > 100 else msg.content,
-                'likes_count': msg.likes_count
-            })
-        
-        return jsonify({
-            'total_messages': total_messages,
-            'displayed_messages': displayed_messages,
-            'pending_messages': pending_messages,
-            'recent_messages_24h': recent_messages,
-            'top_messages': top_messages_data
-        })
+        # Estatísticas mantidas em memória e já serializadas
+        return Response(message_stats.get_payload(), mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Erro ao buscar estatísticas: {e}")
@@ -262,12 +224,9 @@ def validate_message():
         elif len(content) < 3:
             errors.append('Mensagem deve ter pelo menos 3 caracteres')
         
-        # Verificar palavras proibidas (básico)
-        forbidden_words = ['spam', 'hack', 'bot']
-        content_lower = content.lower()
-        for word in forbidden_words:
-            if word in content_lower:
-                errors.append(f'Palavra não permitida: {word}')
+        # Verificar palavras proibidas (nome e conteúdo, uma passada cada)
+        for word in find_forbidden_words(fake_name) + find_forbidden_words(content):
+            errors.append(f'Palavra não permitida: {word}')
         
         if errors:
             return jsonify({
@@ -288,27 +247,15 @@ def validate_message():
 def get_message_queue():
     """Obter fila de mensagens para exibição no OBS"""
     try:
-        # Buscar mensagens não exibidas ordenadas por likes
-        queue_messages = Message.query.filter_by(is_displayed=False).order_by(
-            Message.likes_count.desc(),
-            Message.created_at.asc()
-        ).limit(10).all()
+        # Mensagens não exibidas ordenadas por likes (índice em memória)
+        queue_messages = message_ranking.get_queue(limit=10)
         
-        queue_data = []
-        for msg in queue_messages:
-            queue_data.append({
-                'id': msg.id,
-                'fake_name': msg.fake_name,
-                'content': msg.content,
-                'likes_count': msg.likes_count,
-                'created_at': msg.created_at.isoformat(),
-                'priority': msg.likes_count  # Prioridade baseada em likes
-            })
+        queue_data = [message_payload(msg, 'queue') for msg in queue_messages]
         
-        return jsonify({
-            'queue': queue_data,
-            'total_in_queue': len(queue_data)
-        })
+        return json_bytes(assemble(
+            queue=queue_data,
+            total_in_queue=len(queue_data)
+        ))
         
     except Exception as e:
         logger.error(f"Erro ao buscar fila de mensagens: {e}")
@@ -318,32 +265,19 @@ def get_message_queue():
 def cleanup_old_messages():
     """Limpar mensagens antigas (para admin)"""
     try:
-        # Remover mensagens com mais de 7 dias e 0 likes
-        cutoff_date = datetime.utcnow() - timedelta(days=7)
-        
-        old_messages = Message.query.filter(
-            Message.created_at < cutoff_date,
-            Message.likes_count == 0
-        ).all()
-        
-        count = len(old_messages)
-        
-        for msg in old_messages:
-            # Remover likes associados
-            MessageLike.query.filter_by(message_id=msg.id).delete()
-            db.session.delete(msg)
-        
-        db.session.commit()
-        
-        logger.info(f"Limpeza realizada: {count} mensagens removidas")
+        # A limpeza roda em lotes em segundo plano; acompanhar em /cleanup/status
+        started = cleanup_service.start()
         
         return jsonify({
-            'status': 'success',
-            'messages_removed': count
-        })
+            'status': 'started' if started else 'already_running',
+            'progress': cleanup_service.get_status()
+        }), 202 if started else 409
         
     except Exception as e:
         logger.error(f"Erro na limpeza de mensagens: {e}")
-        db.session.rollback()
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@messages_bp.route('/cleanup/status', methods=['GET'])
+def get_cleanup_status():
+    """Obter progresso da limpeza (para admin)"""
+    return jsonify(cleanup_service.get_status())
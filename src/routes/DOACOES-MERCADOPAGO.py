@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.database import db, Donation, User, LiveSession
 import mercadopago
+from mercadopago.http.http_client import HttpClient
 import logging
 import hashlib
 import hmac
@@ -17,8 +18,26 @@ MP_ACCESS_TOKEN = os.getenv('MERCADOPAGO_ACCESS_TOKEN', 'your_access_token')
 MP_PUBLIC_KEY = os.getenv('MERCADOPAGO_PUBLIC_KEY', 'your_public_key')
 MP_WEBHOOK_SECRET = os.getenv('MERCADOPAGO_WEBHOOK_SECRET', 'your_webhook_secret')
 
+# Endereço alternativo da API (ex.: Mercado Pago falso do TESTE-CARGA.py); vazio usa a API real
+MP_API_BASE_URL = os.getenv('MERCADOPAGO_API_BASE_URL', '').rstrip('/')
+MP_DEFAULT_API_BASE_URL = 'https://api.mercadopago.com'
+
+class BaseUrlHttpClient(HttpClient):
+    """Cliente HTTP do SDK que envia as chamadas para outro endereço da API"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if url.startswith(MP_DEFAULT_API_BASE_URL):
+            url = self.base_url + url[len(MP_DEFAULT_API_BASE_URL):]
+        return super().request(method, url, maxretries=maxretries, **kwargs)
+
 # Inicializar SDK do Mercado Pago
-sdk = mercadopago.SDK(MP_ACCESS_TOKEN)
+sdk = mercadopago.SDK(
+    MP_ACCESS_TOKEN,
+    http_client=BaseUrlHttpClient(MP_API_BASE_URL) if MP_API_BASE_URL else None
+)
 
 def verify_mercadopago_signature(request_data, signature_header):
     """Verificar assinatura do webhook Mercado Pago"""
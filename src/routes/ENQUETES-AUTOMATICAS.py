@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from src.services.poll_service import poll_service
+from src.services.rate_limiter import check_rate_limit
+from src.routes.auth import admin_required
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +26,13 @@ def vote_poll(poll_id):
     if not user_id:
         return jsonify({'error': 'Usuário não autenticado'}), 401
     
+    allowed, retry_after = check_rate_limit(user_id, 'vote')
+    if not allowed:
+        return jsonify({
+            'error': 'Muitos votos em pouco tempo. Aguarde um momento.',
+            'retry_after': retry_after
+        }), 429
+    
     try:
         data = request.get_json()
         option_id = data.get('option_id')
@@ -104,6 +113,42 @@ def create_poll():
         logger.error(f"Erro ao criar enquete: {e}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@polls_bp.route('/<int:poll_id>/extend', methods=['POST'])
+@admin_required
+def extend_poll(poll_id):
+    """Prorrogar enquete aberta (apenas admin)"""
+    try:
+        data = request.get_json() or {}
+        minutes = data.get('minutes', 5)
+        
+        # bool é subclasse de int: True não conta como 1 minuto
+        if not isinstance(minutes, int) or isinstance(minutes, bool) or not 1 <= minutes <= 60:
+            return jsonify({'error': 'Prorrogação deve ser entre 1 e 60 minutos'}), 400
+        
+        expires_at = poll_service.extend_poll(poll_id, minutes)
+        if expires_at is None:
+            return jsonify({'error': 'Enquete não encontrada ou já encerrada'}), 404
+        
+        return jsonify({'status': 'success', 'poll_id': poll_id, 'expires_at': expires_at})
+        
+    except Exception as e:
+        logger.error(f"Erro ao prorrogar enquete: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@polls_bp.route('/<int:poll_id>/close', methods=['POST'])
+@admin_required
+def close_poll(poll_id):
+    """Encerrar enquete antes do prazo (apenas admin)"""
+    try:
+        if not poll_service.close_poll(poll_id):
+            return jsonify({'error': 'Enquete não encontrada ou já encerrada'}), 404
+        
+        return jsonify({'status': 'success', 'poll_id': poll_id})
+        
+    except Exception as e:
+        logger.error(f"Erro ao encerrar enquete: {e}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @polls_bp.route('/stats', methods=['GET'])
 def get_stats():
     """Obter estatísticas das enquetes"""
@@ -0,0 +1,158 @@
+import time
+import heapq
+import calendar
+import itertools
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+def to_timestamp(when):
+    """Converter datetime (UTC, sem fuso) ou timestamp em segundos desde a época"""
+    if isinstance(when, datetime):
+        if when.tzinfo is not None:
+            return when.timestamp()
+        return calendar.timegm(when.utctimetuple()) + when.microsecond / 1e6
+    return float(when)
+
+class ScheduledTask:
+    """Tarefa agendada (entradas canceladas ou remarcadas continuam no heap até saírem)"""
+
+    __slots__ = ('key', 'deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, key, deadline, callback, args):
+        self.key = key
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+class Scheduler:
+    """Uma única thread executa todas as tarefas agendadas, na ordem dos prazos (min-heap)"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        # (prazo, ordem, tarefa)
+        self.heap = []
+        # chave -> tarefa pendente
+        self.tasks = {}
+        self.counter = itertools.count()
+        self.app = None
+        self.thread = None
+        self.executed = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        """Executar as tarefas no contexto da aplicação e iniciar a thread do agendador"""
+        self.app = app
+
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run_loop, daemon=True)
+                self.thread.start()
+                logger.info("Agendador iniciado")
+
+    def schedule(self, key, when, callback, *args):
+        """Agendar callback(*args) para o instante informado; substitui a tarefa com a mesma chave"""
+        deadline = to_timestamp(when)
+        with self.condition:
+            previous = self.tasks.get(key)
+            if previous is not None:
+                previous.cancelled = True
+            task = ScheduledTask(key, deadline, callback, args)
+            self.tasks[key] = task
+            heapq.heappush(self.heap, (deadline, next(self.counter), task))
+            if len(self.heap) > 2 * len(self.tasks) + 64:
+                self._compact()
+            self.condition.notify()
+        return deadline
+
+    def _compact(self):
+        """Reconstruir o heap só com as tarefas pendentes (muitas remarcações deixam entradas mortas)"""
+        self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+        heapq.heapify(self.heap)
+
+    def cancel(self, key):
+        """Cancelar tarefa pendente; retorna False se não havia"""
+        with self.condition:
+            task = self.tasks.pop(key, None)
+            if task is None:
+                return False
+            task.cancelled = True
+            self.condition.notify()
+            return True
+
+    def extend(self, key, seconds):
+        """Adiar (ou adiantar, com valor negativo) tarefa pendente; retorna o novo prazo ou None"""
+        with self.condition:
+            task = self.tasks.get(key)
+            if task is None:
+                return None
+            return self.schedule(key, task.deadline + seconds, task.callback, *task.args)
+
+    def get_deadline(self, key):
+        """Prazo (timestamp) da tarefa pendente, ou None"""
+        task = self.tasks.get(key)
+        return task.deadline if task is not None else None
+
+    def _next_due(self):
+        """Aguardar e retirar a próxima tarefa vencida"""
+        with self.condition:
+            while True:
+                # Descartar entradas canceladas/remarcadas do topo
+                while self.heap and self.heap[0][2].cancelled:
+                    heapq.heappop(self.heap)
+
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                deadline, _, task = self.heap[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+
+                heapq.heappop(self.heap)
+                self.tasks.pop(task.key, None)
+                return task
+
+    def _execute(self, task):
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    task.callback(*task.args)
+            else:
+                task.callback(*task.args)
+            self.executed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Erro ao executar tarefa agendada {task.key}: {e}")
+
+    def _run_loop(self):
+        while True:
+            self._execute(self._next_due())
+
+    def get_stats(self):
+        """Obter métricas do agendador"""
+        with self.condition:
+            upcoming = min((task.deadline for task in self.tasks.values()), default=None)
+            return {
+                'pending': len(self.tasks),
+                'heap_size': len(self.heap),
+                'executed': self.executed,
+                'failed': self.failed,
+                'next_in_seconds': round(upcoming - time.time(), 1) if upcoming is not None else None
+            }
+
+# Instância global do agendador
+scheduler = Scheduler()
+
+def schedule_task(key, when, callback, *args):
+    """Função helper para agendar tarefa"""
+    return scheduler.schedule(key, when, callback, *args)
+
+def cancel_task(key):
+    """Função helper para cancelar tarefa"""
+    return scheduler.cancel(key)
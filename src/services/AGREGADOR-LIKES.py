@@ -0,0 +1,283 @@
+import os
+import time
+import atexit
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Janela de agregação dos likes (em milissegundos)
+LIKE_FLUSH_INTERVAL_MS = int(os.getenv('LIKE_FLUSH_INTERVAL_MS', 250))
+
+# Tempo sem atividade até o estado de uma mensagem sair da memória (segundos)
+LIKE_STATE_IDLE_SECONDS = int(os.getenv('LIKE_STATE_IDLE_SECONDS', 600))
+
+# Tentativas de gravar os likes de uma mensagem antes de descartá-los
+LIKE_FLUSH_MAX_ATTEMPTS = 3
+
+class _MessageLikeState:
+    """Estado de likes de uma mensagem mantido em memória"""
+
+    __slots__ = ('message_id', 'fake_name', 'content', 'likes_count', 'likers', 'added', 'removed', 'dirty', 'touched_at',
+                 'failures')
+
+    def __init__(self, message_id, fake_name, content, likes_count, likers):
+        self.message_id = message_id
+        self.fake_name = fake_name
+        self.content = content
+        self.likes_count = likes_count
+        self.likers = likers
+        self.added = set()
+        self.removed = set()
+        self.dirty = False
+        self.touched_at = time.monotonic()
+        self.failures = 0
+
+class LikeAggregator:
+    """Agrega likes em memória e persiste/transmite uma vez por janela"""
+
+    def __init__(self, flush_interval_ms=LIKE_FLUSH_INTERVAL_MS, idle_seconds=LIKE_STATE_IDLE_SECONDS):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.idle_seconds = idle_seconds
+        self.lock = threading.Lock()
+        self.states = {}
+        self.app = None
+        self.thread = None
+        self.is_running = False
+
+    def init_app(self, app):
+        """Associar à aplicação Flask e iniciar o flush periódico"""
+        self.app = app
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Agregador de likes iniciado (janela de {int(self.flush_interval * 1000)} ms)")
+
+    def stop(self):
+        """Parar o flush periódico, persistindo o que estiver pendente"""
+        self.is_running = False
+        if self.app:
+            with self.app.app_context():
+                self.flush()
+
+    def toggle(self, message_id, user_id):
+        """Curtir/descurtir; retorna (ação, likes) ou None se a mensagem não existir"""
+        with self.lock:
+            state = self.states.get(message_id)
+
+        if state is None:
+            state = self._load_state(message_id)
+            if state is None:
+                return None
+
+        with self.lock:
+            state = self.states.setdefault(message_id, state)
+
+            if user_id in state.likers:
+                state.likers.discard(user_id)
+                if user_id in state.added:
+                    state.added.discard(user_id)
+                else:
+                    state.removed.add(user_id)
+                state.likes_count = max(0, state.likes_count - 1)
+                action = 'unliked'
+            else:
+                state.likers.add(user_id)
+                if user_id in state.removed:
+                    state.removed.discard(user_id)
+                else:
+                    state.added.add(user_id)
+                state.likes_count += 1
+                action = 'liked'
+
+            state.dirty = True
+            state.touched_at = time.monotonic()
+            likes_count = state.likes_count
+
+        # Atualizar posição na fila do OBS, payloads e estatísticas imediatamente
+        from src.services.message_ranking import message_ranking
+        from src.services.message_stats import message_stats
+        from src.services.payload_cache import payload_cache
+        message_ranking.update_likes(message_id, likes_count)
+        payload_cache.invalidate(message_id)
+        message_stats.on_like(message_id, likes_count, state.fake_name, state.content)
+
+        return action, likes_count
+
+    def get_likes_count(self, message_id):
+        """Obter contagem de likes em memória (None se a mensagem não está carregada)"""
+        with self.lock:
+            state = self.states.get(message_id)
+            return state.likes_count if state else None
+
+    def forget(self, message_id):
+        """Descartar o estado de uma mensagem apagada"""
+        with self.lock:
+            self.states.pop(message_id, None)
+
+    def _load_state(self, message_id):
+        """Carregar likes de uma mensagem do banco (apenas no primeiro acesso)"""
+        from src.models.database import Message, MessageLike
+        from src.services.message_writer import message_writer
+
+        # Mensagem recém-enviada que ainda aguarda gravação no banco
+        row = message_writer.get_pending(message_id)
+        if row is not None:
+            return _MessageLikeState(message_id, row['fake_name'], row['content'], 0, set())
+
+        message = Message.query.get(message_id)
+        if not message:
+            return None
+
+        likers = {
+            row.user_id for row in MessageLike.query.with_entities(MessageLike.user_id).filter_by(message_id=message_id)
+        }
+
+        return _MessageLikeState(message_id, message.fake_name, message.content, message.likes_count or 0, likers)
+
+    def _flush_loop(self):
+        while self.is_running:
+            time.sleep(self.flush_interval)
+            try:
+                if self.app:
+                    with self.app.app_context():
+                        self.flush()
+            except Exception as e:
+                logger.error(f"Erro no flush de likes: {e}")
+
+    def flush(self):
+        """Persistir likes pendentes em uma única transação e transmitir totais"""
+        from src.services.message_writer import message_writer
+
+        now = time.monotonic()
+        pending = []
+
+        with self.lock:
+            for message_id, state in list(self.states.items()):
+                if state.dirty and message_writer.is_pending(message_id):
+                    # Aguardar a mensagem ser gravada antes de gravar seus likes
+                    continue
+                if state.dirty:
+                    pending.append((message_id, state.likes_count, state.added, state.removed))
+                    state.added = set()
+                    state.removed = set()
+                    state.dirty = False
+                elif now - state.touched_at > self.idle_seconds:
+                    del self.states[message_id]
+
+        if not pending:
+            return
+
+        from sqlalchemy import delete, update, select, func
+        from src.models.database import db, Message, MessageLike, insert_ignoring_conflicts
+
+        try:
+            new_likes = [
+                {'message_id': message_id, 'user_id': user_id}
+                for message_id, _, added, _ in pending
+                for user_id in added
+            ]
+            if new_likes:
+                # Like repetido (ex.: gravado por outro worker) é ignorado pela constraint unique_message_like
+                db.session.execute(insert_ignoring_conflicts(MessageLike), new_likes)
+
+            for message_id, _, _, removed in pending:
+                if removed:
+                    db.session.execute(
+                        delete(MessageLike).where(
+                            MessageLike.message_id == message_id,
+                            MessageLike.user_id.in_(removed)
+                        )
+                    )
+
+            # Recontar a partir de message_likes: correto mesmo com vários workers curtindo a mesma mensagem
+            message_ids = [message_id for message_id, _, _, _ in pending]
+            db.session.execute(
+                update(Message).where(Message.id.in_(message_ids)).values(
+                    likes_count=select(func.count(MessageLike.id)).where(
+                        MessageLike.message_id == Message.id
+                    ).scalar_subquery()
+                ).execution_options(synchronize_session=False)
+            )
+            counts = dict(db.session.execute(
+                select(Message.id, Message.likes_count).where(Message.id.in_(message_ids))
+            ).all())
+
+            db.session.commit()
+
+        except Exception as e:
+            logger.error(f"Erro ao persistir likes agregados: {e}")
+            db.session.rollback()
+            self._requeue(pending)
+            return
+
+        with self.lock:
+            for message_id in message_ids:
+                state = self.states.get(message_id)
+                if state is not None:
+                    state.failures = 0
+
+        self._apply_counts(counts)
+
+        # Um único evento por mensagem por janela
+        from src.main import broadcast_to_users
+
+        for message_id, likes_count in counts.items():
+            broadcast_to_users('message_liked', {
+                'message_id': message_id,
+                'likes_count': likes_count
+            })
+
+    def _apply_counts(self, counts):
+        """Alinhar contagens em memória com o banco (likes gravados por outros workers)"""
+        from src.services.message_ranking import message_ranking
+        from src.services.payload_cache import payload_cache
+
+        changed = []
+        with self.lock:
+            for message_id, likes_count in counts.items():
+                state = self.states.get(message_id)
+                if state is None:
+                    continue
+                # Alterações feitas após o início do flush ainda não estão no banco
+                current = likes_count + len(state.added) - len(state.removed)
+                if current != state.likes_count:
+                    state.likes_count = current
+                    changed.append((message_id, current))
+
+        for message_id, likes_count in changed:
+            message_ranking.update_likes(message_id, likes_count)
+            payload_cache.invalidate(message_id)
+
+    def _requeue(self, pending):
+        """Devolver alterações não persistidas para a próxima janela (descartadas após várias falhas)"""
+        with self.lock:
+            for message_id, _, added, removed in pending:
+                state = self.states.get(message_id)
+                if state is None:
+                    continue
+                state.failures += 1
+                if state.failures >= LIKE_FLUSH_MAX_ATTEMPTS:
+                    # O estado volta a ser carregado do banco no próximo like
+                    del self.states[message_id]
+                    logger.error(f"Likes da mensagem {message_id} descartados após {state.failures} falhas "
+                                 f"(+{len(added)} / -{len(removed)})")
+                    continue
+                for user_id in added:
+                    if user_id in state.removed:
+                        state.removed.discard(user_id)
+                    else:
+                        state.added.add(user_id)
+                for user_id in removed:
+                    if user_id in state.added:
+                        state.added.discard(user_id)
+                    else:
+                        state.removed.add(user_id)
+                state.dirty = True
+
+# Instância global do agregador
+like_aggregator = LikeAggregator()
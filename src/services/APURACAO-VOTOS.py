@@ -0,0 +1,214 @@
+import os
+import time
+import atexit
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from src.services.state_backend import state_backend
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de gravação dos votos em lote (em milissegundos)
+VOTE_FLUSH_INTERVAL_MS = int(os.getenv('VOTE_FLUSH_INTERVAL_MS', 500))
+
+# Máximo de votos por INSERT
+VOTE_FLUSH_BATCH_SIZE = int(os.getenv('VOTE_FLUSH_BATCH_SIZE', 5000))
+
+# Falhas seguidas de um lote antes de gravá-lo voto a voto
+VOTE_FLUSH_MAX_ATTEMPTS = 3
+
+# Votos que nem sozinhos puderam ser gravados, mantidos para inspeção
+VOTE_DEAD_LETTERS = 10000
+
+class VoteTally:
+    """Apura votos em memória (quem já votou + contadores) e grava no banco em lotes"""
+
+    def __init__(self, backend=state_backend, flush_interval_ms=VOTE_FLUSH_INTERVAL_MS,
+                 batch_size=VOTE_FLUSH_BATCH_SIZE):
+        # Contadores (e, com vários workers, quem já votou) ficam no backend compartilhado
+        self.backend = backend
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        # poll_id -> conjunto de user_ids que já votaram
+        self.voters = {}
+        # Votos aguardando gravação
+        self.pending = []
+        self.failures = 0
+        self.dead_letters = deque(maxlen=VOTE_DEAD_LETTERS)
+        self.app = None
+        self.thread = None
+        self.is_running = False
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.ignored = 0
+
+    def init_app(self, app):
+        """Associar à aplicação Flask e iniciar a gravação periódica"""
+        self.app = app
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Apuração de votos iniciada (gravação a cada {int(self.flush_interval * 1000)} ms)")
+
+    def stop(self):
+        """Parar a gravação periódica, gravando o que estiver pendente"""
+        self.is_running = False
+        if self.app:
+            with self.app.app_context():
+                self.flush()
+
+    def _get_voters(self, poll_id):
+        """Conjunto de quem já votou (carregado do banco no primeiro voto da enquete neste processo)"""
+        with self.lock:
+            voters = self.voters.get(poll_id)
+        if voters is not None:
+            return voters
+
+        from src.models.database import PollVote
+        loaded = {
+            row.user_id for row in PollVote.query.with_entities(PollVote.user_id).filter_by(poll_id=poll_id)
+        }
+
+        with self.lock:
+            voters = self.voters.setdefault(poll_id, set())
+            voters |= loaded
+            return voters
+
+    def vote(self, poll_id, option_id, user_id):
+        """Registrar voto; retorna (votos da opção, total) ou None se o usuário já votou"""
+        voters = self._get_voters(poll_id)
+
+        with self.lock:
+            if user_id in voters:
+                self.rejected += 1
+                return None
+            voters.add(user_id)
+
+        if self.backend.shared:
+            # Outro worker pode ter recebido um voto do mesmo usuário
+            claimed = self.backend.update(
+                f'poll_voters:{poll_id}', user_id,
+                lambda current: (option_id, True) if current is None else (current, False)
+            )
+            if not claimed:
+                with self.lock:
+                    self.rejected += 1
+                return None
+
+        votes_ns = f'poll_votes:{poll_id}'
+        option_votes = self.backend.incr(votes_ns, option_id)
+        total_votes = self.backend.incr(votes_ns, 'total')
+
+        with self.lock:
+            self.accepted += 1
+            self.pending.append({
+                'poll_id': poll_id,
+                'option_id': option_id,
+                'user_id': user_id,
+                'created_at': datetime.utcnow()
+            })
+
+        return option_votes, total_votes
+
+    def forget(self, poll_id):
+        """Descartar o estado de uma enquete encerrada"""
+        with self.lock:
+            self.voters.pop(poll_id, None)
+        if self.backend.shared:
+            self.backend.clear(f'poll_voters:{poll_id}')
+
+    def _flush_loop(self):
+        while self.is_running:
+            time.sleep(self.flush_interval)
+            try:
+                if self.app:
+                    with self.app.app_context():
+                        self.flush()
+            except Exception as e:
+                logger.error(f"Erro na gravação de votos: {e}")
+
+    def flush(self):
+        """Gravar votos pendentes ignorando conflitos (a constraint unique_poll_vote descarta repetidos)"""
+        with self.lock:
+            pending, self.pending = self.pending, []
+
+        if not pending:
+            return
+
+        from src.models.database import db, PollVote, insert_ignoring_conflicts
+
+        # Tabela (Core) em vez do modelo: o resultado traz rowcount com os votos realmente inseridos
+        statement = insert_ignoring_conflicts(PollVote.__table__)
+        try:
+            inserted = 0
+            for start in range(0, len(pending), self.batch_size):
+                result = db.session.execute(statement, pending[start:start + self.batch_size])
+                inserted += max(result.rowcount, 0)
+            db.session.commit()
+
+        except Exception as e:
+            logger.error(f"Erro ao gravar {len(pending)} votos: {e}")
+            db.session.rollback()
+            with self.lock:
+                self.failures += 1
+                if self.failures < VOTE_FLUSH_MAX_ATTEMPTS:
+                    # Gravação idempotente: os votos voltam para a próxima tentativa
+                    self.pending[:0] = pending
+                    return
+                self.failures = 0
+            # Um voto ruim não deve segurar os outros para sempre
+            self._write_rows(statement, pending)
+            return
+
+        with self.lock:
+            self.failures = 0
+            self.flushed += inserted
+            self.ignored += len(pending) - inserted
+
+    def _write_rows(self, statement, rows):
+        """Gravar os votos um a um; os que falharem vão para dead_letters"""
+        from src.models.database import db
+
+        inserted = 0
+        failed = []
+        for row in rows:
+            try:
+                inserted += max(db.session.execute(statement, [row]).rowcount, 0)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                failed.append(row)
+                logger.error(f"Voto do usuário {row['user_id']} na enquete {row['poll_id']} não gravado: {e}")
+
+        with self.lock:
+            self.flushed += inserted
+            self.ignored += len(rows) - len(failed) - inserted
+            self.dead_letters.extend(failed)
+
+    def get_stats(self):
+        """Obter métricas da apuração"""
+        with self.lock:
+            return {
+                'polls': len(self.voters),
+                'voters': sum(len(voters) for voters in self.voters.values()),
+                'pending_writes': len(self.pending),
+                'accepted': self.accepted,
+                'rejected_duplicates': self.rejected,
+                'flushed': self.flushed,
+                'ignored_on_write': self.ignored,
+                'dead_letters': len(self.dead_letters)
+            }
+
+# Instância global da apuração de votos
+vote_tally = VoteTally()
+
+def get_vote_tally_stats():
+    """Função helper para obter métricas da apuração"""
+    return vote_tally.get_stats()
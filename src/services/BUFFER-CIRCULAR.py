@@ -0,0 +1,77 @@
+import threading
+from collections import deque
+from itertools import islice
+
+class RingBuffer:
+    """Buffer circular limitado para o estado em memória da live (descarte O(1) do mais antigo)"""
+
+    def __init__(self, maxlen):
+        self.items = deque(maxlen=maxlen)
+        self.lock = threading.Lock()
+
+    @property
+    def maxlen(self):
+        return self.items.maxlen
+
+    def append(self, item):
+        """Adicionar item, descartando o mais antigo se estiver cheio"""
+        with self.lock:
+            self.items.append(item)
+
+    def last(self, count=None):
+        """Obter os últimos itens, do mais antigo para o mais recente"""
+        with self.lock:
+            if count is None or count >= len(self.items):
+                return list(self.items)
+            return list(islice(self.items, len(self.items) - count, None))
+
+    def dicts(self, count=None):
+        """Obter os últimos itens convertidos para dicionário (para JSON/templates)"""
+        return [item.to_dict() for item in self.last(count)]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.last())
+
+class LiveRecord:
+    """Base para registros leves em memória (sem __dict__ por instância)"""
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class ChatMessageRecord(LiveRecord):
+    """Mensagem do chat da live"""
+
+    __slots__ = ('id', 'fake_name', 'content', 'likes', 'timestamp')
+
+class OverlayEventRecord(LiveRecord):
+    """Evento enviado ao overlay do OBS"""
+
+    __slots__ = ('event', 'data', 'timestamp')
+
+class ObsMessageRecord(LiveRecord):
+    """Mensagem enviada ao OBS pelo sistema local"""
+
+    __slots__ = ('id', 'message', 'timestamp', 'user_email', 'user_name', 'status', 'created_at')
+
+class CaptureRecord(LiveRecord):
+    """Captura de reação das câmeras"""
+
+    __slots__ = ('id', 'camera_name', 'reaction', 'timestamp', 'created_at')
+
+class TextMessageRecord(LiveRecord):
+    """Mensagem de texto simples do chat"""
+
+    __slots__ = ('text', 'timestamp', 'user_email')
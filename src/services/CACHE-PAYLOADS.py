@@ -0,0 +1,132 @@
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Quantidade máxima de mensagens com payloads em cache (as menos usadas saem primeiro)
+PAYLOAD_CACHE_SIZE = int(os.getenv('PAYLOAD_CACHE_SIZE', 5000))
+
+def _encode(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+class CachedPayload:
+    """Payload de uma mensagem: dicionário (para sockets) e JSON já codificado (para HTTP)"""
+
+    __slots__ = ('version', 'data', 'raw')
+
+    def __init__(self, version, data, raw):
+        self.version = version
+        self.data = data
+        self.raw = raw
+
+class PayloadCache:
+    """Cache de payloads serializados uma única vez por (mensagem, versão)"""
+
+    def __init__(self, max_entries=PAYLOAD_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # message_id -> {variante: CachedPayload}
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, message_id, variant, version, build):
+        """Obter payload da variante; build() só é chamado se a versão em cache estiver desatualizada"""
+        with self.lock:
+            variants = self.entries.get(message_id)
+            if variants is not None:
+                self.entries.move_to_end(message_id)
+                cached = variants.get(variant)
+                if cached is not None and cached.version == version:
+                    self.hits += 1
+                    return cached
+
+        # Serializar fora do lock
+        data = build()
+        cached = CachedPayload(version, data, _encode(data))
+
+        with self.lock:
+            self.misses += 1
+            variants = self.entries.get(message_id)
+            if variants is None:
+                variants = self.entries[message_id] = {}
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(message_id)
+            variants[variant] = cached
+
+        return cached
+
+    def invalidate(self, message_id):
+        """Descartar payloads de uma mensagem (likes, exibição ou remoção)"""
+        with self.lock:
+            self.entries.pop(message_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        """Obter métricas do cache"""
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+# Instância global do cache
+payload_cache = PayloadCache()
+
+def serialize_message(message):
+    """Converter mensagem para dicionário da API"""
+    displayed_at = getattr(message, 'displayed_at', None)
+    return {
+        'id': message.id,
+        'fake_name': message.fake_name,
+        'content': message.content,
+        'likes_count': message.likes_count,
+        'created_at': message.created_at.isoformat(),
+        'displayed_at': displayed_at.isoformat() if displayed_at else None,
+        'is_displayed': getattr(message, 'is_displayed', False)
+    }
+
+def serialize_top_message(message):
+    """Converter mensagem para o formato do OBS"""
+    return {
+        'id': message.id,
+        'fake_name': message.fake_name,
+        'content': message.content,
+        'likes_count': message.likes_count,
+        'created_at': message.created_at.isoformat()
+    }
+
+def serialize_queue_message(message):
+    """Converter mensagem para o formato da fila de exibição"""
+    data = serialize_top_message(message)
+    data['priority'] = message.likes_count  # Prioridade baseada em likes
+    return data
+
+MESSAGE_SERIALIZERS = {
+    'api': serialize_message,
+    'top': serialize_top_message,
+    'queue': serialize_queue_message
+}
+
+def message_payload(message, variant='api'):
+    """Função helper para obter o payload em cache de uma mensagem (Message ou RankedMessage)"""
+    version = (message.likes_count, getattr(message, 'is_displayed', False))
+    return payload_cache.get(message.id, variant, version, lambda: MESSAGE_SERIALIZERS[variant](message))
+
+def assemble(**fields):
+    """Montar um objeto JSON (bytes) reaproveitando fragmentos já codificados"""
+    parts = []
+    for key, value in fields.items():
+        if isinstance(value, CachedPayload):
+            raw = value.raw
+        elif isinstance(value, list) and value and isinstance(value[0], CachedPayload):
+            raw = b'[' + b','.join(item.raw for item in value) + b']'
+        else:
+            raw = _encode(value)
+        parts.append(_encode(key) + b':' + raw)
+    return b'{' + b','.join(parts) + b'}'
@@ -0,0 +1,209 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pacotes na fila de saída de um cliente a partir dos quais ele passa a receber eventos reduzidos
+SLOW_CONSUMER_QUEUE = int(os.getenv('SLOW_CONSUMER_QUEUE', 100))
+
+# Fila a partir da qual o cliente é desconectado na hora
+SLOW_CONSUMER_MAX_QUEUE = int(os.getenv('SLOW_CONSUMER_MAX_QUEUE', 1000))
+
+# Tempo que um cliente reduzido pode continuar acima do limite antes de ser desconectado
+SLOW_CONSUMER_GRACE_SECONDS = int(os.getenv('SLOW_CONSUMER_GRACE_SECONDS', 10))
+
+# Intervalo de verificação das filas e de envio dos eventos reduzidos (ms)
+SLOW_CONSUMER_CHECK_MS = int(os.getenv('SLOW_CONSUMER_CHECK_MS', 1000))
+
+# Mensagens do chat enviadas por intervalo a um cliente reduzido (as mais recentes)
+SLOW_CONSUMER_CHAT_PER_TICK = int(os.getenv('SLOW_CONSUMER_CHAT_PER_TICK', 3))
+
+# Eventos em que só o valor mais recente importa: evento -> campos que identificam o valor
+COALESCE_KEYS = {
+    'message_liked': ('message_id',),
+    'poll_tally': ('poll_id',),
+    'stats_update': (),
+}
+
+# Eventos do chat que podem ser descartados quando o cliente está atrasado
+THINNED_EVENTS = {'new_message'}
+
+def degraded_room(room):
+    """Sala dos clientes lentos que estavam na sala informada"""
+    return f'{room}:degraded'
+
+def shed_events(events, chat_limit=SLOW_CONSUMER_CHAT_PER_TICK):
+    """Reduzir lista de (evento, dados): contadores ficam só com o último valor e o chat é desbastado"""
+    kept = []
+    seen = set()
+    chat = 0
+    # Do mais recente para o mais antigo: a primeira ocorrência de cada chave é a que vale
+    for event, data in reversed(events):
+        if event in COALESCE_KEYS:
+            key = (event,) + tuple(data.get(field) for field in COALESCE_KEYS[event])
+            if key in seen:
+                continue
+            seen.add(key)
+        elif event in THINNED_EVENTS:
+            if chat >= chat_limit:
+                continue
+            chat += 1
+        kept.append((event, data))
+    kept.reverse()
+    return kept
+
+class SlowConsumerMonitor:
+    """Acompanha a fila de saída de cada socket e reduz ou desconecta os clientes que não acompanham"""
+
+    def __init__(self, threshold=SLOW_CONSUMER_QUEUE, max_queue=SLOW_CONSUMER_MAX_QUEUE,
+                 grace_seconds=SLOW_CONSUMER_GRACE_SECONDS, check_ms=SLOW_CONSUMER_CHECK_MS):
+        self.threshold = threshold
+        self.max_queue = max_queue
+        self.grace = grace_seconds
+        self.check = check_ms / 1000.0
+        self.lock = threading.Lock()
+        # sid -> sala em que o cliente recebe os eventos normais
+        self.clients = {}
+        # sid -> momento em que passou a receber eventos reduzidos
+        self.degraded = {}
+        # sala original -> eventos acumulados para os clientes reduzidos
+        self.pending = {}
+        self.server = None
+        self.send = None
+        self.thread = None
+        self.degraded_total = 0
+        self.recovered_total = 0
+        self.disconnected_total = 0
+        self.events_in = 0
+        self.events_out = 0
+        self.max_depth = 0
+
+    def init_app(self, app, socketio, send):
+        """Iniciar verificação periódica; send(sala original, eventos) entrega o lote aos clientes reduzidos dela"""
+        self.server = socketio.server
+        self.send = send
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._check_loop, daemon=True)
+            self.thread.start()
+            logger.info(f"Clientes lentos: reduzidos acima de {self.threshold} pacotes na fila, "
+                        f"desconectados após {self.grace}s ou acima de {self.max_queue}")
+
+    def track(self, sid, room):
+        """Acompanhar socket que entrou na sala"""
+        with self.lock:
+            self.clients[sid] = room
+
+    def forget(self, sid):
+        """Parar de acompanhar socket desconectado"""
+        with self.lock:
+            self.clients.pop(sid, None)
+            self.degraded.pop(sid, None)
+
+    def shed(self, room, events):
+        """Guardar eventos da sala para os clientes reduzidos (ignorado se não houver nenhum)"""
+        with self.lock:
+            if not self.degraded or not any(self.clients.get(sid) == room for sid in self.degraded):
+                return
+            self.pending.setdefault(room, []).extend(events)
+
+    def queue_depth(self, sid):
+        """Pacotes aguardando envio para o socket (0 se não encontrado)"""
+        try:
+            eio_sid = self.server.manager.eio_sid_from_sid(sid, '/')
+            socket = self.server.eio.sockets.get(eio_sid)
+            return socket.queue.qsize() if socket is not None else 0
+        except Exception:
+            return 0
+
+    def _degrade(self, sid, room):
+        self.server.leave_room(sid, room, namespace='/')
+        self.server.enter_room(sid, degraded_room(room), namespace='/')
+        self.degraded[sid] = time.monotonic()
+        self.degraded_total += 1
+        logger.info(f"Cliente lento {sid}: passando a receber eventos reduzidos")
+
+    def _recover(self, sid, room):
+        self.server.leave_room(sid, degraded_room(room), namespace='/')
+        self.server.enter_room(sid, room, namespace='/')
+        self.degraded.pop(sid, None)
+        self.recovered_total += 1
+
+    def _disconnect(self, sid, depth):
+        self.degraded.pop(sid, None)
+        self.clients.pop(sid, None)
+        self.disconnected_total += 1
+        logger.warning(f"Cliente lento {sid} desconectado com {depth} pacotes na fila")
+        try:
+            self.server.disconnect(sid, namespace='/', ignore_queue=True)
+        except Exception as e:
+            logger.error(f"Erro ao desconectar cliente lento {sid}: {e}")
+
+    def check_clients(self):
+        """Medir as filas e mudar o estado dos clientes que passaram (ou voltaram) do limite"""
+        now = time.monotonic()
+        with self.lock:
+            clients = list(self.clients.items())
+
+        depths = [(sid, room, self.queue_depth(sid)) for sid, room in clients]
+
+        with self.lock:
+            for sid, room, depth in depths:
+                if sid not in self.clients:
+                    continue
+                self.max_depth = max(self.max_depth, depth)
+                since = self.degraded.get(sid)
+
+                if depth >= self.max_queue or (since is not None and depth >= self.threshold
+                                               and now - since >= self.grace):
+                    self._disconnect(sid, depth)
+                elif since is None and depth >= self.threshold:
+                    self._degrade(sid, room)
+                elif since is not None and depth < self.threshold // 2:
+                    # Metade do limite para não ficar alternando entre os estados
+                    self._recover(sid, room)
+
+    def flush(self):
+        """Enviar aos clientes reduzidos os eventos acumulados, já reduzidos"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for room, events in pending.items():
+            reduced = shed_events(events)
+            self.events_in += len(events)
+            self.events_out += len(reduced)
+            try:
+                self.send(room, reduced)
+            except Exception as e:
+                logger.error(f"Erro ao enviar eventos reduzidos da sala {room}: {e}")
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self.check)
+            try:
+                self.check_clients()
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao verificar clientes lentos: {e}")
+
+    def get_stats(self):
+        """Obter métricas dos clientes lentos"""
+        with self.lock:
+            return {
+                'tracked_clients': len(self.clients),
+                'degraded_clients': len(self.degraded),
+                'degraded_total': self.degraded_total,
+                'recovered_total': self.recovered_total,
+                'disconnected_total': self.disconnected_total,
+                'events_shed': self.events_in - self.events_out,
+                'max_queue_depth': self.max_depth
+            }
+
+# Instância global do monitor de clientes lentos
+slow_consumers = SlowConsumerMonitor()
+
+def get_degraded_count():
+    """Função helper para obter quantos clientes estão recebendo eventos reduzidos"""
+    return slow_consumers.get_stats()['degraded_clients']
@@ -1,17 +1,56 @@
+import os
 import random
 import logging
 from datetime import datetime, timedelta
-from threading import Timer
 import json
-import re
+from src.services.state_backend import state_backend
+from src.services.scheduler import scheduler
+from src.services.vote_tally import vote_tally
+from src.services.poll_publisher import poll_publisher
+from src.services.keyword_engine import keyword_engine
 
 logger = logging.getLogger(__name__)
 
+# Enquetes mantidas no ranking de mais votadas
+POLL_LEADERBOARD_SIZE = int(os.getenv('POLL_LEADERBOARD_SIZE', 5))
+
+class PollRecord:
+    """Enquete ativa como guardada no backend (só dados, sem instância do ORM)"""
+    
+    __slots__ = ('id', 'question', 'options', 'expires_at', 'context')
+    
+    def __init__(self, id, question, options, expires_at, context):
+        self.id = id
+        self.question = question
+        # [{'id': ..., 'text': ...}] na ordem de exibição
+        self.options = options
+        self.expires_at = expires_at
+        self.context = context
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'question': self.question,
+            'options': self.options,
+            'expires_at': self.expires_at.isoformat(),
+            'context': self.context
+        }
+
 class PollGenerationService:
     """Serviço para geração automática de enquetes"""
     
-    def __init__(self):
-        self.active_polls = {}
+    def __init__(self, backend=state_backend, scheduler=scheduler, tally=vote_tally, publisher=poll_publisher,
+                 keywords=keyword_engine):
+        # Enquetes ativas e contagem de votos ficam no backend compartilhado entre workers
+        self.backend = backend
+        # Encerramento das enquetes: uma única thread para todas, em vez de um Timer por enquete
+        self.scheduler = scheduler
+        # Votos apurados em memória e gravados em lote
+        self.tally = tally
+        # Apuração enviada aos clientes em cadência fixa, não a cada voto
+        self.publisher = publisher
+        # Palavras-chave e nomes do conteúdo por TF-IDF sobre a janela recente da transcrição
+        self.keywords = keywords
         self.poll_templates = {
             'momento_polemico': [
                 "O que vocês acharam dessa declaração?",
@@ -60,12 +99,19 @@ class PollGenerationService:
             question_templates = self.poll_templates.get(context, self.poll_templates['momento_polemico'])
             question = random.choice(question_templates)
             
+            # Termos e nomes mais relevantes do conteúdo (uma extração para pergunta e opções)
+            extracted = self._extract_keywords(content)
+            
             # Determinar tipo de opções baseado no contexto e conteúdo
-            option_type = self._determine_option_type(content, context)
+            option_type = self._determine_option_type(content, context, extracted['entities'])
             options = self.option_templates[option_type]
             
+            if option_type == 'pessoas':
+                # Os dois nomes mais relevantes no lugar de "Pessoa A" e "Pessoa B"
+                options = extracted['entities'][:2] + options[2:]
+            
             # Personalizar pergunta se possível
-            personalized_question = self._personalize_question(question, content)
+            personalized_question = self._personalize_question(question, extracted['keyphrases'])
             
             # Criar enquete
             poll_data = self._create_poll(
@@ -77,8 +123,8 @@ class PollGenerationService:
             )
             
             if poll_data:
-                # Iniciar timer de 10 minutos
-                self._start_poll_timer(poll_data['id'])
+                # Agendar encerramento em 10 minutos
+                self._start_poll_timer(poll_data['id'], poll_data['expires_at'])
                 
                 logger.info(f"Enquete gerada: {personalized_question}")
                 return poll_data
@@ -89,12 +135,12 @@ class PollGenerationService:
             logger.error(f"Erro ao gerar enquete: {e}")
             return None
     
-    def _determine_option_type(self, content, context):
+    def _determine_option_type(self, content, context, entities=()):
         """Determinar tipo de opções baseado no conteúdo"""
         content_lower = content.lower()
         
-        # Detectar nomes de pessoas para enquetes de apoio
-        if re.search(r'\b(joão|maria|pedro|ana|carlos|lucia)\b', content_lower):
+        # Dois nomes citados: enquete de apoio entre eles
+        if len(entities) >= 2:
             return 'pessoas'
         
         # Detectar perguntas sim/não
@@ -111,12 +157,9 @@ class PollGenerationService:
         
         return context_mapping.get(context, 'concordancia')
     
-    def _personalize_question(self, question, content):
-        """Personalizar pergunta baseada no conteúdo"""
+    def _personalize_question(self, question, keywords):
+        """Personalizar pergunta com as palavras-chave do conteúdo"""
         try:
-            # Extrair palavras-chave do conteúdo
-            keywords = self._extract_keywords(content)
-            
             # Substituir placeholders genéricos
             if 'essa declaração' in question and keywords:
                 question = question.replace('essa declaração', f'"{keywords[0]}"')
@@ -131,23 +174,15 @@ class PollGenerationService:
             return question
     
     def _extract_keywords(self, content):
-        """Extrair palavras-chave do conteúdo"""
+        """Extrair palavras-chave e nomes do conteúdo, do mais para o menos relevante"""
         try:
-            # Palavras irrelevantes
-            stop_words = {'o', 'a', 'os', 'as', 'um', 'uma', 'de', 'do', 'da', 'em', 'no', 'na', 'para', 'por', 'com', 'sem', 'que', 'é', 'são', 'foi', 'foram', 'ser', 'estar', 'ter', 'haver', 'isso', 'isto', 'aquilo', 'ele', 'ela', 'eles', 'elas', 'eu', 'tu', 'você', 'nós', 'vocês'}
-            
-            # Dividir em palavras e filtrar
-            words = re.findall(r'\b\w+\b', content.lower())
-            keywords = [word for word in words if len(word) > 3 and word not in stop_words]
-            
-            # Retornar as 3 palavras mais relevantes
-            return keywords[:3]
+            return self.keywords.extract(content)
             
         except Exception as e:
             logger.error(f"Erro ao extrair palavras-chave: {e}")
-            return []
+            return {'keyphrases': [], 'entities': []}
     
-    def _create_poll(self, question, options, context, source_content, timestamp):
+    def _create_poll(self, question, options, context, source_content, timestamp, duration_minutes=10):
         """Criar enquete no banco de dados"""
         try:
             from src.models.database import db, Poll, PollOption
@@ -158,7 +193,7 @@ class PollGenerationService:
                 context=context,
                 source_content=source_content[:500],  # Limitar tamanho
                 source_timestamp=timestamp,
-                expires_at=datetime.utcnow() + timedelta(minutes=10)
+                expires_at=datetime.utcnow() + timedelta(minutes=duration_minutes)
             )
             
             db.session.add(poll)
@@ -177,21 +212,15 @@ class PollGenerationService:
             
             db.session.commit()
             
+            poll_data = PollRecord(
+                poll.id, poll.question, [{'id': opt.id, 'text': opt.text} for opt in poll_options],
+                poll.expires_at, poll.context
+            ).to_dict()
+            
             # Adicionar à lista de enquetes ativas
-            self.active_polls[poll.id] = {
-                'poll': poll,
-                'options': poll_options,
-                'votes': {opt.id: 0 for opt in poll_options},
-                'total_votes': 0
-            }
+            self.backend.set('active_polls', poll.id, poll_data)
             
-            return {
-                'id': poll.id,
-                'question': poll.question,
-                'options': [{'id': opt.id, 'text': opt.text} for opt in poll_options],
-                'expires_at': poll.expires_at.isoformat(),
-                'context': poll.context
-            }
+            return poll_data
             
         except Exception as e:
             logger.error(f"Erro ao criar enquete: {e}")
@@ -199,103 +228,196 @@ class PollGenerationService:
                 db.session.rollback()
             return None
     
-    def _start_poll_timer(self, poll_id):
-        """Iniciar timer para encerrar enquete"""
+    def _start_poll_timer(self, poll_id, expires_at):
+        """Agendar encerramento da enquete no prazo (datetime ou ISO)"""
         try:
-            timer = Timer(600, self._close_poll, args=[poll_id])  # 10 minutos
-            timer.start()
+            if isinstance(expires_at, str):
+                expires_at = datetime.fromisoformat(expires_at)
             
-            logger.info(f"Timer de 10 minutos iniciado para enquete {poll_id}")
+            self.scheduler.schedule(f'poll:{poll_id}', expires_at, self._close_poll, poll_id)
+            
+            logger.info(f"Encerramento da enquete {poll_id} agendado para {expires_at.isoformat()}")
             
         except Exception as e:
-            logger.error(f"Erro ao iniciar timer da enquete: {e}")
+            logger.error(f"Erro ao agendar encerramento da enquete: {e}")
+    
+    def init_app(self, app):
+        """Iniciar agendador e apuração; reagendar as enquetes que estavam abertas (ex.: após reiniciar)"""
+        self.scheduler.init_app(app)
+        self.tally.init_app(app)
+        self.keywords.init_app(app)
+        with app.app_context():
+            self._restore_pending_polls()
     
-    def _close_poll(self, poll_id):
-        """Encerrar enquete automaticamente"""
+    def _restore_pending_polls(self):
+        """Reconstruir as enquetes abertas a partir do banco e reagendar os encerramentos (vencidas encerram na hora)"""
         try:
-            if poll_id not in self.active_polls:
-                return
+            records = self._load_open_polls()
             
-            poll_data = self.active_polls[poll_id]
-            poll = poll_data['poll']
+            for record in records:
+                self._start_poll_timer(record.id, record.expires_at)
             
-            # Marcar como encerrada no banco
-            poll.is_active = False
-            poll.closed_at = datetime.utcnow()
+            if records:
+                logger.info(f"{len(records)} enquetes abertas reagendadas")
+            
+        except Exception as e:
+            logger.error(f"Erro ao reagendar enquetes abertas: {e}")
+    
+    def _load_open_polls(self):
+        """Carregar enquetes abertas em PollRecord com três consultas no total (enquetes, opções e votos agrupados)"""
+        from sqlalchemy import func
+        from src.models.database import db, Poll, PollOption, PollVote
+        
+        rows = db.session.query(Poll.id, Poll.question, Poll.expires_at, Poll.context).filter(
+            Poll.is_active == True, Poll.expires_at.isnot(None)
+        ).all()
+        if not rows:
+            return []
+        
+        records = {row.id: PollRecord(row.id, row.question, [], row.expires_at, row.context) for row in rows}
+        
+        # Enquetes que o backend (compartilhado) ainda conhece mantêm os contadores atuais
+        missing = [poll_id for poll_id in records if self.backend.get('active_polls', poll_id) is None]
+        if not missing:
+            return list(records.values())
+        
+        options = db.session.query(PollOption.poll_id, PollOption.id, PollOption.text).filter(
+            PollOption.poll_id.in_(missing)
+        ).order_by(PollOption.poll_id, PollOption.position).all()
+        for option in options:
+            records[option.poll_id].options.append({'id': option.id, 'text': option.text})
+        
+        counts = db.session.query(PollVote.poll_id, PollVote.option_id, func.count(PollVote.id)).filter(
+            PollVote.poll_id.in_(missing)
+        ).group_by(PollVote.poll_id, PollVote.option_id).all()
+        
+        tallies = {poll_id: {'total': 0} for poll_id in missing}
+        for poll_id, option_id, votes in counts:
+            tallies[poll_id][option_id] = votes
+            tallies[poll_id]['total'] += votes
+        
+        for poll_id in missing:
+            votes_ns = f'poll_votes:{poll_id}'
+            self.backend.clear(votes_ns)
+            for key, votes in tallies[poll_id].items():
+                self.backend.set(votes_ns, key, votes)
+            self.backend.set('active_polls', poll_id, records[poll_id].to_dict())
+        
+        logger.info(f"{len(missing)} enquetes abertas recarregadas do banco")
+        return list(records.values())
+    
+    def extend_poll(self, poll_id, minutes):
+        """Prorrogar enquete aberta; retorna o novo prazo (ISO) ou None"""
+        try:
+            poll_data = self.backend.get('active_polls', poll_id)
+            if poll_data is None:
+                return None
+            
+            expires_at = datetime.fromisoformat(poll_data['expires_at']) + timedelta(minutes=minutes)
             
-            from src.models.database import db
+            # Outros workers veem o novo prazo ao tentar encerrar no prazo antigo
+            def set_expiry(current):
+                if current is None:
+                    return None, None
+                current['expires_at'] = expires_at.isoformat()
+                return current, current
+            
+            if self.backend.update('active_polls', poll_id, set_expiry) is None:
+                return None
+            
+            from src.models.database import db, Poll
+            poll = Poll.query.get(poll_id)
+            poll.expires_at = expires_at
             db.session.commit()
             
-            # Calcular resultados
-            results = self._calculate_results(poll_id)
+            self._start_poll_timer(poll_id, expires_at)
+            
+            return expires_at.isoformat()
+            
+        except Exception as e:
+            logger.error(f"Erro ao prorrogar enquete {poll_id}: {e}")
+            if 'db' in locals():
+                db.session.rollback()
+            return None
+    
+    def close_poll(self, poll_id):
+        """Encerrar enquete antes do prazo (False se não existe ou já foi encerrada)"""
+        self.scheduler.cancel(f'poll:{poll_id}')
+        return self._close_poll(poll_id, force=True)
+    
+    def _close_poll(self, poll_id, force=False):
+        """Encerrar enquete automaticamente (True se esta chamada encerrou a enquete)"""
+        closed = False
+        try:
+            poll_data = self.backend.get('active_polls', poll_id)
+            if poll_data is None:
+                return False
+            
+            # Prorrogada depois que este prazo foi agendado: remarcar em vez de encerrar
+            expires_at = datetime.fromisoformat(poll_data['expires_at'])
+            if not force and expires_at > datetime.utcnow() + timedelta(seconds=1):
+                self._start_poll_timer(poll_id, expires_at)
+                return False
+            
+            # Remover da lista ativa (apenas um worker encerra a enquete)
+            if not self.backend.delete('active_polls', poll_id):
+                return False
+            closed = True
+            
+            # Apuração final enviada na hora, sem esperar o próximo intervalo
+            # (as mesmas contagens vão para o snapshot e o ranking, mesmo se a gravação dos votos falhar)
+            counts = self._get_vote_counts(poll_id)
+            self.publisher.publish_final(poll_data, counts)
+            self.backend.clear(f'poll_votes:{poll_id}')
+            
+            # Gravar os votos ainda pendentes antes de encerrar
+            self.tally.flush()
+            self.tally.forget(poll_id)
+            
+            # Marcar como encerrada e guardar o resultado final na mesma transação
+            from src.models.database import db, Poll
+            poll = Poll.query.get(poll_id)
+            poll.is_active = False
+            poll.closed_at = datetime.utcnow()
+            snapshot = self._store_results_snapshot(poll, poll_data['options'], counts)
+            self._update_leaderboard(poll, snapshot.total_votes)
+            db.session.commit()
             
             # Notificar usuários
             from src.main import broadcast_to_users
             
             broadcast_to_users('poll_closed', {
                 'poll_id': poll_id,
-                'question': poll.question,
-                'results': results,
-                'total_votes': poll_data['total_votes'],
+                'question': poll_data['question'],
+                'results': json.loads(snapshot.results),
+                'total_votes': snapshot.total_votes,
                 'timestamp': datetime.utcnow().isoformat()
             })
             
-            # Remover da lista ativa
-            del self.active_polls[poll_id]
-            
             logger.info(f"Enquete {poll_id} encerrada automaticamente")
             
         except Exception as e:
             logger.error(f"Erro ao encerrar enquete {poll_id}: {e}")
+        
+        return closed
     
     def vote_on_poll(self, poll_id, option_id, user_id):
         """Registrar voto em enquete"""
         try:
-            if poll_id not in self.active_polls:
+            poll_data = self.backend.get('active_polls', poll_id)
+            if poll_data is None:
                 return {'error': 'Enquete não encontrada ou já encerrada'}
             
-            from src.models.database import db, PollVote
-            
-            # Verificar se usuário já votou
-            existing_vote = PollVote.query.filter_by(
-                poll_id=poll_id,
-                user_id=user_id
-            ).first()
-            
-            if existing_vote:
-                return {'error': 'Você já votou nesta enquete'}
-            
             # Verificar se opção existe
-            poll_data = self.active_polls[poll_id]
-            valid_option_ids = [opt.id for opt in poll_data['options']]
+            valid_option_ids = [opt['id'] for opt in poll_data['options']]
             
             if option_id not in valid_option_ids:
                 return {'error': 'Opção inválida'}
             
-            # Registrar voto
-            vote = PollVote(
-                poll_id=poll_id,
-                option_id=option_id,
-                user_id=user_id
-            )
-            
-            db.session.add(vote)
-            db.session.commit()
-            
-            # Atualizar contadores em memória
-            poll_data['votes'][option_id] += 1
-            poll_data['total_votes'] += 1
-            
-            # Notificar atualização em tempo real
-            from src.main import broadcast_to_users
-            
-            broadcast_to_users('poll_vote_update', {
-                'poll_id': poll_id,
-                'option_id': option_id,
-                'votes': poll_data['votes'][option_id],
-                'total_votes': poll_data['total_votes'],
-                'timestamp': datetime.utcnow().isoformat()
-            })
+            # Apuração em memória; o voto é gravado no próximo lote
+            # (os clientes recebem a contagem no próximo envio do publicador de apurações)
+            if self.tally.vote(poll_id, option_id, user_id) is None:
+                return {'error': 'Você já votou nesta enquete'}
             
             logger.info(f"Voto registrado: Poll {poll_id}, Option {option_id}, User {user_id}")
             
@@ -303,27 +425,30 @@ class PollGenerationService:
             
         except Exception as e:
             logger.error(f"Erro ao registrar voto: {e}")
-            if 'db' in locals():
-                db.session.rollback()
             return {'error': 'Erro interno do servidor'}
     
+    def _get_vote_counts(self, poll_id):
+        """Contagem de votos por opção (chaves em texto) e 'total'"""
+        return dict(self.backend.items(f'poll_votes:{poll_id}'))
+    
     def _calculate_results(self, poll_id):
         """Calcular resultados da enquete"""
         try:
-            if poll_id not in self.active_polls:
+            poll_data = self.backend.get('active_polls', poll_id)
+            if poll_data is None:
                 return []
             
-            poll_data = self.active_polls[poll_id]
-            total_votes = poll_data['total_votes']
+            counts = self._get_vote_counts(poll_id)
+            total_votes = counts.get('total', 0)
             
             results = []
             for option in poll_data['options']:
-                votes = poll_data['votes'][option.id]
+                votes = counts.get(str(option['id']), 0)
                 percentage = (votes / total_votes * 100) if total_votes > 0 else 0
                 
                 results.append({
-                    'option_id': option.id,
-                    'text': option.text,
+                    'option_id': option['id'],
+                    'text': option['text'],
                     'votes': votes,
                     'percentage': round(percentage, 1)
                 })
@@ -342,17 +467,17 @@ class PollGenerationService:
         try:
             active_list = []
             
-            for poll_id, poll_data in self.active_polls.items():
-                poll = poll_data['poll']
+            for poll_id, poll_data in self.backend.items('active_polls'):
+                expires_at = datetime.fromisoformat(poll_data['expires_at'])
                 
                 active_list.append({
-                    'id': poll.id,
-                    'question': poll.question,
-                    'options': [{'id': opt.id, 'text': opt.text} for opt in poll_data['options']],
-                    'total_votes': poll_data['total_votes'],
-                    'expires_at': poll.expires_at.isoformat(),
-                    'context': poll.context,
-                    'time_remaining': max(0, int((poll.expires_at - datetime.utcnow()).total_seconds()))
+                    'id': poll_data['id'],
+                    'question': poll_data['question'],
+                    'options': poll_data['options'],
+                    'total_votes': self.backend.get(f'poll_votes:{poll_id}', 'total', 0),
+                    'expires_at': poll_data['expires_at'],
+                    'context': poll_data['context'],
+                    'time_remaining': max(0, int((expires_at - datetime.utcnow()).total_seconds()))
                 })
             
             return active_list
@@ -364,38 +489,130 @@ class PollGenerationService:
     def get_poll_results(self, poll_id):
         """Obter resultados de uma enquete específica"""
         try:
-            if poll_id in self.active_polls:
+            if self.backend.get('active_polls', poll_id) is not None:
                 return self._calculate_results(poll_id)
             
-            # Buscar enquete encerrada no banco
-            from src.models.database import Poll, PollOption, PollVote
+            # Enquete encerrada: resultado final já calculado (uma linha)
+            from src.models.database import db, Poll, PollOption, PollResultSnapshot
+            
+            snapshot = PollResultSnapshot.query.get(poll_id)
+            if snapshot is not None:
+                return json.loads(snapshot.results)
             
             poll = Poll.query.get(poll_id)
             if not poll:
                 return None
             
-            results = []
-            for option in poll.options:
-                votes_count = PollVote.query.filter_by(option_id=option.id).count()
-                total_votes = PollVote.query.filter_by(poll_id=poll_id).count()
-                
-                percentage = (votes_count / total_votes * 100) if total_votes > 0 else 0
-                
-                results.append({
-                    'option_id': option.id,
-                    'text': option.text,
-                    'votes': votes_count,
-                    'percentage': round(percentage, 1)
-                })
-            
-            results.sort(key=lambda x: x['votes'], reverse=True)
+            # Encerrada antes dos snapshots: calcular uma vez e guardar
+            options = PollOption.query.filter_by(poll_id=poll_id).order_by(PollOption.position).all()
+            snapshot = self._store_results_snapshot(poll, [{'id': opt.id, 'text': opt.text} for opt in options])
+            db.session.commit()
             
-            return results
+            return json.loads(snapshot.results)
             
         except Exception as e:
             logger.error(f"Erro ao obter resultados da enquete: {e}")
+            if 'db' in locals():
+                db.session.rollback()
             return None
     
+    def _store_results_snapshot(self, poll, options, counts=None):
+        """Guardar o resultado final (sem commit): contagens do backend ou, sem elas, um único GROUP BY"""
+        from sqlalchemy import func
+        from src.models.database import db, PollVote, PollResultSnapshot
+        
+        if counts is None:
+            votes_by_option = dict(
+                db.session.query(PollVote.option_id, func.count(PollVote.id))
+                .filter(PollVote.poll_id == poll.id)
+                .group_by(PollVote.option_id)
+                .all()
+            )
+            total_votes = sum(votes_by_option.values())
+        else:
+            votes_by_option = {key: votes for key, votes in counts.items() if key != 'total'}
+            total_votes = counts.get('total', 0)
+        votes_by_option = {str(option_id): votes for option_id, votes in votes_by_option.items()}
+        
+        results = []
+        for option in options:
+            votes = votes_by_option.get(str(option['id']), 0)
+            percentage = (votes / total_votes * 100) if total_votes > 0 else 0
+            results.append({
+                'option_id': option['id'],
+                'text': option['text'],
+                'votes': votes,
+                'percentage': round(percentage, 1)
+            })
+        
+        results.sort(key=lambda x: x['votes'], reverse=True)
+        
+        snapshot = db.session.merge(PollResultSnapshot(
+            poll_id=poll.id,
+            question=poll.question,
+            results=json.dumps(results, ensure_ascii=False, separators=(',', ':')),
+            total_votes=total_votes,
+            closed_at=poll.closed_at or datetime.utcnow()
+        ))
+        return snapshot
+    
+    def _update_leaderboard(self, poll, total_votes):
+        """Atualizar o ranking de enquetes mais votadas (sem commit)"""
+        from src.models.database import PollLeaderboard
+        
+        leaderboard = PollLeaderboard.query.get(1)
+        if leaderboard is None:
+            # A enquete sendo encerrada entra logo abaixo, com a contagem final
+            leaderboard = self._seed_leaderboard(exclude_poll_id=poll.id)
+        
+        popular = [entry for entry in json.loads(leaderboard.popular) if entry['id'] != poll.id]
+        popular.append({
+            'id': poll.id,
+            'question': poll.question[:100] + '...' if len(poll.question) > 100 else poll.question,
+            'total_votes': total_votes,
+            'created_at': poll.created_at.isoformat()
+        })
+        popular.sort(key=lambda entry: entry['total_votes'], reverse=True)
+        
+        leaderboard.closed_polls = (leaderboard.closed_polls or 0) + 1
+        leaderboard.total_votes = (leaderboard.total_votes or 0) + total_votes
+        leaderboard.popular = json.dumps(popular[:POLL_LEADERBOARD_SIZE], ensure_ascii=False)
+        leaderboard.updated_at = datetime.utcnow()
+    
+    def _seed_leaderboard(self, exclude_poll_id=None):
+        """Criar o ranking a partir das enquetes já encerradas no banco, com um único GROUP BY (sem commit)"""
+        from sqlalchemy import func
+        from src.models.database import db, Poll, PollVote, PollLeaderboard
+        
+        query = db.session.query(Poll.id, Poll.question, Poll.created_at, func.count(PollVote.id)).outerjoin(
+            PollVote, PollVote.poll_id == Poll.id
+        ).filter(Poll.is_active == False)
+        if exclude_poll_id is not None:
+            query = query.filter(Poll.id != exclude_poll_id)
+        closed = query.group_by(Poll.id).all()
+        
+        popular = [
+            {
+                'id': poll_id,
+                'question': question[:100] + '...' if len(question) > 100 else question,
+                'total_votes': votes,
+                'created_at': created_at.isoformat()
+            }
+            for poll_id, question, created_at, votes in closed
+        ]
+        popular.sort(key=lambda entry: entry['total_votes'], reverse=True)
+        
+        leaderboard = PollLeaderboard(
+            id=1,
+            closed_polls=len(closed),
+            total_votes=sum(entry['total_votes'] for entry in popular),
+            popular=json.dumps(popular[:POLL_LEADERBOARD_SIZE], ensure_ascii=False),
+            updated_at=datetime.utcnow()
+        )
+        db.session.add(leaderboard)
+        logger.info(f"Ranking de enquetes criado a partir de {len(closed)} enquetes encerradas")
+        return leaderboard
+    
     def create_manual_poll(self, question, options, duration_minutes=10):
         """Criar enquete manual"""
         try:
@@ -404,13 +621,13 @@ class PollGenerationService:
                 options=options,
                 context='manual',
                 source_content='Enquete criada manualmente',
-                timestamp=None
+                timestamp=None,
+                duration_minutes=duration_minutes
             )
             
             if poll_data:
-                # Iniciar timer personalizado
-                timer = Timer(duration_minutes * 60, self._close_poll, args=[poll_data['id']])
-                timer.start()
+                # Agendar encerramento no prazo escolhido
+                self._start_poll_timer(poll_data['id'], poll_data['expires_at'])
                 
                 logger.info(f"Enquete manual criada: {question}")
                 return poll_data
@@ -424,33 +641,37 @@ class PollGenerationService:
     def get_poll_stats(self):
         """Obter estatísticas das enquetes"""
         try:
-            from src.models.database import Poll, PollVote
+            from src.models.database import db, Poll, PollLeaderboard
             
             total_polls = Poll.query.count()
-            active_polls_count = len(self.active_polls)
-            total_votes = PollVote.query.count()
-            
-            # Enquetes mais votadas
-            popular_polls = Poll.query.join(PollVote).group_by(Poll.id).order_by(
-                Poll.id.desc()
-            ).limit(5).all()
+            active_polls_count = self.backend.count('active_polls')
+            
+            # Enquetes encerradas: totais e ranking mantidos a cada encerramento
+            leaderboard = PollLeaderboard.query.get(1)
+            if leaderboard is None:
+                # Banco anterior ao ranking: calcular uma vez a partir dos votos já gravados
+                leaderboard = self._seed_leaderboard()
+                db.session.commit()
+            closed_votes = leaderboard.total_votes
+            popular_polls = json.loads(leaderboard.popular)
+            
+            # Enquetes ativas: contadores em memória
+            active_votes = sum(
+                self.backend.get(f'poll_votes:{poll_id}', 'total', 0)
+                for poll_id, _ in self.backend.items('active_polls')
+            )
             
             return {
                 'total_polls': total_polls,
                 'active_polls': active_polls_count,
-                'total_votes': total_votes,
-                'popular_polls': [
-                    {
-                        'id': poll.id,
-                        'question': poll.question[:100] + '...' if len(poll.question) > 100 else poll.question,
-                        'created_at': poll.created_at.isoformat()
-                    }
-                    for poll in popular_polls
-                ]
+                'total_votes': closed_votes + active_votes,
+                'popular_polls': popular_polls
             }
             
         except Exception as e:
             logger.error(f"Erro ao obter estatísticas: {e}")
+            if 'db' in locals():
+                db.session.rollback()
             return {
                 'total_polls': 0,
                 'active_polls': 0,
@@ -485,3 +706,11 @@ def get_poll_stats():
     """Função helper para obter estatísticas"""
     return poll_service.get_poll_stats()
 
+def extend_poll(poll_id, minutes):
+    """Função helper para prorrogar enquete"""
+    return poll_service.extend_poll(poll_id, minutes)
+
+def close_poll(poll_id):
+    """Função helper para encerrar enquete antes do prazo"""
+    return poll_service.close_poll(poll_id)
+
@@ -0,0 +1,410 @@
+import os
+import json
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+# Backend do estado compartilhado: "memory" (um processo) ou "sqlite:///caminho/arquivo.db" (vários workers)
+STATE_BACKEND_URL = os.getenv('STATE_BACKEND', 'memory')
+
+# Intervalo de leitura de eventos do Socket.IO entre workers e retenção da tabela de eventos
+SOCKETIO_POLL_MS = int(os.getenv('SOCKETIO_POLL_MS', 20))
+SOCKETIO_EVENT_RETENTION_SECONDS = int(os.getenv('SOCKETIO_EVENT_RETENTION_SECONDS', 30))
+
+# A cada quantas escritas as chaves expiradas são removidas
+PURGE_EVERY_WRITES = 1000
+
+class StateBackend(ABC):
+    """Interface do estado compartilhado: namespaces de chave -> valor JSON, com expiração opcional"""
+
+    # True quando o estado é visto por todos os workers
+    shared = False
+
+    @abstractmethod
+    def get(self, namespace, key, default=None):
+        pass
+
+    @abstractmethod
+    def set(self, namespace, key, value, ttl=None):
+        pass
+
+    @abstractmethod
+    def delete(self, namespace, key):
+        pass
+
+    @abstractmethod
+    def update(self, namespace, key, fn, ttl=None):
+        pass
+
+    @abstractmethod
+    def items(self, namespace):
+        pass
+
+    @abstractmethod
+    def count(self, namespace):
+        pass
+
+    @abstractmethod
+    def clear(self, namespace):
+        pass
+
+    @abstractmethod
+    def purge_expired(self):
+        pass
+
+    def incr(self, namespace, key, amount=1):
+        """Incrementar contador inteiro e retornar o novo valor"""
+        def add(current):
+            value = (current or 0) + amount
+            return value, value
+        return self.update(namespace, key, add)
+
+class MemoryStateBackend(StateBackend):
+    """Estado em memória do processo (padrão para um único worker)"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # namespace -> {chave: (valor em JSON, expira_em)}; JSON como no SQLite: quem lê recebe uma cópia
+        self.data = {}
+        self.writes = 0
+
+    def _live(self, namespace, key, now):
+        entry = self.data.get(namespace, {}).get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self.data[namespace][key]
+            return None
+        return entry
+
+    def get(self, namespace, key, default=None):
+        """Obter valor (ou default se não existir/expirou)"""
+        with self.lock:
+            entry = self._live(namespace, str(key), time.time())
+            return default if entry is None else json.loads(entry[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        """Gravar valor, opcionalmente com expiração em segundos"""
+        with self.lock:
+            self._write(namespace, str(key), value, ttl)
+
+    def delete(self, namespace, key):
+        """Remover chave; retorna True se existia"""
+        with self.lock:
+            return self.data.get(namespace, {}).pop(str(key), None) is not None
+
+    def update(self, namespace, key, fn, ttl=None):
+        """Ler-modificar-gravar atômico: fn(valor atual ou None) -> (novo valor, resultado)"""
+        key = str(key)
+        with self.lock:
+            entry = self._live(namespace, key, time.time())
+            value, result = fn(None if entry is None else json.loads(entry[0]))
+            if value is None:
+                self.data.get(namespace, {}).pop(key, None)
+            else:
+                self._write(namespace, key, value, ttl)
+            return result
+
+    def items(self, namespace):
+        """Listar (chave, valor) não expirados"""
+        now = time.time()
+        with self.lock:
+            return [
+                (key, json.loads(value)) for key, (value, expires_at) in self.data.get(namespace, {}).items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def count(self, namespace):
+        return len(self.items(namespace))
+
+    def clear(self, namespace):
+        with self.lock:
+            self.data.pop(namespace, None)
+
+    def _write(self, namespace, key, value, ttl):
+        self.data.setdefault(namespace, {})[key] = (json.dumps(value, default=str), time.time() + ttl if ttl else None)
+        self.writes += 1
+        if self.writes % PURGE_EVERY_WRITES == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Remover chaves expiradas"""
+        now = time.time()
+        with self.lock:
+            for entries in self.data.values():
+                for key in [key for key, (_, expires_at) in entries.items() if expires_at is not None and expires_at <= now]:
+                    del entries[key]
+
+class SQLiteStateBackend(StateBackend):
+    """Estado compartilhado entre processos da mesma máquina em um arquivo SQLite (WAL)"""
+
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+
+    def _conn(self):
+        # Uma conexão por thread; transações controladas manualmente
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, namespace, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, str(key), time.time())
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        self._upsert(self._conn(), namespace, str(key), value, ttl)
+        self._count_write()
+
+    def delete(self, namespace, key):
+        cursor = self._conn().execute(
+            "DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, str(key))
+        )
+        return cursor.rowcount > 0
+
+    def update(self, namespace, key, fn, ttl=None):
+        key = str(key)
+        conn = self._conn()
+        # BEGIN IMMEDIATE serializa a leitura e a escrita entre processos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+            value, result = fn(None if row is None else json.loads(row[0]))
+            if value is None:
+                conn.execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key))
+            else:
+                self._upsert(conn, namespace, key, value, ttl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count_write()
+        return result
+
+    def items(self, namespace):
+        rows = self._conn().execute(
+            "SELECT key, value FROM shared_state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time())
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def count(self, namespace):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM shared_state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time())
+        ).fetchone()[0]
+
+    def clear(self, namespace):
+        self._conn().execute("DELETE FROM shared_state WHERE namespace = ?", (namespace,))
+
+    def _upsert(self, conn, namespace, key, value, ttl):
+        conn.execute(
+            "INSERT INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (namespace, key, json.dumps(value, default=str), time.time() + ttl if ttl else None)
+        )
+
+    def _count_write(self):
+        self.writes += 1
+        if self.writes % PURGE_EVERY_WRITES == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        try:
+            self._conn().execute("DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        except Exception as e:
+            logger.error(f"Erro ao remover estado expirado: {e}")
+
+class SharedDict:
+    """Visão tipo dicionário de um namespace do backend"""
+
+    def __init__(self, backend, namespace):
+        self.backend = backend
+        self.namespace = namespace
+
+    def __setitem__(self, key, value):
+        self.backend.set(self.namespace, key, value)
+
+    def __getitem__(self, key):
+        value = self.backend.get(self.namespace, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __delitem__(self, key):
+        if not self.backend.delete(self.namespace, key):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.backend.get(self.namespace, key) is not None
+
+    def __len__(self):
+        return self.backend.count(self.namespace)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        return self.backend.get(self.namespace, key, default)
+
+    def pop(self, key, default=None):
+        value = self.backend.get(self.namespace, key)
+        if value is None:
+            return default
+        self.backend.delete(self.namespace, key)
+        return value
+
+    def keys(self):
+        return [key for key, _ in self.backend.items(self.namespace)]
+
+    def values(self):
+        return [value for _, value in self.backend.items(self.namespace)]
+
+    def items(self):
+        return self.backend.items(self.namespace)
+
+class SharedSet:
+    """Visão tipo conjunto (de strings) de um namespace do backend"""
+
+    def __init__(self, backend, namespace):
+        self.backend = backend
+        self.namespace = namespace
+
+    def add(self, item):
+        self.backend.set(self.namespace, item, 1)
+
+    def discard(self, item):
+        self.backend.delete(self.namespace, item)
+
+    def __contains__(self, item):
+        return self.backend.get(self.namespace, item) is not None
+
+    def __len__(self):
+        return self.backend.count(self.namespace)
+
+    def __iter__(self):
+        return iter([key for key, _ in self.backend.items(self.namespace)])
+
+class SQLitePubSubManager(socketio.PubSubManager):
+    """Fan-out do Socket.IO entre workers usando uma tabela SQLite como fila de eventos"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, channel='socketio', write_only=False, logger=None,
+                 poll_ms=SOCKETIO_POLL_MS, retention_seconds=SOCKETIO_EVENT_RETENTION_SECONDS):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self.poll_interval = poll_ms / 1000.0
+        self.retention = retention_seconds
+        self.local = threading.local()
+        self.published = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS socketio_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _publish(self, data):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO socketio_events (channel, payload, created_at) VALUES (?, ?, ?)",
+            (self.channel, pickle.dumps(data), now)
+        )
+        self.published += 1
+        if self.published % PURGE_EVERY_WRITES == 0:
+            conn.execute("DELETE FROM socketio_events WHERE created_at < ?", (now - self.retention,))
+
+    def _listen(self):
+        conn = self._conn()
+        # Começar do fim: eventos anteriores à inicialização do worker não são reenviados
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM socketio_events").fetchone()[0]
+
+        while True:
+            try:
+                rows = conn.execute(
+                    "SELECT id, payload FROM socketio_events WHERE channel = ? AND id > ? ORDER BY id",
+                    (self.channel, last_id)
+                ).fetchall()
+            except Exception as e:
+                logger.error(f"Erro ao ler eventos do Socket.IO: {e}")
+                rows = []
+
+            for event_id, payload in rows:
+                last_id = event_id
+                yield pickle.loads(payload)
+
+            if not rows:
+                self.server.sleep(self.poll_interval)
+
+def create_state_backend(url=STATE_BACKEND_URL):
+    """Criar backend a partir da configuração ("memory" ou "sqlite:///arquivo.db")"""
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        logger.info(f"Estado compartilhado em SQLite: {path}")
+        return SQLiteStateBackend(path)
+
+    if url != 'memory':
+        logger.warning(f"Backend de estado desconhecido '{url}', usando memória")
+    return MemoryStateBackend()
+
+# Instância global do backend de estado
+state_backend = create_state_backend()
+
+# Identificador deste processo (para dados publicados por worker)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+def create_client_manager():
+    """Função helper para criar o gerenciador do Socket.IO (None = apenas este processo)"""
+    if isinstance(state_backend, SQLiteStateBackend):
+        return SQLitePubSubManager(state_backend.path)
+    return None
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import calendar
+import threading
+import logging
+from functools import partial
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de reconciliação com o banco (segundos)
+STATS_RECONCILE_SECONDS = int(os.getenv('STATS_RECONCILE_SECONDS', 300))
+
+# Quantidade de mensagens no ranking e candidatos mantidos em memória
+TOP_MESSAGES_SIZE = 5
+TOP_CANDIDATES_SIZE = 20
+
+HOURS_WINDOW = 24
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _hour_number(dt):
+    """Número da hora (UTC) desde a época para um datetime ingênuo em UTC"""
+    return calendar.timegm(dt.utctimetuple()) // 3600
+
+def _count_hour(hour_slots, hour_counts, hour):
+    """Incrementar o contador da hora no anel, reciclando a posição se for de uma hora antiga"""
+    slot = hour % HOURS_WINDOW
+    current = hour_slots[slot]
+    if current is None or hour > current:
+        hour_slots[slot] = hour
+        hour_counts[slot] = 0
+    elif hour < current:
+        # Mais antiga que a janela já registrada nesta posição
+        return
+    hour_counts[slot] += 1
+
+def _top_message_data(message_id, likes, fake_name, content):
+    """Mensagem do top no formato do endpoint de estatísticas"""
+    return {
+        'id': message_id,
+        'fake_name': fake_name,
+        'content': content[:100] + '...' if len(content) > 100 else content,
+        'likes_count': likes
+    }
+
+class MessageStatsAggregator:
+    """Estatísticas de mensagens mantidas incrementalmente em memória"""
+
+    def __init__(self, reconcile_seconds=STATS_RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self.lock = threading.Lock()
+        self.total = 0
+        self.displayed = 0
+        # Anel de contadores por hora: (número da hora, contagem)
+        self.hour_slots = [None] * HOURS_WINDOW
+        self.hour_counts = [0] * HOURS_WINDOW
+        # Candidatos ao top: id -> [likes, nome, conteúdo]
+        self.candidates = {}
+        # Nenhuma mensagem fora dos candidatos tem mais likes que este piso
+        self.floor = 0
+        self.cached_payload = None
+        self.app = None
+        self.thread = None
+        self.reconcile_event = threading.Event()
+
+    def init_app(self, app):
+        """Carregar estatísticas do banco e iniciar reconciliação periódica"""
+        self.app = app
+        with app.app_context():
+            self.reconcile()
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._reconcile_loop, daemon=True)
+            self.thread.start()
+
+    def on_message_created(self, message_id, fake_name, content, created_at):
+        """Registrar nova mensagem"""
+        with self.lock:
+            self.total += 1
+            self._count_hour(_hour_number(created_at))
+            if len(self.candidates) < TOP_CANDIDATES_SIZE:
+                self.candidates[message_id] = [0, fake_name, content]
+            self.cached_payload = None
+
+    def on_like(self, message_id, likes_count, fake_name=None, content=None):
+        """Registrar alteração de likes de uma mensagem"""
+        with self.lock:
+            candidate = self.candidates.get(message_id)
+
+            if candidate is not None:
+                candidate[0] = likes_count
+            elif likes_count > self.floor or len(self.candidates) < TOP_CANDIDATES_SIZE:
+                if fake_name is None:
+                    # Sem os dados da mensagem não há como exibi-la: reconciliar em breve
+                    self.reconcile_event.set()
+                    return
+                self.candidates[message_id] = [likes_count, fake_name, content]
+                if len(self.candidates) > TOP_CANDIDATES_SIZE:
+                    lowest_id = min(self.candidates, key=lambda mid: self.candidates[mid][0])
+                    self.floor = max(self.floor, self.candidates.pop(lowest_id)[0])
+            else:
+                return
+
+            # Se o top deixou de ser garantidamente correto, reconciliar
+            ranked = sorted(likes for likes, _, _ in self.candidates.values())
+            if len(ranked) >= TOP_MESSAGES_SIZE and ranked[-TOP_MESSAGES_SIZE] < self.floor:
+                self.reconcile_event.set()
+
+            self.cached_payload = None
+
+    def on_displayed(self):
+        """Registrar mensagem exibida no OBS"""
+        with self.lock:
+            self.displayed += 1
+            self.cached_payload = None
+
+    def request_reconcile(self):
+        """Pedir reconciliação antecipada (ex.: após limpeza do banco)"""
+        self.reconcile_event.set()
+
+    def _count_hour(self, hour):
+        _count_hour(self.hour_slots, self.hour_counts, hour)
+
+    def _recent_count(self, current_hour):
+        return sum(
+            count for hour, count in zip(self.hour_slots, self.hour_counts)
+            if hour is not None and current_hour - hour < HOURS_WINDOW
+        )
+
+    def get_stats(self):
+        """Obter estatísticas prontas para o endpoint"""
+        return json.loads(self.get_payload())
+
+    def get_payload(self):
+        """Obter estatísticas já serializadas em JSON (bytes)"""
+        from src.services.payload_cache import payload_cache, assemble
+
+        current_hour = int(time.time()) // 3600
+
+        with self.lock:
+            payload = self.cached_payload
+            if payload is not None and payload[0] == current_hour:
+                return payload[1]
+
+            top = sorted(self.candidates.items(), key=lambda item: (-item[1][0], item[0]))[:TOP_MESSAGES_SIZE]
+
+            # Cada mensagem do top é serializada uma vez por contagem de likes
+            top_messages = [
+                payload_cache.get(
+                    message_id, 'stats', (likes,),
+                    partial(_top_message_data, message_id, likes, fake_name, content)
+                )
+                for message_id, (likes, fake_name, content) in top
+            ]
+
+            encoded = assemble(
+                total_messages=self.total,
+                displayed_messages=self.displayed,
+                pending_messages=self.total - self.displayed,
+                recent_messages_24h=self._recent_count(current_hour),
+                top_messages=top_messages
+            )
+            self.cached_payload = (current_hour, encoded)
+            return encoded
+
+    def reconcile(self):
+        """Recalcular estatísticas a partir do banco"""
+        try:
+            from sqlalchemy import func, case, and_
+            from src.models.database import db, Message
+            from src.services.message_writer import message_writer
+
+            # Lidas antes das consultas: um lote gravado no meio do caminho aparece no banco
+            pending = message_writer.pending_rows()
+
+            total = Message.query.count()
+            displayed = Message.query.filter_by(is_displayed=True).count()
+
+            # Mensagens por hora em uma única consulta (uma contagem condicional por hora, sem funções de data do banco)
+            current_hour = _hour_number(datetime.utcnow())
+            hours = list(range(current_hour - HOURS_WINDOW + 1, current_hour + 1))
+            starts = [_EPOCH + timedelta(hours=number) for number in hours] + [_EPOCH + timedelta(hours=current_hour + 1)]
+            per_hour = db.session.query(*[
+                func.count(case((and_(Message.created_at >= starts[i], Message.created_at < starts[i + 1]), Message.id)))
+                for i in range(HOURS_WINDOW)
+            ]).filter(Message.created_at >= starts[0]).one()
+
+            # Mensagens já contadas em memória que ainda aguardam gravação (as gravadas nesse meio-tempo já estão no banco)
+            if pending:
+                written = {
+                    message_id for (message_id,) in db.session.query(Message.id).filter(
+                        Message.id.in_([row['id'] for row in pending])
+                    )
+                }
+                pending = [row for row in pending if row['id'] not in written]
+            total += len(pending)
+
+            top = Message.query.with_entities(
+                Message.id, Message.likes_count, Message.fake_name, Message.content
+            ).order_by(Message.likes_count.desc()).limit(TOP_CANDIDATES_SIZE).all()
+
+            hour_slots = [None] * HOURS_WINDOW
+            hour_counts = [0] * HOURS_WINDOW
+            for number, count in zip(hours, per_hour):
+                slot = number % HOURS_WINDOW
+                hour_slots[slot] = number
+                hour_counts[slot] = count
+            for row in pending:
+                _count_hour(hour_slots, hour_counts, _hour_number(row['created_at']))
+
+            candidates = {row.id: [row.likes_count or 0, row.fake_name, row.content] for row in top}
+            floor = min((likes for likes, _, _ in candidates.values()), default=0) if len(candidates) >= TOP_CANDIDATES_SIZE else 0
+
+            with self.lock:
+                self.total = total
+                self.displayed = displayed
+                self.hour_slots = hour_slots
+                self.hour_counts = hour_counts
+                self.candidates = candidates
+                self.floor = floor
+                self.cached_payload = None
+
+            logger.info(f"Estatísticas de mensagens reconciliadas: {total} mensagens")
+
+        except Exception as e:
+            logger.error(f"Erro ao reconciliar estatísticas de mensagens: {e}")
+
+    def _reconcile_loop(self):
+        while True:
+            self.reconcile_event.wait(self.reconcile_seconds)
+            self.reconcile_event.clear()
+            try:
+                with self.app.app_context():
+                    self.reconcile()
+            except Exception as e:
+                logger.error(f"Erro na reconciliação periódica de estatísticas: {e}")
+
+# Instância global do agregador de estatísticas
+message_stats = MessageStatsAggregator()
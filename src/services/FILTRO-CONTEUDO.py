@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lista de palavras proibidas (uma por linha, '#' para comentários)
+WORDLIST_PATH = os.getenv(
+    'MODERATION_WORDLIST',
+    os.path.join(os.path.dirname(__file__), 'PALAVRAS-PROIBIDAS.txt')
+)
+
+# Intervalo mínimo entre verificações de alteração do arquivo (segundos)
+WORDLIST_RELOAD_SECONDS = int(os.getenv('MODERATION_RELOAD_SECONDS', 5))
+
+# Lista usada quando o arquivo não existe
+DEFAULT_TERMS = ['spam', 'hack', 'bot']
+
+# Substituições comuns de leetspeak
+LEET_TABLE = str.maketrans({
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b',
+    '@': 'a', '$': 's'
+})
+
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+# Só sequências de 3 ou mais: letras dobradas são comuns em palavras normais ("boot", "carro")
+_REPEATED_CHARS = re.compile(r'(.)\1{2,}')
+_END = ''
+
+def normalize_text(text):
+    """Remover acentos, caixa, leetspeak e letras repetidas 3+ vezes ("Spåååm" -> "spam")"""
+    text = _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+    text = text.casefold().translate(LEET_TABLE)
+    return _REPEATED_CHARS.sub(r'\1', text)
+
+def _trie_pattern(node):
+    """Converter uma trie de termos em uma expressão regular sem alternativas redundantes"""
+    branches = []
+    singles = []
+
+    for char in sorted(key for key in node if key != _END):
+        sub = _trie_pattern(node[char])
+        if sub is None:
+            singles.append(re.escape(char))
+        else:
+            branches.append(re.escape(char) + sub)
+
+    if not branches and not singles:
+        return None
+
+    if singles:
+        branches.append(singles[0] if len(singles) == 1 else '[' + ''.join(singles) + ']')
+
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    if _END in node:
+        # Este prefixo também é um termo completo
+        pattern = '(?:' + pattern + ')?'
+
+    return pattern
+
+def compile_terms(terms):
+    """Compilar termos em uma única regex (trie) aplicada sobre o texto normalizado"""
+    trie = {}
+    originals = {}
+
+    for term in terms:
+        normalized = normalize_text(term.strip())
+        if not normalized:
+            continue
+        originals.setdefault(normalized, term.strip())
+
+        node = trie
+        for char in normalized:
+            node = node.setdefault(char, {})
+        node[_END] = {}
+
+    if not originals:
+        return None, {}
+
+    pattern = _trie_pattern(trie)
+    return re.compile(r'(?<!\w)' + pattern + r'(?!\w)'), originals
+
+class ContentFilter:
+    """Filtro de moderação em uma única passada por mensagem"""
+
+    def __init__(self, wordlist_path=WORDLIST_PATH, reload_seconds=WORDLIST_RELOAD_SECONDS):
+        self.wordlist_path = wordlist_path
+        self.reload_seconds = reload_seconds
+        self.lock = threading.Lock()
+        # (regex, termo normalizado -> termo original), trocados juntos
+        self.compiled = (None, {})
+        self.loaded_mtime = None
+        self.last_check = 0
+        self.reload()
+
+    def load_terms(self, terms):
+        """Substituir a lista de termos (compila fora do lock e troca atomicamente)"""
+        regex, originals = compile_terms(terms)
+        with self.lock:
+            self.compiled = (regex, originals)
+        logger.info(f"Filtro de conteúdo compilado com {len(originals)} termos")
+
+    def reload(self):
+        """Recarregar lista de palavras do arquivo"""
+        try:
+            if not os.path.exists(self.wordlist_path):
+                if self.loaded_mtime is None and self.compiled[0] is None:
+                    self.load_terms(DEFAULT_TERMS)
+                return
+
+            mtime = os.path.getmtime(self.wordlist_path)
+            if mtime == self.loaded_mtime:
+                return
+
+            with open(self.wordlist_path, encoding='utf-8') as f:
+                terms = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+            self.load_terms(terms)
+            self.loaded_mtime = mtime
+
+        except Exception as e:
+            logger.error(f"Erro ao carregar lista de palavras proibidas: {e}")
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self.last_check >= self.reload_seconds:
+            self.last_check = now
+            self.reload()
+
+    def find(self, text):
+        """Retornar os termos proibidos encontrados no texto (sem repetição)"""
+        if not text:
+            return []
+
+        self._maybe_reload()
+        regex, originals = self.compiled
+        if regex is None:
+            return []
+
+        found = []
+        for match in regex.finditer(normalize_text(text)):
+            term = originals.get(match.group(0), match.group(0))
+            if term not in found:
+                found.append(term)
+        return found
+
+    def is_allowed(self, text):
+        """Verificar se o texto não contém termos proibidos"""
+        return not self.find(text)
+
+# Instância global do filtro
+content_filter = ContentFilter()
+
+def find_forbidden_words(text):
+    """Função helper para buscar palavras proibidas"""
+    return content_filter.find(text)
@@ -0,0 +1,155 @@
+import os
+import time
+import math
+import threading
+import logging
+from collections import OrderedDict
+from src.services.state_backend import state_backend
+
+logger = logging.getLogger(__name__)
+
+# Políticas de rate limiting: quantas ações por período (em segundos)
+RATE_LIMIT_POLICIES = {
+    'message': {'limit': int(os.getenv('MESSAGE_RATE_LIMIT', 1)), 'period': 60},
+    'like': {'limit': int(os.getenv('LIKE_RATE_LIMIT', 10)), 'period': 60},
+    'vote': {'limit': int(os.getenv('VOTE_RATE_LIMIT', 5)), 'period': 60},
+    'login': {'limit': int(os.getenv('LOGIN_RATE_LIMIT', 5)), 'period': 300},
+}
+
+# Limite de chaves por política (proteção contra explosão de memória)
+MAX_KEYS_PER_POLICY = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+
+class _Bucket:
+    """Balde de tokens de uma chave"""
+
+    __slots__ = ('tokens', 'updated_at')
+
+    def __init__(self, tokens, updated_at):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+class RateLimiter:
+    """Rate limiter baseado em token bucket (O(1) por verificação), em memória ou compartilhado"""
+
+    def __init__(self, policies=None, clock=time.monotonic, max_keys=MAX_KEYS_PER_POLICY, backend=None):
+        self.policies = dict(policies or RATE_LIMIT_POLICIES)
+        self.clock = clock
+        self.max_keys = max_keys
+        # Com backend compartilhado os baldes valem para todos os workers
+        self.backend = backend if backend is not None and backend.shared else None
+        self.lock = threading.Lock()
+        # Um OrderedDict por política, ordenado do acesso mais antigo ao mais recente
+        self.buckets = {action: OrderedDict() for action in self.policies}
+
+    def set_policy(self, action, limit, period):
+        """Definir ou alterar uma política de rate limiting"""
+        with self.lock:
+            self.policies[action] = {'limit': int(limit), 'period': float(period)}
+            self.buckets.setdefault(action, OrderedDict()).clear()
+
+    def check(self, action, key):
+        """Consumir um token; retorna (permitido, segundos até nova tentativa)"""
+        policy = self.policies.get(action)
+        if not policy:
+            logger.warning(f"Política de rate limiting desconhecida: {action}")
+            return True, 0
+
+        capacity = policy['limit']
+        period = policy['period']
+        refill_rate = capacity / period
+
+        if self.backend is not None:
+            return self._check_shared(action, key, capacity, period, refill_rate)
+
+        now = self.clock()
+
+        with self.lock:
+            buckets = self.buckets[action]
+            bucket = buckets.get(key)
+
+            if bucket is None:
+                bucket = _Bucket(capacity, now)
+                buckets[key] = bucket
+            else:
+                # Reabastecer proporcionalmente ao tempo decorrido
+                elapsed = now - bucket.updated_at
+                bucket.tokens = min(capacity, bucket.tokens + elapsed * refill_rate)
+                bucket.updated_at = now
+                buckets.move_to_end(key)
+
+            self._evict_idle(buckets, now, period)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return True, 0
+
+            retry_after = math.ceil((1 - bucket.tokens) / refill_rate)
+            return False, retry_after
+
+    def _check_shared(self, action, key, capacity, period, refill_rate):
+        """Mesmo algoritmo, com o balde [tokens, atualizado_em] gravado atomicamente no backend"""
+        now = time.time()
+
+        def take(bucket):
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            if tokens >= 1:
+                return [tokens - 1, now], (True, 0)
+            return [tokens, now], (False, math.ceil((1 - tokens) / refill_rate))
+
+        # Após um período ocioso o balde estaria cheio: pode expirar
+        return self.backend.update(f'rate_limit:{action}', key, take, ttl=period)
+
+    def _evict_idle(self, buckets, now, period):
+        """Remover chaves ociosas (balde já estaria cheio) a partir das mais antigas"""
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if now - oldest.updated_at < period and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+    def reset(self, action, key=None):
+        """Limpar estado de uma chave (ou de toda a política)"""
+        if self.backend is not None:
+            if key is None:
+                self.backend.clear(f'rate_limit:{action}')
+            else:
+                self.backend.delete(f'rate_limit:{action}', key)
+            return
+
+        with self.lock:
+            buckets = self.buckets.get(action)
+            if buckets is None:
+                return
+            if key is None:
+                buckets.clear()
+            else:
+                buckets.pop(key, None)
+
+    def get_stats(self):
+        """Obter quantidade de chaves rastreadas por política"""
+        if self.backend is not None:
+            return {
+                action: {
+                    'tracked_keys': self.backend.count(f'rate_limit:{action}'),
+                    'limit': policy['limit'],
+                    'period_seconds': policy['period']
+                }
+                for action, policy in self.policies.items()
+            }
+
+        with self.lock:
+            return {
+                action: {
+                    'tracked_keys': len(self.buckets.get(action, ())),
+                    'limit': policy['limit'],
+                    'period_seconds': policy['period']
+                }
+                for action, policy in self.policies.items()
+            }
+
+# Instância global do rate limiter
+rate_limiter = RateLimiter(backend=state_backend)
+
+def check_rate_limit(key, action='message'):
+    """Função helper para verificar rate limiting"""
+    return rate_limiter.check(action, key)
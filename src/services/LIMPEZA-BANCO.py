@@ -0,0 +1,221 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Tamanho de cada lote e pausa entre lotes (libera o lock de escrita do SQLite)
+CLEANUP_CHUNK_SIZE = int(os.getenv('CLEANUP_CHUNK_SIZE', 500))
+CLEANUP_CHUNK_PAUSE_MS = int(os.getenv('CLEANUP_CHUNK_PAUSE_MS', 50))
+
+# Intervalo da limpeza automática em horas (0 = desativada)
+CLEANUP_INTERVAL_HOURS = float(os.getenv('CLEANUP_INTERVAL_HOURS', 0))
+
+# Retenção em dias
+MESSAGE_RETENTION_DAYS = int(os.getenv('MESSAGE_RETENTION_DAYS', 7))
+POLL_VOTE_RETENTION_DAYS = int(os.getenv('POLL_VOTE_RETENTION_DAYS', 30))
+TRANSCRIPTION_RETENTION_DAYS = int(os.getenv('TRANSCRIPTION_RETENTION_DAYS', 30))
+
+class CleanupService:
+    """Limpeza do banco em lotes curtos, sem segurar o lock de escrita"""
+
+    def __init__(self, chunk_size=CLEANUP_CHUNK_SIZE, chunk_pause_ms=CLEANUP_CHUNK_PAUSE_MS):
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause_ms / 1000.0
+        self.lock = threading.Lock()
+        self.app = None
+        self.is_running = False
+        self.scheduler_thread = None
+        self.status = {
+            'state': 'idle',
+            'current_step': None,
+            'started_at': None,
+            'finished_at': None,
+            'chunks': 0,
+            'removed': {},
+            'error': None
+        }
+
+    def init_app(self, app, interval_hours=CLEANUP_INTERVAL_HOURS):
+        """Associar à aplicação e agendar limpeza automática (se configurada)"""
+        self.app = app
+
+        if interval_hours > 0 and self.scheduler_thread is None:
+            self.scheduler_thread = threading.Thread(
+                target=self._schedule_loop,
+                args=(interval_hours * 3600,),
+                daemon=True
+            )
+            self.scheduler_thread.start()
+            logger.info(f"Limpeza automática agendada a cada {interval_hours} horas")
+
+    def start(self):
+        """Iniciar limpeza em segundo plano; retorna False se já está rodando"""
+        with self.lock:
+            if self.is_running:
+                return False
+            self.is_running = True
+
+        thread = threading.Thread(target=self._run_in_context, daemon=True)
+        thread.start()
+        return True
+
+    def get_status(self):
+        """Obter progresso da limpeza atual/última"""
+        with self.lock:
+            status = dict(self.status)
+            status['removed'] = dict(self.status['removed'])
+            return status
+
+    def _schedule_loop(self, interval_seconds):
+        while True:
+            time.sleep(interval_seconds)
+            if not self.start():
+                logger.info("Limpeza automática ignorada: limpeza anterior ainda em execução")
+
+    def _run_in_context(self):
+        try:
+            with self.app.app_context():
+                self.run()
+        finally:
+            with self.lock:
+                self.is_running = False
+
+    def _update_status(self, **changes):
+        with self.lock:
+            self.status.update(changes)
+
+    def _add_removed(self, step, count):
+        with self.lock:
+            self.status['removed'][step] = self.status['removed'].get(step, 0) + count
+            self.status['chunks'] += 1
+
+    def run(self):
+        """Executar todas as etapas da limpeza"""
+        from src.models.database import db
+
+        self._update_status(
+            state='running',
+            current_step=None,
+            started_at=datetime.utcnow().isoformat(),
+            finished_at=None,
+            chunks=0,
+            removed={},
+            error=None
+        )
+
+        try:
+            self._purge_messages()
+            self._purge_poll_votes()
+            self._purge_transcriptions()
+
+            self._update_status(state='finished', current_step=None, finished_at=datetime.utcnow().isoformat())
+            logger.info(f"Limpeza realizada: {self.get_status()['removed']}")
+
+        except Exception as e:
+            db.session.rollback()
+            self._update_status(state='failed', error=str(e), finished_at=datetime.utcnow().isoformat())
+            logger.error(f"Erro na limpeza do banco: {e}")
+
+    def _pause(self):
+        # Ceder a vez para requisições da live entre os lotes
+        time.sleep(self.chunk_pause)
+
+    def _purge_messages(self):
+        """Remover mensagens antigas sem likes (e seus likes) em lotes"""
+        from sqlalchemy import select, delete
+        from src.models.database import db, Message, MessageLike
+        from src.services.message_ranking import message_ranking
+        from src.services.like_aggregator import like_aggregator
+        from src.services.message_stats import message_stats
+        from src.services.payload_cache import payload_cache
+
+        self._update_status(current_step='messages')
+        cutoff = datetime.utcnow() - timedelta(days=MESSAGE_RETENTION_DAYS)
+        removed_any = False
+
+        while True:
+            # Os ids são necessários para atualizar os índices em memória
+            ids = db.session.execute(
+                select(Message.id).where(
+                    Message.created_at < cutoff,
+                    Message.likes_count == 0
+                ).order_by(Message.id).limit(self.chunk_size)
+            ).scalars().all()
+
+            if not ids:
+                break
+
+            db.session.execute(delete(MessageLike).where(MessageLike.message_id.in_(ids)))
+            db.session.execute(delete(Message).where(Message.id.in_(ids)))
+            db.session.commit()
+
+            for message_id in ids:
+                message_ranking.remove(message_id)
+                like_aggregator.forget(message_id)
+                payload_cache.invalidate(message_id)
+
+            removed_any = True
+            self._add_removed('messages', len(ids))
+
+            if len(ids) < self.chunk_size:
+                break
+            self._pause()
+
+        if removed_any:
+            message_stats.request_reconcile()
+
+    def _purge_poll_votes(self):
+        """Remover votos antigos de enquetes já encerradas em lotes"""
+        from sqlalchemy import select, delete
+        from src.models.database import db, Poll, PollVote
+
+        self._update_status(current_step='poll_votes')
+        cutoff = datetime.utcnow() - timedelta(days=POLL_VOTE_RETENTION_DAYS)
+
+        chunk = select(PollVote.id).join(Poll, Poll.id == PollVote.poll_id).where(
+            Poll.is_active == False,
+            PollVote.created_at < cutoff
+        ).limit(self.chunk_size)
+
+        self._delete_in_chunks('poll_votes', delete(PollVote).where(PollVote.id.in_(chunk)))
+
+    def _purge_transcriptions(self):
+        """Remover transcrições antigas em lotes"""
+        from sqlalchemy import select, delete
+        from src.models.database import Transcription
+
+        self._update_status(current_step='transcriptions')
+        cutoff = datetime.utcnow() - timedelta(days=TRANSCRIPTION_RETENTION_DAYS)
+
+        chunk = select(Transcription.id).where(Transcription.created_at < cutoff).limit(self.chunk_size)
+
+        self._delete_in_chunks('transcriptions', delete(Transcription).where(Transcription.id.in_(chunk)))
+
+    def _delete_in_chunks(self, step, statement):
+        """Executar DELETE ... WHERE id IN (SELECT ... LIMIT n) até esgotar"""
+        from src.models.database import db
+
+        while True:
+            result = db.session.execute(statement.execution_options(synchronize_session=False))
+            db.session.commit()
+
+            if result.rowcount:
+                self._add_removed(step, result.rowcount)
+
+            if result.rowcount < self.chunk_size:
+                break
+            self._pause()
+
+# Instância global do serviço de limpeza
+cleanup_service = CleanupService()
+
+def start_cleanup():
+    """Função helper para iniciar a limpeza"""
+    return cleanup_service.start()
+
+def get_cleanup_status():
+    """Função helper para obter progresso da limpeza"""
+    return cleanup_service.get_status()
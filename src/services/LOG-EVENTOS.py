@@ -0,0 +1,75 @@
+import os
+import uuid
+import logging
+from src.services.state_backend import state_backend
+
+logger = logging.getLogger(__name__)
+
+# Quantos eventos por sala ficam disponíveis para reenvio na reconexão
+EVENT_LOG_SIZE = int(os.getenv('EVENT_LOG_SIZE', 1000))
+
+# Tempo máximo que um evento fica no log (segundos)
+EVENT_LOG_TTL_SECONDS = int(os.getenv('EVENT_LOG_TTL_SECONDS', 600))
+
+class EventLog:
+    """Log limitado de eventos por sala com número de sequência crescente (para resync)"""
+
+    def __init__(self, backend=state_backend, size=EVENT_LOG_SIZE, ttl=EVENT_LOG_TTL_SECONDS):
+        # No backend compartilhado a sequência e o log valem para todos os workers
+        self.backend = backend
+        self.size = size
+        self.ttl = ttl
+        self._epoch = None
+
+    @property
+    def epoch(self):
+        """Identificador do ciclo de vida da sequência (muda quando ela recomeça, ex.: reinício com backend em memória)"""
+        if self._epoch is None:
+            # Gravado uma única vez no backend: todos os workers que compartilham a sequência usam o mesmo
+            def keep_or_create(current):
+                epoch = current or uuid.uuid4().hex[:8]
+                return epoch, epoch
+            self._epoch = self.backend.update('event_epoch', 'server', keep_or_create)
+        return self._epoch
+
+    def append(self, room, event, data):
+        """Registrar evento e retornar seu número de sequência"""
+        seq = self.backend.incr('event_seq', room)
+        # Posição no anel: o evento seq - size é sobrescrito
+        self.backend.set(
+            f'event_log:{room}', seq % self.size,
+            {'seq': seq, 'event': event, 'data': data},
+            ttl=self.ttl
+        )
+        return seq
+
+    def current_seq(self, room):
+        """Última sequência emitida na sala"""
+        return self.backend.get('event_seq', room, 0)
+
+    def since(self, room, last_seq, epoch=None):
+        """Eventos após last_seq, em ordem; None se algum já saiu da janela ou a época é outra (cliente precisa de snapshot)"""
+        # Sequência de outro ciclo de vida do servidor: os números não se comparam
+        if epoch != self.epoch:
+            return None
+
+        current = self.current_seq(room)
+
+        # Sequência à frente da atual ou atrasada demais
+        if last_seq > current or current - last_seq > self.size:
+            return None
+
+        events = []
+        for seq in range(last_seq + 1, current + 1):
+            entry = self.backend.get(f'event_log:{room}', seq % self.size)
+            if entry is None or entry['seq'] != seq:
+                return None
+            events.append(entry)
+        return events
+
+# Instância global do log de eventos
+event_log = EventLog()
+
+def get_missed_events(room, last_seq, epoch=None):
+    """Função helper para obter eventos perdidos desde last_seq"""
+    return event_log.since(room, last_seq, epoch)
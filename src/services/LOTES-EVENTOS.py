@@ -0,0 +1,83 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de envio dos eventos acumulados por sala (ms); 0 envia cada evento na hora
+BROADCAST_TICK_MS = int(os.getenv('BROADCAST_TICK_MS', 50))
+
+class EventBatcher:
+    """Acumula eventos por sala e envia um único quadro com todos a cada intervalo"""
+
+    def __init__(self, tick_ms=BROADCAST_TICK_MS):
+        self.tick = tick_ms / 1000.0
+        self.lock = threading.Lock()
+        # sala -> [(evento, dados), ...] na ordem em que foram gerados
+        self.pending = {}
+        self.send = None
+        self.thread = None
+        self.frames_sent = 0
+        self.events_sent = 0
+
+    def init_app(self, app, send):
+        """Iniciar envio periódico; send(sala, eventos) entrega a lista de uma sala"""
+        self.send = send
+
+        if self.thread is None and self.tick > 0:
+            self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.thread.start()
+            logger.info(f"Eventos enviados em lote a cada {int(self.tick * 1000)} ms por sala")
+
+    def queue(self, room, event, data):
+        """Adicionar evento ao lote da sala (envia na hora se o envio em lote estiver desligado)"""
+        if self.thread is None:
+            self._send(room, [(event, data)])
+            return
+
+        with self.lock:
+            self.pending.setdefault(room, []).append((event, data))
+
+    def flush(self):
+        """Enviar o lote acumulado de cada sala"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for room, events in pending.items():
+            self._send(room, events)
+
+    def _send(self, room, events):
+        try:
+            self.send(room, events)
+            self.frames_sent += 1
+            self.events_sent += len(events)
+        except Exception as e:
+            logger.error(f"Erro ao enviar lote da sala {room}: {e}")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao enviar lotes de eventos: {e}")
+
+    def get_stats(self):
+        """Obter métricas do envio em lote"""
+        with self.lock:
+            pending = sum(len(events) for events in self.pending.values())
+        return {
+            'tick_ms': int(self.tick * 1000),
+            'pending_events': pending,
+            'frames_sent': self.frames_sent,
+            'events_sent': self.events_sent,
+            'events_per_frame': round(self.events_sent / self.frames_sent, 2) if self.frames_sent else 0
+        }
+
+# Instância global do envio em lote
+event_batcher = EventBatcher()
+
+def flush_events():
+    """Função helper para enviar imediatamente os lotes pendentes"""
+    event_batcher.flush()
@@ -0,0 +1,322 @@
+import os
+import re
+import json
+import math
+import time
+import threading
+import logging
+from collections import Counter, deque
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+# Tabela de IDF em português (gerada a partir do chat e das transcrições salvas, junto do banco)
+KEYWORD_IDF_PATH = os.getenv('KEYWORD_IDF_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'IDF-PORTUGUES.json'
+)
+
+# Máximo de documentos usados para gerar a tabela de IDF
+KEYWORD_IDF_MAX_DOCS = int(os.getenv('KEYWORD_IDF_MAX_DOCS', 50000))
+
+# Mínimo de documentos para gravar a tabela (abaixo disso ela é usada só até reiniciar)
+KEYWORD_IDF_MIN_DOCS = int(os.getenv('KEYWORD_IDF_MIN_DOCS', 1000))
+
+# Idade máxima da tabela gravada antes de gerá-la de novo (dias)
+KEYWORD_IDF_MAX_AGE_DAYS = int(os.getenv('KEYWORD_IDF_MAX_AGE_DAYS', 7))
+
+# Janela da transcrição considerada como assunto atual da live (segundos)
+KEYWORD_WINDOW_SECONDS = int(os.getenv('KEYWORD_WINDOW_SECONDS', 600))
+
+# Máximo de segmentos da janela pontuados por extração
+KEYWORD_WINDOW_SEGMENTS = int(os.getenv('KEYWORD_WINDOW_SEGMENTS', 500))
+
+# Tempo máximo de uma extração; acima disso a janela pontuada encolhe (ms)
+KEYWORD_BUDGET_MS = int(os.getenv('KEYWORD_BUDGET_MS', 50))
+
+# Termos novos guardados no vocabulário antes de voltar ao da tabela
+KEYWORD_VOCAB_MAX = int(os.getenv('KEYWORD_VOCAB_MAX', 200000))
+
+# Peso do assunto da janela na pontuação dos termos do conteúdo
+WINDOW_WEIGHT = 0.3
+
+STOP_WORDS = [
+    'a', 'à', 'ao', 'aos', 'aquela', 'aquele', 'aquilo', 'as', 'às', 'até', 'com', 'como', 'da', 'das',
+    'de', 'dela', 'dele', 'deles', 'depois', 'do', 'dos', 'e', 'é', 'ela', 'elas', 'ele', 'eles', 'em',
+    'entre', 'era', 'essa', 'esse', 'esta', 'está', 'estão', 'estar', 'este', 'eu', 'foi', 'foram',
+    'gente', 'haver', 'isso', 'isto', 'já', 'lá', 'mais', 'mas', 'me', 'mesmo', 'meu', 'minha', 'muito',
+    'na', 'nas', 'não', 'nem', 'no', 'nos', 'nós', 'num', 'numa', 'o', 'os', 'ou', 'para', 'pela',
+    'pelo', 'por', 'porque', 'pra', 'quando', 'que', 'quem', 'se', 'sem', 'ser', 'seu', 'sua', 'são',
+    'também', 'tem', 'ter', 'tá', 'tipo', 'tu', 'tudo', 'um', 'uma', 'vai', 'você', 'vocês', 'aí',
+    'aqui', 'assim', 'então', 'ainda', 'agora', 'bem', 'cara', 'coisa', 'sim', 'só', 'sobre', 'nada'
+]
+
+# Sequências de palavras com inicial maiúscula (nomes de pessoas, lugares, marcas)
+_ENTITY = re.compile(r'\b[A-ZÀ-Ý][a-zà-ÿ]+(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ý][a-zà-ÿ]+)*')
+
+def build_analyzer():
+    """Tokenização usada na tabela e na extração: minúsculas, sem palavras irrelevantes, termos de 1 e 2 palavras"""
+    return CountVectorizer(
+        token_pattern=r'(?u)\b[^\W\d_]{3,}\b',
+        stop_words=STOP_WORDS,
+        ngram_range=(1, 2)
+    ).build_analyzer()
+
+def build_idf_table(documents, path=KEYWORD_IDF_PATH, min_documents=KEYWORD_IDF_MIN_DOCS):
+    """Calcular o IDF (suavizado, como no scikit-learn) de cada termo e gravar a tabela se houver documentos suficientes"""
+    analyzer = build_analyzer()
+    document_frequency = Counter()
+    total = 0
+    for document in documents:
+        document_frequency.update(set(analyzer(document)))
+        total += 1
+
+    # Termos de um único documento são ruído (erros de digitação, nomes de usuário)
+    idf = {
+        term: round(math.log((1 + total) / (1 + count)) + 1, 4)
+        for term, count in document_frequency.items() if count > 1
+    }
+    table = {'documents': total, 'built_at': time.time(), 'idf': idf}
+
+    if total < min_documents:
+        logger.info(f"Tabela de IDF com {len(idf)} termos de {total} documentos (não gravada, mínimo {min_documents})")
+        return table
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False)
+
+    logger.info(f"Tabela de IDF gerada com {len(idf)} termos de {total} documentos")
+    return table
+
+def is_idf_table_current(table, path=KEYWORD_IDF_PATH, min_documents=KEYWORD_IDF_MIN_DOCS,
+                         max_age_days=KEYWORD_IDF_MAX_AGE_DAYS):
+    """Tabela com documentos suficientes e gerada há menos de max_age_days (sem built_at vale a data do arquivo)"""
+    if table.get('documents', 0) < min_documents:
+        return False
+    built_at = table.get('built_at') or os.path.getmtime(path)
+    return time.time() - built_at < max_age_days * 86400
+
+class KeywordEngine:
+    """Palavras-chave e nomes do conteúdo por TF-IDF, em um único lote com a janela recente da transcrição"""
+
+    def __init__(self, idf_path=KEYWORD_IDF_PATH, window_seconds=KEYWORD_WINDOW_SECONDS,
+                 max_segments=KEYWORD_WINDOW_SEGMENTS, budget_ms=KEYWORD_BUDGET_MS):
+        self.idf_path = idf_path
+        self.window_seconds = window_seconds
+        self.max_segments = max_segments
+        # Segmentos pontuados por extração (reduzido quando o orçamento estoura)
+        self.segment_limit = max_segments
+        self.budget = budget_ms / 1000.0
+        self.lock = threading.Lock()
+        self.analyzer = build_analyzer()
+        # (instante, texto) dos segmentos recentes
+        self.segments = deque(maxlen=max_segments)
+        # Vocabulário (termo -> coluna, coluna -> termo) e IDF por coluna, mantidos entre extrações
+        self.vocabulary = {}
+        self.terms = []
+        self.idf = np.zeros(0)
+        self.table_size = 0
+        self.default_idf = None
+        self.extractions = 0
+        self.over_budget = 0
+        self.last_ms = 0.0
+
+    def init_app(self, app):
+        """Carregar a tabela de IDF; se faltar, for pequena ou antiga, gerá-la do banco em segundo plano"""
+        table = self._load_table()
+        if table is not None and is_idf_table_current(table, self.idf_path):
+            return
+
+        def build():
+            with app.app_context():
+                try:
+                    self._use_table(build_idf_table(self._corpus(), self.idf_path))
+                except Exception as e:
+                    logger.error(f"Erro ao gerar tabela de IDF: {e}")
+
+        threading.Thread(target=build, daemon=True).start()
+
+    def _load_table(self):
+        """Usar a tabela gravada enquanto outra é gerada; None se não houver"""
+        try:
+            if not os.path.exists(self.idf_path):
+                return None
+            with open(self.idf_path, encoding='utf-8') as f:
+                table = json.load(f)
+            self._use_table(table)
+            return table
+        except Exception as e:
+            logger.error(f"Erro ao carregar tabela de IDF: {e}")
+            return None
+
+    def _use_table(self, table):
+        terms = list(table['idf'])
+        with self.lock:
+            self.vocabulary = {term: index for index, term in enumerate(terms)}
+            self.terms = terms
+            self.idf = np.array([table['idf'][term] for term in terms], dtype=np.float64)
+            self.table_size = len(terms)
+            # Termo fora da tabela: tão raro quanto possível
+            self.default_idf = math.log(1 + table['documents']) + 1
+        logger.info(f"Tabela de IDF carregada com {len(terms)} termos")
+
+    def _corpus(self):
+        """Mensagens do chat e transcrições mais recentes"""
+        from src.models.database import db, Message, Transcription
+
+        limit = KEYWORD_IDF_MAX_DOCS // 2
+        for model in (Message, Transcription):
+            rows = db.session.query(model.content).order_by(model.id.desc()).limit(limit)
+            for (content,) in rows.yield_per(1000):
+                yield content
+
+    def add_segments(self, segments):
+        """Acrescentar segmentos transcritos (dicts com 'text') à janela"""
+        now = time.monotonic()
+        with self.lock:
+            for segment in segments:
+                text = segment['text'].strip()
+                if text:
+                    self.segments.append((now, text))
+
+    def _window(self):
+        cutoff = time.monotonic() - self.window_seconds
+        with self.lock:
+            while self.segments and self.segments[0][0] < cutoff:
+                self.segments.popleft()
+            return [text for _, text in self.segments][-self.segment_limit:]
+
+    def _vectorize(self, documents):
+        """Contagens (documentos x vocabulário) em uma matriz esparsa; termos novos entram no vocabulário"""
+        indices = []
+        data = []
+        indptr = [0]
+
+        with self.lock:
+            if len(self.vocabulary) > KEYWORD_VOCAB_MAX:
+                # Descartar termos novos acumulados, mantendo os da tabela
+                self.terms = self.terms[:self.table_size]
+                self.vocabulary = {term: index for index, term in enumerate(self.terms)}
+                self.idf = self.idf[:self.table_size]
+
+            new_terms = 0
+            for document in documents:
+                for term, count in Counter(self.analyzer(document)).items():
+                    index = self.vocabulary.get(term)
+                    if index is None:
+                        index = self.vocabulary[term] = len(self.terms)
+                        self.terms.append(term)
+                        new_terms += 1
+                    indices.append(index)
+                    data.append(count)
+                indptr.append(len(indices))
+
+            if new_terms:
+                self.idf = np.concatenate([self.idf, np.full(new_terms, self.default_idf or 0.0)])
+            idf = self.idf
+            size = len(self.vocabulary)
+
+        counts = sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(documents), size)
+        )
+        return counts, idf
+
+    def _score(self, counts, idf, has_window):
+        """Pontuar os termos do último documento (o conteúdo) somando o peso do assunto da janela"""
+        if self.default_idf is None:
+            # Sem tabela: IDF calculado sobre o próprio lote
+            document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+            idf = np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1
+
+        tf = counts.copy()
+        tf.data = 1 + np.log(tf.data)
+        tfidf = normalize(tf.multiply(idf).tocsr())
+
+        content = tfidf[-1]
+        scores = np.zeros(tfidf.shape[1])
+        scores[content.indices] = content.data
+        if has_window:
+            window = np.asarray(tfidf[:-1].mean(axis=0)).ravel()
+            scores[content.indices] += WINDOW_WEIGHT * window[content.indices]
+        return scores, content.indices, idf
+
+    def extract(self, content, top_n=3):
+        """Termos (1 ou 2 palavras) e nomes mais relevantes do conteúdo, do mais para o menos relevante"""
+        start = time.perf_counter()
+        window = self._window()
+
+        counts, idf = self._vectorize(window + [content])
+        scores, candidates, idf = self._score(counts, idf, bool(window))
+
+        with self.lock:
+            terms = {index: self.terms[index] for index in candidates}
+
+        keyphrases = []
+        for index in sorted(candidates, key=lambda i: scores[i], reverse=True):
+            term = terms[index]
+            # Não repetir palavra já coberta por um termo mais bem pontuado (e vice-versa)
+            if any(term in chosen or chosen in term for chosen in keyphrases):
+                continue
+            keyphrases.append(term)
+            if len(keyphrases) == top_n:
+                break
+
+        entities = self._entities(content, scores)
+
+        self._record(time.perf_counter() - start)
+        return {'keyphrases': keyphrases, 'entities': entities[:top_n]}
+
+    def _entities(self, content, scores):
+        """Nomes próprios do conteúdo, ordenados pela pontuação das palavras que os formam"""
+        found = {}
+        for match in _ENTITY.finditer(content):
+            name = match.group(0)
+            words = [word for word in name.lower().split() if word not in STOP_WORDS]
+            if not words:
+                continue
+            # Palavra comum no início da frase (ex.: "Concordo") não é nome
+            if len(words) == 1 and (match.start() == 0 or content[:match.start()].rstrip()[-1:] in '.!?'):
+                continue
+            with self.lock:
+                indices = [self.vocabulary.get(word) for word in words]
+            score = max((scores[index] for index in indices if index is not None and index < len(scores)), default=0.0)
+            found[name] = max(found.get(name, 0.0), score)
+        return sorted(found, key=found.get, reverse=True)
+
+    def _record(self, elapsed):
+        """Ajustar o tamanho da janela pontuada ao orçamento de tempo"""
+        with self.lock:
+            self.extractions += 1
+            self.last_ms = elapsed * 1000
+            if elapsed > self.budget:
+                self.over_budget += 1
+                self.segment_limit = max(1, self.segment_limit // 2)
+                logger.warning(f"Extração de palavras-chave levou {self.last_ms:.1f} ms; "
+                               f"janela reduzida para {self.segment_limit} segmentos")
+            elif elapsed < self.budget / 4 and self.segment_limit < self.max_segments:
+                self.segment_limit = min(self.max_segments, self.segment_limit * 2)
+
+    def get_stats(self):
+        """Obter métricas do extrator de palavras-chave"""
+        with self.lock:
+            return {
+                'idf_terms': self.table_size,
+                'vocabulary': len(self.vocabulary),
+                'window_segments': len(self.segments),
+                'segment_limit': self.segment_limit,
+                'extractions': self.extractions,
+                'over_budget': self.over_budget,
+                'last_ms': round(self.last_ms, 2)
+            }
+
+# Instância global do extrator de palavras-chave
+keyword_engine = KeywordEngine()
+
+def extract_keywords(content, top_n=3):
+    """Função helper para extrair palavras-chave e nomes"""
+    return keyword_engine.extract(content, top_n)
@@ -0,0 +1,233 @@
+import os
+import time
+import queue
+import atexit
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Capacidade da fila de escrita (mensagens aguardando o banco)
+MESSAGE_WRITER_QUEUE_SIZE = int(os.getenv('MESSAGE_WRITER_QUEUE_SIZE', 5000))
+
+# Tamanho máximo do lote e intervalo máximo entre gravações
+MESSAGE_WRITER_BATCH_SIZE = int(os.getenv('MESSAGE_WRITER_BATCH_SIZE', 200))
+MESSAGE_WRITER_FLUSH_MS = int(os.getenv('MESSAGE_WRITER_FLUSH_MS', 100))
+
+# Quanto tempo um envio espera por espaço na fila antes de ser recusado
+MESSAGE_WRITER_ENQUEUE_TIMEOUT_MS = int(os.getenv('MESSAGE_WRITER_ENQUEUE_TIMEOUT_MS', 50))
+
+# Tentativas de gravação de um lote antes de gravar mensagem por mensagem
+MESSAGE_WRITER_MAX_RETRIES = 3
+
+# Mensagens que nem sozinhas puderam ser gravadas, mantidas para inspeção
+MESSAGE_WRITER_DEAD_LETTERS = 1000
+
+# IDs reservados de uma vez na sequência compartilhada entre workers
+MESSAGE_ID_BLOCK_SIZE = int(os.getenv('MESSAGE_ID_BLOCK_SIZE', 100))
+
+class MessageWriter:
+    """Persistência write-behind das mensagens do chat em lotes"""
+
+    def __init__(self, queue_size=MESSAGE_WRITER_QUEUE_SIZE, batch_size=MESSAGE_WRITER_BATCH_SIZE,
+                 flush_ms=MESSAGE_WRITER_FLUSH_MS, enqueue_timeout_ms=MESSAGE_WRITER_ENQUEUE_TIMEOUT_MS):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self.lock = threading.Lock()
+        # Bloco de IDs reservado por este worker: [next_id, block_end)
+        self.next_id = 0
+        self.block_end = 0
+        self.pending = {}
+        self.dead_letters = deque(maxlen=MESSAGE_WRITER_DEAD_LETTERS)
+        self.app = None
+        self.thread = None
+        self.is_running = False
+        self.stats = {'written': 0, 'rejected': 0, 'failed': 0, 'batches': 0}
+
+    def init_app(self, app):
+        """Inicializar sequência de IDs a partir do banco e iniciar o gravador"""
+        from sqlalchemy import func
+        from src.models.database import db, Message
+        from src.services.state_backend import state_backend
+
+        self.app = app
+        with app.app_context():
+            max_id = db.session.query(func.max(Message.id)).scalar() or 0
+
+        # A sequência compartilhada nunca fica atrás do banco
+        state_backend.update('sequences', 'messages', lambda current: (max(current or 0, max_id), None))
+
+        if not self.is_running:
+            self.is_running = True
+            self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.thread.start()
+            atexit.register(self.shutdown)
+
+        logger.info(f"Gravador de mensagens iniciado (maior ID no banco: {max_id})")
+
+    def _reserve_id(self):
+        """Próximo ID do bloco deste worker, reservando um novo bloco quando esgota"""
+        from src.services.state_backend import state_backend
+
+        if self.next_id >= self.block_end:
+            last = state_backend.incr('sequences', 'messages', MESSAGE_ID_BLOCK_SIZE)
+            self.next_id = last - MESSAGE_ID_BLOCK_SIZE + 1
+            self.block_end = last + 1
+
+        message_id = self.next_id
+        self.next_id += 1
+        return message_id
+
+    def submit(self, user_id, fake_name, content):
+        """Reservar ID e enfileirar mensagem; retorna a linha ou None se a fila estiver cheia"""
+        with self.lock:
+            message_id = self._reserve_id()
+
+        row = {
+            'id': message_id,
+            'user_id': user_id,
+            'fake_name': fake_name,
+            'content': content,
+            'likes_count': 0,
+            'is_displayed': False,
+            'created_at': datetime.utcnow()
+        }
+
+        # Registrar antes de enfileirar para que o gravador sempre encontre a entrada
+        with self.lock:
+            self.pending[message_id] = row
+
+        try:
+            self.queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self.lock:
+                self.pending.pop(message_id, None)
+                self.stats['rejected'] += 1
+            logger.warning("Fila de gravação de mensagens cheia: mensagem recusada")
+            return None
+
+        return row
+
+    def is_pending(self, message_id):
+        """Verificar se a mensagem ainda não foi gravada no banco"""
+        return message_id in self.pending
+
+    def get_pending(self, message_id):
+        """Obter mensagem ainda não gravada (ou None)"""
+        return self.pending.get(message_id)
+    
+    def pending_rows(self):
+        """Cópia das mensagens ainda não gravadas no banco"""
+        with self.lock:
+            return list(self.pending.values())
+
+    def _next_batch(self):
+        """Aguardar a primeira mensagem e completar o lote com o que já estiver na fila"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer_loop(self):
+        while self.is_running:
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        """Gravar um lote em uma única transação"""
+        from sqlalchemy import insert
+        from src.models.database import db, Message
+
+        for attempt in range(1, MESSAGE_WRITER_MAX_RETRIES + 1):
+            try:
+                with self.app.app_context():
+                    db.session.execute(insert(Message), batch)
+                    db.session.commit()
+                break
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote de {len(batch)} mensagens (tentativa {attempt}): {e}")
+                with self.app.app_context():
+                    db.session.rollback()
+                time.sleep(self.flush_interval * attempt)
+        else:
+            # Uma linha ruim não deve derrubar o lote inteiro
+            self._write_rows(batch)
+            return
+
+        with self.lock:
+            for row in batch:
+                self.pending.pop(row['id'], None)
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+
+    def _write_rows(self, batch):
+        """Gravar as mensagens do lote uma a uma; as que falharem vão para dead_letters"""
+        from sqlalchemy import insert
+        from src.models.database import db, Message
+
+        written = 0
+        failed = []
+        with self.app.app_context():
+            for row in batch:
+                try:
+                    db.session.execute(insert(Message), [row])
+                    db.session.commit()
+                    written += 1
+                except Exception as e:
+                    db.session.rollback()
+                    failed.append(row)
+                    logger.error(f"Mensagem {row['id']} de {row['fake_name']} não gravada: {e}")
+
+        with self.lock:
+            for row in batch:
+                self.pending.pop(row['id'], None)
+            self.dead_letters.extend(failed)
+            self.stats['written'] += written
+            self.stats['failed'] += len(failed)
+
+        if failed:
+            logger.error(f"Mensagens perdidas (já transmitidas): {[row['id'] for row in failed]}")
+
+    def flush(self):
+        """Gravar imediatamente tudo o que estiver na fila"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def shutdown(self):
+        """Parar o gravador garantindo que nada fique na fila"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=self.flush_interval * 10)
+        self.flush()
+        logger.info(f"Gravador de mensagens encerrado: {self.stats['written']} mensagens gravadas")
+
+    def get_stats(self):
+        """Obter métricas do gravador"""
+        with self.lock:
+            return dict(self.stats, queued=self.queue.qsize(), pending=len(self.pending),
+                        dead_letters=len(self.dead_letters))
+
+# Instância global do gravador
+message_writer = MessageWriter()
@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+import logging
+from src.services.state_backend import state_backend, WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre eventos de presença/estatísticas de uma mesma sala (ms)
+PRESENCE_TICK_MS = int(os.getenv('PRESENCE_TICK_MS', 1000))
+
+def _online_payload(count):
+    return {'online_users': count}
+
+class PresenceService:
+    """Contagem de usuários online por sala com eventos agregados por intervalo"""
+
+    def __init__(self, tick_ms=PRESENCE_TICK_MS, backend=None):
+        self.tick = tick_ms / 1000.0
+        self.lock = threading.Lock()
+        # Com backend compartilhado cada worker publica suas contagens e lê o total
+        self.backend = backend if backend is not None and backend.shared else None
+        # Contagem de um worker que parou de publicar deixa de valer após este tempo
+        self.worker_ttl = max(5.0, self.tick * 5)
+        # sid -> (sala, user_id)
+        self.sessions = {}
+        # sala -> quantidade de conexões neste processo
+        self.counts = {}
+        # sala -> quantidade de conexões em todos os workers
+        self.totals = {}
+        # sala -> (evento, função que monta o payload a partir da contagem)
+        self.rooms = {}
+        self.dirty = set()
+        self.emit = None
+        self.thread = None
+        self.published = 0
+
+    def register_room(self, room, event, build=_online_payload):
+        """Definir o evento publicado para uma sala"""
+        with self.lock:
+            self.rooms[room] = (event, build)
+
+    def init_app(self, app, socketio, emit=None):
+        """Iniciar publicação periódica pelo Socket.IO da aplicação (ou pela função emit informada)"""
+        self.emit = emit or socketio.emit
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._publish_loop, daemon=True)
+            self.thread.start()
+            logger.info(f"Presença publicada a cada {int(self.tick * 1000)} ms por sala")
+
+    def join(self, sid, room, user_id=None):
+        """Registrar conexão em uma sala"""
+        with self.lock:
+            previous = self.sessions.get(sid)
+            if previous is not None:
+                self._decrement(previous[0])
+            self.sessions[sid] = (room, user_id)
+            self.counts[room] = self.counts.get(room, 0) + 1
+            self.dirty.add(room)
+
+    def leave(self, sid):
+        """Remover conexão; retorna o user_id registrado (ou None)"""
+        with self.lock:
+            session = self.sessions.pop(sid, None)
+            if session is None:
+                return None
+            self._decrement(session[0])
+            self.dirty.add(session[0])
+            return session[1]
+
+    def _decrement(self, room):
+        remaining = self.counts.get(room, 0) - 1
+        if remaining > 0:
+            self.counts[room] = remaining
+        else:
+            self.counts.pop(room, None)
+
+    def touch(self, room):
+        """Marcar sala para republicar no próximo intervalo (ex.: nova mensagem)"""
+        with self.lock:
+            self.dirty.add(room)
+
+    def get_user(self, sid):
+        """Obter user_id de uma conexão"""
+        session = self.sessions.get(sid)
+        return session[1] if session else None
+
+    def count(self, room=None):
+        """Conexões na sala (ou em todas), sem recalcular"""
+        counts = self.totals if self.backend is not None else self.counts
+        if room is None:
+            return sum(counts.values())
+        return counts.get(room, 0)
+
+    def get_counts(self):
+        """Obter contagem por sala"""
+        with self.lock:
+            return dict(self.totals if self.backend is not None else self.counts)
+
+    def _sync_workers(self):
+        """Publicar as contagens deste worker e somar as de todos; marca salas cujo total mudou"""
+        with self.lock:
+            local_counts = dict(self.counts)
+
+        self.backend.set('presence', WORKER_ID, local_counts, ttl=self.worker_ttl)
+
+        totals = {}
+        for _, worker_counts in self.backend.items('presence'):
+            for room, count in worker_counts.items():
+                totals[room] = totals.get(room, 0) + count
+
+        with self.lock:
+            for room in set(totals) | set(self.totals):
+                if totals.get(room, 0) != self.totals.get(room, 0):
+                    self.dirty.add(room)
+            self.totals = totals
+
+    def publish(self):
+        """Enviar um único evento por sala alterada desde o último intervalo"""
+        if self.backend is not None:
+            self._sync_workers()
+
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            pending = [
+                (room, self.rooms[room], self.count(room))
+                for room in dirty if room in self.rooms
+            ]
+
+        for room, (event, build), count in pending:
+            try:
+                if self.backend is not None:
+                    # Cada worker avisa apenas os próprios clientes (todos têm o mesmo total)
+                    self.emit(event, build(count), room=room, ignore_queue=True)
+                else:
+                    self.emit(event, build(count), room=room)
+                self.published += 1
+            except Exception as e:
+                logger.error(f"Erro ao publicar presença da sala {room}: {e}")
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.tick)
+            if self.emit is not None:
+                try:
+                    self.publish()
+                except Exception as e:
+                    logger.error(f"Erro ao sincronizar presença: {e}")
+
+    def get_stats(self):
+        """Obter métricas de presença"""
+        with self.lock:
+            return {
+                'online': self.count(),
+                'online_this_worker': len(self.sessions),
+                'rooms': dict(self.totals if self.backend is not None else self.counts),
+                'events_published': self.published
+            }
+
+# Instância global de presença
+presence = PresenceService(backend=state_backend)
+
+def get_online_count(room=None):
+    """Função helper para obter usuários online"""
+    return presence.count(room)
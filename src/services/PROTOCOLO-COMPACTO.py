@@ -0,0 +1,85 @@
+import calendar
+import logging
+from datetime import datetime
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+# Nome do evento Socket.IO que carrega os quadros binários
+COMPACT_EVENT = 'c'
+
+# Evento com vários quadros enviados juntos: [quadro1, quadro2, ...]
+COMPACT_BATCH_EVENT = 'cb'
+
+# Código do quadro genérico: [0, seq, nome do evento, dados]
+GENERIC_CODE = 0
+
+# Código -> (evento, campos na ordem do quadro, campos de data em epoch ms)
+EVENT_SCHEMAS = {
+    1: ('new_message', ('id', 'fake_name', 'content', 'likes', 'timestamp'), ('timestamp',)),
+    2: ('message_liked', ('message_id', 'likes_count'), ()),
+    # 3 era poll_vote_update (substituído por poll_tally); o código não é reaproveitado
+    4: ('stats_update', ('online_users', 'total_messages', 'new_subscriber', 'subscriber_name',
+                         'new_donation', 'amount', 'type'), ()),
+    5: ('poll_closed', ('poll_id', 'question', 'results', 'total_votes', 'timestamp'), ('timestamp',)),
+    6: ('new_poll', ('poll_id', 'question', 'options', 'duration_minutes', 'timestamp'), ('timestamp',)),
+    7: ('poll_generated', ('poll_id', 'question', 'trigger', 'timestamp'), ('timestamp',)),
+    8: ('embarrassing_queued', ('user_name', 'remaining', 'timestamp'), ('timestamp',)),
+    9: ('poll_tally', ('poll_id', 'votes', 'total_votes', 'final'), ()),
+}
+
+EVENT_CODES = {event: code for code, (event, _, _) in EVENT_SCHEMAS.items()}
+
+def to_epoch_ms(value):
+    """Converter data ISO (UTC, sem fuso) ou datetime em milissegundos desde a época"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if value.tzinfo is not None:
+        return int(value.timestamp() * 1000)
+    return calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000
+
+def build_frame(event, data):
+    """Montar o quadro de um evento: [código, seq, campo1, campo2, ...]"""
+    code = EVENT_CODES.get(event)
+    seq = data.get('seq')
+    if code is None:
+        return [GENERIC_CODE, seq, event, data]
+
+    _, fields, timestamp_fields = EVENT_SCHEMAS[code]
+    frame = [code, seq]
+    for field in fields:
+        value = data.get(field)
+        if field in timestamp_fields:
+            value = to_epoch_ms(value)
+        frame.append(value)
+
+    # Campos ausentes no final não precisam ser enviados
+    while len(frame) > 2 and frame[-1] is None:
+        frame.pop()
+
+    return frame
+
+def encode_event(event, data):
+    """Codificar evento em um quadro MessagePack"""
+    return msgpack.packb(build_frame(event, data), default=str)
+
+def encode_batch(events):
+    """Codificar lista de (evento, dados) em um único binário com todos os quadros"""
+    return msgpack.packb([build_frame(event, data) for event, data in events], default=str)
+
+def get_schema():
+    """Esquema enviado ao cliente na negociação (código -> [evento, campos, campos de data])"""
+    return {
+        str(code): [event, list(fields), list(timestamp_fields)]
+        for code, (event, fields, timestamp_fields) in EVENT_SCHEMAS.items()
+    }
+
+def wants_compact(args):
+    """Verificar se o cliente pediu o protocolo compacto na conexão (?protocol=compact)"""
+    return args.get('protocol') == 'compact'
@@ -0,0 +1,153 @@
+import os
+import time
+import threading
+import logging
+from src.services.state_backend import state_backend
+
+logger = logging.getLogger(__name__)
+
+# Apurações das enquetes enviadas por segundo aos espectadores
+POLL_TALLY_HZ = float(os.getenv('POLL_TALLY_HZ', 4))
+
+# Apurações por segundo enviadas ao overlay do OBS (0 desliga)
+POLL_TALLY_OVERLAY_HZ = float(os.getenv('POLL_TALLY_OVERLAY_HZ', 1))
+
+# Evento com a contagem completa de uma enquete
+POLL_TALLY_EVENT = 'poll_tally'
+
+class TallyRoom:
+    """Cadência e últimas contagens enviadas a uma sala"""
+
+    __slots__ = ('interval', 'next_due', 'sent')
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_due = 0.0
+        # poll_id -> total de votos da última apuração enviada
+        self.sent = {}
+
+class PollTallyPublisher:
+    """Publica a apuração das enquetes ativas em cadência fixa por sala, só das que mudaram"""
+
+    def __init__(self, backend=state_backend):
+        # Enquetes ativas e contadores ficam no backend compartilhado entre workers
+        self.backend = backend
+        self.lock = threading.Lock()
+        # sala -> TallyRoom
+        self.rooms = {}
+        self.emit = None
+        self.thread = None
+        self.published = 0
+        self.finals = 0
+
+    def register_room(self, room, hz):
+        """Publicar a apuração na sala hz vezes por segundo (0 desliga)"""
+        if hz <= 0:
+            return
+        with self.lock:
+            self.rooms[room] = TallyRoom(1.0 / hz)
+
+    def init_app(self, app, emit):
+        """Iniciar publicação periódica; emit(evento, dados, sala, **kwargs) envia para a sala"""
+        self.emit = emit
+
+        if self.thread is None and self.rooms:
+            self.thread = threading.Thread(target=self._publish_loop, daemon=True)
+            self.thread.start()
+            cadences = ', '.join(f'{room} a cada {int(state.interval * 1000)} ms'
+                                 for room, state in self.rooms.items())
+            logger.info(f"Apuração das enquetes publicada: {cadences}")
+
+    def build_tally(self, poll_data, counts, final=False):
+        """Montar o evento com os votos de todas as opções (chaves em texto, como no backend)"""
+        tally = {
+            'poll_id': poll_data['id'],
+            'votes': {str(option['id']): counts.get(str(option['id']), 0) for option in poll_data['options']},
+            'total_votes': counts.get('total', 0)
+        }
+        if final:
+            tally['final'] = True
+        return tally
+
+    def publish(self, now=None):
+        """Enviar às salas cujo intervalo venceu a apuração das enquetes que mudaram desde o último envio"""
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            due = [(room, state) for room, state in self.rooms.items() if now >= state.next_due]
+            for _, state in due:
+                state.next_due = now + state.interval
+
+        if not due:
+            return
+
+        active = {poll_data['id']: poll_data for _, poll_data in self.backend.items('active_polls')}
+        totals = {poll_id: self.backend.get(f'poll_votes:{poll_id}', 'total', 0) for poll_id in active}
+        tallies = {}
+
+        for room, state in due:
+            # Enquetes encerradas recebem a apuração final no encerramento
+            for poll_id in list(state.sent):
+                if poll_id not in active:
+                    del state.sent[poll_id]
+
+            for poll_id, total in totals.items():
+                if state.sent.get(poll_id, 0) == total:
+                    continue
+                if poll_id not in tallies:
+                    counts = dict(self.backend.items(f'poll_votes:{poll_id}'))
+                    tallies[poll_id] = self.build_tally(active[poll_id], counts)
+                self._send(room, tallies[poll_id])
+                state.sent[poll_id] = total
+
+    def _send(self, room, tally, all_workers=False):
+        try:
+            if self.backend.shared and not all_workers:
+                # Cada worker avisa apenas os próprios clientes (todos leem os mesmos contadores)
+                self.emit(POLL_TALLY_EVENT, tally, room, ignore_queue=True)
+            else:
+                self.emit(POLL_TALLY_EVENT, tally, room)
+            self.published += 1
+        except Exception as e:
+            logger.error(f"Erro ao publicar apuração da enquete {tally['poll_id']} na sala {room}: {e}")
+
+    def publish_final(self, poll_data, counts):
+        """Enviar já a apuração final de uma enquete encerrada a todas as salas"""
+        if self.emit is None:
+            return
+
+        tally = self.build_tally(poll_data, counts, final=True)
+        with self.lock:
+            rooms = list(self.rooms.items())
+
+        for room, state in rooms:
+            state.sent.pop(poll_data['id'], None)
+            # Só o worker que encerrou envia: vai pela fila para alcançar os clientes de todos
+            self._send(room, tally, all_workers=True)
+        self.finals += 1
+
+    def _publish_loop(self):
+        tick = min(state.interval for state in self.rooms.values())
+        while True:
+            time.sleep(tick)
+            if self.emit is not None:
+                try:
+                    self.publish()
+                except Exception as e:
+                    logger.error(f"Erro ao publicar apuração das enquetes: {e}")
+
+    def get_stats(self):
+        """Obter métricas da publicação das apurações"""
+        with self.lock:
+            return {
+                'rooms': {room: round(1.0 / state.interval, 2) for room, state in self.rooms.items()},
+                'tallies_published': self.published,
+                'final_tallies': self.finals
+            }
+
+# Instância global do publicador de apurações
+poll_publisher = PollTallyPublisher()
+
+def get_poll_tally_stats():
+    """Função helper para obter métricas da publicação das apurações"""
+    return poll_publisher.get_stats()
@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+import logging
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+# Com vários workers, intervalo de reconstrução do índice a partir do banco (segundos, 0 desliga)
+MESSAGE_RANKING_REBUILD_SECONDS = int(os.getenv('MESSAGE_RANKING_REBUILD_SECONDS', 5))
+
+class RankedMessage:
+    """Mensagem não exibida mantida no índice de ranking"""
+
+    __slots__ = ('id', 'fake_name', 'content', 'likes_count', 'created_at')
+
+    def __init__(self, id, fake_name, content, likes_count, created_at):
+        self.id = id
+        self.fake_name = fake_name
+        self.content = content
+        self.likes_count = likes_count
+        self.created_at = created_at
+
+    @property
+    def sort_key(self):
+        # Mais likes primeiro; em caso de empate, a mais antiga primeiro
+        return (-self.likes_count, self.created_at, self.id)
+
+class MessageRankingIndex:
+    """Índice em memória das mensagens não exibidas, ordenado por (likes, data)"""
+
+    def __init__(self, rebuild_seconds=MESSAGE_RANKING_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self.lock = threading.Lock()
+        self.rebuild_lock = threading.Lock()
+        self.entries = {}
+        self.ranking = []
+        # Alterações feitas durante uma reconstrução, reaplicadas antes da troca (None fora dela)
+        self.journal = None
+        self.app = None
+        self.thread = None
+
+    def init_app(self, app):
+        """Carregar o índice e, com estado compartilhado, reconstruí-lo periodicamente"""
+        from src.services.state_backend import state_backend
+
+        self.app = app
+        with app.app_context():
+            if self.rebuild():
+                logger.info(f"Índice de ranking reconstruído: {len(self)} mensagens na fila")
+
+        # Mensagens, likes e exibições de outros workers só chegam a este pelo banco
+        if state_backend.shared and self.rebuild_seconds > 0 and self.thread is None:
+            self.thread = threading.Thread(target=self._rebuild_loop, daemon=True)
+            self.thread.start()
+            logger.info(f"Índice de ranking reconstruído do banco a cada {self.rebuild_seconds}s")
+
+    def _rebuild_loop(self):
+        while True:
+            time.sleep(self.rebuild_seconds)
+            with self.app.app_context():
+                self.rebuild()
+
+    def rebuild(self):
+        """Reconstruir o índice a partir do banco e das mensagens deste worker ainda não gravadas"""
+        with self.rebuild_lock:
+            with self.lock:
+                self.journal = []
+            try:
+                return self._rebuild()
+            finally:
+                with self.lock:
+                    self.journal = None
+
+    def _rebuild(self):
+        try:
+            from src.models.database import Message
+            from src.services.message_writer import message_writer
+
+            # Lidas antes da consulta: uma mensagem gravada no meio do caminho aparece no banco
+            pending = message_writer.pending_rows()
+
+            rows = Message.query.with_entities(
+                Message.id,
+                Message.fake_name,
+                Message.content,
+                Message.likes_count,
+                Message.created_at
+            ).filter_by(is_displayed=False).all()
+
+            entries = {
+                row['id']: RankedMessage(row['id'], row['fake_name'], row['content'], 0, row['created_at'])
+                for row in pending
+            }
+            entries.update(
+                (row.id, RankedMessage(row.id, row.fake_name, row.content, row.likes_count or 0, row.created_at))
+                for row in rows
+            )
+
+            with self.lock:
+                # Likes, mensagens e remoções que chegaram enquanto o banco era lido
+                for operation, message_id, value in self.journal:
+                    if operation == 'add':
+                        entries[message_id] = value
+                    elif operation == 'likes':
+                        if message_id in entries:
+                            entries[message_id].likes_count = value
+                    else:
+                        entries.pop(message_id, None)
+                self.entries = entries
+                self.ranking = sorted(entry.sort_key for entry in entries.values())
+            return True
+
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir índice de ranking: {e}")
+            return False
+
+    def add(self, message_id, fake_name, content, created_at, likes_count=0):
+        """Adicionar nova mensagem à fila"""
+        entry = RankedMessage(message_id, fake_name, content, likes_count, created_at)
+
+        with self.lock:
+            if message_id in self.entries:
+                self._remove_key(self.entries[message_id].sort_key)
+            self.entries[message_id] = entry
+            insort(self.ranking, entry.sort_key)
+            if self.journal is not None:
+                self.journal.append(('add', message_id, entry))
+
+    def update_likes(self, message_id, likes_count):
+        """Atualizar a posição de uma mensagem após um like/deslike"""
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append(('likes', message_id, likes_count))
+            entry = self.entries.get(message_id)
+            if entry is None or entry.likes_count == likes_count:
+                return
+
+            self._remove_key(entry.sort_key)
+            entry.likes_count = likes_count
+            insort(self.ranking, entry.sort_key)
+
+    def remove(self, message_id):
+        """Remover mensagem da fila (exibida ou apagada)"""
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append(('remove', message_id, None))
+            entry = self.entries.pop(message_id, None)
+            if entry is not None:
+                self._remove_key(entry.sort_key)
+
+    def _remove_key(self, key):
+        index = bisect_left(self.ranking, key)
+        if index < len(self.ranking) and self.ranking[index] == key:
+            del self.ranking[index]
+
+    def get_queue(self, limit=10):
+        """Top-K da fila: mais likes primeiro, mais antigas primeiro no empate"""
+        with self.lock:
+            return [self.entries[key[2]] for key in self.ranking[:limit]]
+
+    def get_top(self):
+        """Mensagem com mais likes; no empate, a mais recente"""
+        with self.lock:
+            if not self.ranking:
+                return None
+
+            # Fim do grupo com o maior número de likes
+            top_likes = self.ranking[0][0]
+            end = bisect_left(self.ranking, (top_likes + 1,))
+            return self.entries[self.ranking[end - 1][2]]
+
+    def __len__(self):
+        return len(self.entries)
+
+# Instância global do índice
+message_ranking = MessageRankingIndex()
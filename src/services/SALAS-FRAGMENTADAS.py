@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de sub-salas em que a audiência de uma sala grande é dividida (1 desliga)
+LIVE_ROOM_SHARDS = int(os.getenv('LIVE_ROOM_SHARDS', 1))
+
+def shard_room(room, index):
+    """Nome da sub-sala de uma sala fragmentada"""
+    return f'{room}:shard{index}'
+
+class ShardStats:
+    """Contadores de uma sub-sala"""
+
+    __slots__ = ('clients', 'emits', 'total_ms', 'max_ms', 'last_ms')
+
+    def __init__(self):
+        self.clients = 0
+        self.emits = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms):
+        self.emits += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def to_dict(self):
+        return {
+            'clients': self.clients,
+            'emits': self.emits,
+            'avg_emit_ms': round(self.total_ms / self.emits, 3) if self.emits else 0,
+            'max_emit_ms': round(self.max_ms, 3),
+            'last_emit_ms': round(self.last_ms, 3)
+        }
+
+class RoomSharder:
+    """Divide a audiência de salas grandes em sub-salas e envia para uma de cada vez"""
+
+    def __init__(self, shards=LIVE_ROOM_SHARDS):
+        self.shards = max(1, shards)
+        self.lock = threading.Lock()
+        # sala -> [nomes das sub-salas]
+        self.sharded = {}
+        # sub-sala -> ShardStats
+        self.stats = {}
+        # sid -> sub-sala atribuída
+        self.assignments = {}
+
+    def register_room(self, room):
+        """Fragmentar a sala informada (sem efeito com uma única sub-sala)"""
+        with self.lock:
+            if self.shards == 1:
+                names = [room]
+            else:
+                names = [shard_room(room, index) for index in range(self.shards)]
+            self.sharded[room] = names
+            for name in names:
+                self.stats.setdefault(name, ShardStats())
+
+        if self.shards > 1:
+            logger.info(f"Sala {room} dividida em {self.shards} sub-salas")
+
+    def rooms(self, room):
+        """Sub-salas de uma sala (a própria sala se não for fragmentada)"""
+        return self.sharded.get(room, [room])
+
+    def assign(self, sid, room):
+        """Escolher a sub-sala com menos clientes para o socket"""
+        with self.lock:
+            names = self.sharded.get(room)
+            if names is None:
+                return room
+            name = min(names, key=lambda candidate: self.stats[candidate].clients)
+            self.stats[name].clients += 1
+            self.assignments[sid] = name
+            return name
+
+    def release(self, sid):
+        """Liberar a vaga do socket desconectado"""
+        with self.lock:
+            name = self.assignments.pop(sid, None)
+            if name is not None:
+                self.stats[name].clients -= 1
+
+    def _timed(self, name, send):
+        start = time.perf_counter()
+        try:
+            send(name)
+        except Exception as e:
+            logger.error(f"Erro ao enviar para a sub-sala {name}: {e}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.stats[name].record(elapsed_ms)
+
+    def fan_out(self, room, send):
+        """Chamar send(sub-sala) para cada sub-sala da sala, cedendo o loop entre uma e outra"""
+        names = self.sharded.get(room)
+        if names is None:
+            send(room)
+            return
+
+        for index, name in enumerate(names):
+            if index:
+                # Com eventlet, sleep(0) deixa os sockets andarem entre uma sub-sala e outra
+                time.sleep(0)
+            self._timed(name, send)
+
+    def get_stats(self):
+        """Obter métricas por sub-sala"""
+        with self.lock:
+            return {
+                'shards': self.shards,
+                'rooms': {
+                    room: {name: self.stats[name].to_dict() for name in names}
+                    for room, names in self.sharded.items()
+                }
+            }
+
+# Instância global das salas fragmentadas
+room_shards = RoomSharder()
+
+def get_shard_stats():
+    """Função helper para obter métricas das sub-salas"""
+    return room_shards.get_stats()
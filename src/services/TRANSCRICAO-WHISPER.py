@@ -9,11 +9,83 @@ import tempfile
 import subprocess
 from threading import Timer
 import re
-from collections import Counter
+from collections import Counter, deque
 import json
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# "streaming": ffmpeg contínuo transcrito em trechos; "batch": gravação de 5 minutos a cada 15
+TRANSCRIPTION_MODE = os.getenv('TRANSCRIPTION_MODE', 'streaming')
+
+# Tamanho de cada trecho transcrito e sobreposição com o anterior (segundos)
+TRANSCRIPTION_CHUNK_SECONDS = int(os.getenv('TRANSCRIPTION_CHUNK_SECONDS', 30))
+TRANSCRIPTION_OVERLAP_SECONDS = int(os.getenv('TRANSCRIPTION_OVERLAP_SECONDS', 5))
+
+# Áudio mantido em memória; se a transcrição atrasar mais que isso, pula para o trecho mais recente
+TRANSCRIPTION_BUFFER_SECONDS = int(os.getenv('TRANSCRIPTION_BUFFER_SECONDS', 120))
+
+# Intervalo entre gravações da transcrição acumulada no banco (segundos de áudio)
+TRANSCRIPTION_SAVE_SECONDS = int(os.getenv('TRANSCRIPTION_SAVE_SECONDS', 300))
+
+# Intervalo mínimo entre enquetes geradas pela transcrição contínua
+TRANSCRIPTION_POLL_COOLDOWN_SECONDS = int(os.getenv('TRANSCRIPTION_POLL_COOLDOWN_SECONDS', 300))
+
+# Formato entregue pelo ffmpeg: PCM 16 bits mono a 16 kHz (o que o Whisper espera)
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+# Leitura do pipe em blocos de meio segundo
+READ_BYTES = SAMPLE_RATE * BYTES_PER_SAMPLE // 2
+
+# Segmentos terminando a menos disso do fim do trecho provavelmente foram cortados (segundos)
+BOUNDARY_SECONDS = 1.0
+
+def _normalize_segment(text):
+    """Texto de segmento comparável entre trechos (sem caixa, pontuação e espaços extras)"""
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+class AudioRingBuffer:
+    """Amostras de áudio (float32) em um array circular, endereçadas pela posição absoluta no stream"""
+
+    def __init__(self, seconds, sample_rate=SAMPLE_RATE):
+        self.capacity = seconds * sample_rate
+        self.samples = np.zeros(self.capacity, dtype=np.float32)
+        self.condition = threading.Condition()
+        # Total de amostras já escritas desde o início do stream
+        self.written = 0
+
+    def write(self, block):
+        """Escrever amostras, sobrescrevendo as mais antigas"""
+        skipped = max(0, len(block) - self.capacity)
+        block = block[skipped:]
+        with self.condition:
+            self.written += skipped
+            start = self.written % self.capacity
+            first = min(len(block), self.capacity - start)
+            self.samples[start:start + first] = block[:first]
+            self.samples[:len(block) - first] = block[first:]
+            self.written += len(block)
+            self.condition.notify_all()
+
+    def wait_for(self, position, timeout=None):
+        """Aguardar até haver amostras escritas até a posição; retorna False no timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.written >= position, timeout)
+
+    def read(self, start, end):
+        """Copiar as amostras [start, end); None se já foram sobrescritas"""
+        with self.condition:
+            if start < self.written - self.capacity or end > self.written:
+                return None
+            return self.samples[np.arange(start, end) % self.capacity]
+
+    def reset(self):
+        with self.condition:
+            self.written = 0
+            self.condition.notify_all()
+
 class WhisperTranscriptionService:
     """Serviço para transcrição automática com Whisper"""
     
@@ -24,6 +96,22 @@ class WhisperTranscriptionService:
         self.transcription_interval = 15 * 60  # 15 minutos
         self.timer = None
         self.last_transcription = None
+        self.mode = TRANSCRIPTION_MODE
+        # Transcrição contínua: trechos sobrepostos lidos do buffer de áudio
+        self.chunk_samples = TRANSCRIPTION_CHUNK_SECONDS * SAMPLE_RATE
+        self.step_samples = (TRANSCRIPTION_CHUNK_SECONDS - TRANSCRIPTION_OVERLAP_SECONDS) * SAMPLE_RATE
+        self.audio = AudioRingBuffer(max(TRANSCRIPTION_BUFFER_SECONDS, 2 * TRANSCRIPTION_CHUNK_SECONDS))
+        self.ffmpeg = None
+        # Fim (em segundos do stream) do último segmento aceito e textos recentes, para descartar repetidos
+        self.committed_until = 0.0
+        self.recent_texts = deque(maxlen=5)
+        # Segmentos aceitos desde a última gravação no banco
+        self.pending_segments = []
+        self.last_poll_at = 0.0
+        self.chunks_transcribed = 0
+        self.segments_deduped = 0
+        self.skipped_seconds = 0.0
+        self.last_latency = None
         self.controversial_keywords = [
             'polêmico', 'controverso', 'escândalo', 'problema', 'briga', 'discussão',
             'vergonha', 'constrangedor', 'embaraçoso', 'ridículo', 'absurdo',
@@ -62,8 +150,11 @@ class WhisperTranscriptionService:
             return False
         
         self.is_running = True
-        self._schedule_next_transcription()
-        logger.info("Monitoramento Whisper iniciado")
+        if self.mode == 'streaming':
+            self._start_streaming()
+        else:
+            self._schedule_next_transcription()
+        logger.info(f"Monitoramento Whisper iniciado (modo {self.mode})")
         return True
     
     def stop_monitoring(self):
@@ -71,8 +162,205 @@ class WhisperTranscriptionService:
         self.is_running = False
         if self.timer:
             self.timer.cancel()
+        self._stop_ffmpeg()
+        # Acordar a thread de transcrição que aguarda áudio
+        self.audio.reset()
+        self._flush_pending_segments()
         logger.info("Monitoramento Whisper parado")
     
+    def _start_streaming(self):
+        """Iniciar leitura contínua do áudio e transcrição dos trechos"""
+        self.audio.reset()
+        self.committed_until = 0.0
+        self.recent_texts.clear()
+        self.pending_segments = []
+        threading.Thread(target=self._read_audio_loop, daemon=True).start()
+        threading.Thread(target=self._transcribe_stream_loop, daemon=True).start()
+    
+    def _stop_ffmpeg(self):
+        process, self.ffmpeg = self.ffmpeg, None
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    
+    def _read_audio_loop(self):
+        """Manter um ffmpeg lendo a live e escrevendo PCM 16 kHz no buffer (reconecta se o processo cair)"""
+        backoff = 1
+        while self.is_running:
+            try:
+                audio_url = self._resolve_audio_url()
+                if not audio_url:
+                    raise RuntimeError("URL de áudio não encontrada")
+                
+                # Sem arquivo temporário: o PCM sai pelo stdout
+                self.ffmpeg = subprocess.Popen([
+                    'ffmpeg',
+                    '-loglevel', 'error',
+                    '-i', audio_url,
+                    '-f', 's16le',
+                    '-acodec', 'pcm_s16le',
+                    '-ar', str(SAMPLE_RATE),
+                    '-ac', '1',
+                    'pipe:1'
+                ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                logger.info("Leitura contínua do áudio da live iniciada")
+                
+                leftover = b''
+                while self.is_running:
+                    data = self.ffmpeg.stdout.read(READ_BYTES)
+                    if not data:
+                        break
+                    data = leftover + data
+                    usable = len(data) - len(data) % BYTES_PER_SAMPLE
+                    leftover = data[usable:]
+                    self.audio.write(np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0)
+                    backoff = 1
+                
+                if self.is_running:
+                    logger.warning("ffmpeg encerrou a leitura da live; reconectando")
+            
+            except Exception as e:
+                logger.error(f"Erro na leitura contínua do áudio: {e}")
+            finally:
+                self._stop_ffmpeg()
+            
+            if self.is_running:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+    
+    def _transcribe_stream_loop(self):
+        """Transcrever trechos sobrepostos assim que o áudio de cada um estiver no buffer"""
+        next_start = 0
+        while self.is_running:
+            resume_at = None
+            try:
+                if not self.audio.wait_for(next_start + self.chunk_samples, timeout=1) or not self.is_running:
+                    continue
+                
+                # Atrasado além do buffer: descartar o áudio perdido e seguir do trecho mais recente
+                written = self.audio.written
+                if next_start < written - self.audio.capacity:
+                    latest_start = written - self.chunk_samples
+                    self.skipped_seconds += (latest_start - next_start) / SAMPLE_RATE
+                    logger.warning(f"Transcrição atrasada: pulando {(latest_start - next_start) / SAMPLE_RATE:.0f}s de áudio")
+                    next_start = latest_start
+                
+                samples = self.audio.read(next_start, next_start + self.chunk_samples)
+                if samples is None:
+                    continue
+                
+                # Instante em que o fim do trecho chegou ao buffer
+                ready_at = time.monotonic() - (self.audio.written - next_start - self.chunk_samples) / SAMPLE_RATE
+                resume_at = self._transcribe_chunk(samples, next_start / SAMPLE_RATE)
+                self.last_latency = time.monotonic() - ready_at
+                self.chunks_transcribed += 1
+            
+            except Exception as e:
+                logger.error(f"Erro na transcrição contínua: {e}")
+            
+            next_start = self._next_chunk_start(next_start, resume_at)
+    
+    def _next_chunk_start(self, start, resume_at):
+        """Início do próximo trecho: no segmento cortado no fim deste (para pegá-lo inteiro), no máximo um passo adiante"""
+        if resume_at is None:
+            return start + self.step_samples
+        return min(max(int(resume_at * SAMPLE_RATE), start + 1), start + self.step_samples)
+    
+    def _run_model(self, audio, **options):
+        """Rodar o Whisper em thread nativa quando o servidor usa eventlet (não trava os sockets)"""
+        try:
+            from eventlet import patcher, tpool
+            if patcher.is_monkey_patched('thread'):
+                return tpool.execute(self.model.transcribe, audio, **options)
+        except ImportError:
+            pass
+        return self.model.transcribe(audio, **options)
+    
+    def _transcribe_chunk(self, samples, offset):
+        """Transcrever um trecho e processar só os segmentos ainda não vistos; retorna onde começa o segmento cortado"""
+        result = self._run_model(samples, language='pt', condition_on_previous_text=False)
+        chunk_end = offset + len(samples) / SAMPLE_RATE
+        
+        segments = []
+        resume_at = None
+        for segment in result['segments']:
+            text = segment['text'].strip()
+            start = offset + segment['start']
+            end = offset + segment['end']
+            
+            # Cortado no fim do trecho: o próximo trecho começa nele e o transcreve inteiro
+            # (se ocupa o trecho todo, não caberia em nenhum outro e fica como está)
+            if end >= chunk_end - BOUNDARY_SECONDS and start > offset + BOUNDARY_SECONDS:
+                resume_at = start
+                break
+            
+            if self._is_duplicate(text, start, end):
+                self.segments_deduped += 1
+                continue
+            
+            self.committed_until = end
+            self.recent_texts.append(_normalize_segment(text))
+            segments.append({
+                'start': start,
+                'end': end,
+                'text': text,
+                'confidence': segment.get('avg_logprob', 0)
+            })
+        
+        if segments:
+            self._handle_stream_segments(segments)
+        return resume_at
+    
+    def _is_duplicate(self, text, start, end):
+        """Segmento da sobreposição que já veio no trecho anterior"""
+        normalized = _normalize_segment(text)
+        if not normalized:
+            return True
+        if end <= self.committed_until + 0.25:
+            return True
+        if start < self.committed_until:
+            # Mesma fala segmentada de outro jeito
+            return any(normalized in previous or previous in normalized for previous in self.recent_texts)
+        return False
+    
+    def _handle_stream_segments(self, segments):
+        """Palavras-chave, momentos polêmicos e gravação periódica dos segmentos novos"""
+        from src.services.keyword_engine import keyword_engine
+        keyword_engine.add_segments(segments)
+        
+        transcription_data = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'language': 'pt',
+            'full_text': ' '.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'duration': segments[-1]['end'] - segments[0]['start']
+        }
+        
+        controversial_moments = self._analyze_controversial_content(transcription_data)
+        if controversial_moments and time.monotonic() - self.last_poll_at >= TRANSCRIPTION_POLL_COOLDOWN_SECONDS:
+            self.last_poll_at = time.monotonic()
+            self._trigger_poll_generation(controversial_moments)
+        
+        self.pending_segments.extend(segments)
+        if self.pending_segments[-1]['end'] - self.pending_segments[0]['start'] >= TRANSCRIPTION_SAVE_SECONDS:
+            self._flush_pending_segments()
+    
+    def _flush_pending_segments(self):
+        """Gravar no banco os segmentos acumulados da transcrição contínua"""
+        segments, self.pending_segments = self.pending_segments, []
+        if not segments:
+            return
+        
+        self._save_transcription({
+            'full_text': ' '.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': 'pt',
+            'duration': segments[-1]['end'] - segments[0]['start']
+        })
+    
     def _schedule_next_transcription(self):
         """Agendar próxima transcrição"""
         if not self.is_running:
@@ -108,7 +396,7 @@ class WhisperTranscriptionService:
                 return
             
             # Transcrever com Whisper
-            result = self.model.transcribe(audio_file, language='pt')
+            result = self._run_model(audio_file, language='pt')
             
             # Processar resultado
             transcription_data = self._process_transcription(result)
@@ -116,6 +404,10 @@ class WhisperTranscriptionService:
             # Salvar transcrição
             self._save_transcription(transcription_data)
             
+            # Janela recente usada nas palavras-chave das enquetes
+            from src.services.keyword_engine import keyword_engine
+            keyword_engine.add_segments(transcription_data['segments'])
+            
             # Analisar conteúdo polêmico
             controversial_moments = self._analyze_controversial_content(transcription_data)
             
@@ -133,62 +425,61 @@ class WhisperTranscriptionService:
         except Exception as e:
             logger.error(f"Erro na transcrição: {e}")
     
+    def _resolve_audio_url(self):
+        """Obter URL do stream de áudio da live (None se não estiver ao vivo)"""
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'quiet': True,
+            'no_warnings': True
+        }
+        
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Extrair informações do stream
+            info = ydl.extract_info(self.youtube_url, download=False)
+            
+            if not info.get('is_live'):
+                logger.warning("Stream não está ao vivo")
+                return None
+            
+            # Obter URL do stream de áudio
+            for format_info in info['formats']:
+                if format_info.get('acodec') != 'none':
+                    return format_info['url']
+            
+            return None
+    
     def _capture_youtube_audio(self, duration=300):
         """Capturar áudio do YouTube"""
         try:
-            # Configurar yt-dlp para capturar stream de áudio
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': tempfile.mktemp(suffix='.%(ext)s'),
-                'extractaudio': True,
-                'audioformat': 'wav',
-                'audioquality': '192K',
-                'quiet': True,
-                'no_warnings': True
-            }
+            audio_url = self._resolve_audio_url()
+            
+            if not audio_url:
+                logger.error("URL de áudio não encontrada")
+                return None
+            
+            # Capturar segmento de áudio com ffmpeg
+            output_file = tempfile.mktemp(suffix='.wav')
+            
+            cmd = [
+                'ffmpeg',
+                '-i', audio_url,
+                '-t', str(duration),
+                '-acodec', 'pcm_s16le',
+                '-ar', '16000',
+                '-ac', '1',
+                '-y',
+                output_file
+            ]
+            
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=duration + 30)
+            
+            if result.returncode == 0 and os.path.exists(output_file):
+                logger.info(f"Áudio capturado: {output_file}")
+                return output_file
+            else:
+                logger.error(f"Erro no ffmpeg: {result.stderr}")
+                return None
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Extrair informações do stream
-                info = ydl.extract_info(self.youtube_url, download=False)
-                
-                if not info.get('is_live'):
-                    logger.warning("Stream não está ao vivo")
-                    return None
-                
-                # Obter URL do stream de áudio
-                audio_url = None
-                for format_info in info['formats']:
-                    if format_info.get('acodec') != 'none':
-                        audio_url = format_info['url']
-                        break
-                
-                if not audio_url:
-                    logger.error("URL de áudio não encontrada")
-                    return None
-                
-                # Capturar segmento de áudio com ffmpeg
-                output_file = tempfile.mktemp(suffix='.wav')
-                
-                cmd = [
-                    'ffmpeg',
-                    '-i', audio_url,
-                    '-t', str(duration),
-                    '-acodec', 'pcm_s16le',
-                    '-ar', '16000',
-                    '-ac', '1',
-                    '-y',
-                    output_file
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=duration + 30)
-                
-                if result.returncode == 0 and os.path.exists(output_file):
-                    logger.info(f"Áudio capturado: {output_file}")
-                    return output_file
-                else:
-                    logger.error(f"Erro no ffmpeg: {result.stderr}")
-                    return None
-                
         except Exception as e:
             logger.error(f"Erro ao capturar áudio: {e}")
             return None
@@ -379,7 +670,7 @@ class WhisperTranscriptionService:
             
             logger.info(f"Iniciando transcrição manual: {audio_file_path}")
             
-            result = self.model.transcribe(audio_file_path, language='pt')
+            result = self._run_model(audio_file_path, language='pt')
             transcription_data = self._process_transcription(result)
             
             if transcription_data:
@@ -395,10 +686,27 @@ class WhisperTranscriptionService:
     
     def get_status(self):
         """Obter status do serviço"""
+        if self.mode == 'streaming':
+            return {
+                'model_loaded': self.model is not None,
+                'is_running': self.is_running,
+                'youtube_url': self.youtube_url,
+                'mode': self.mode,
+                'chunk_seconds': TRANSCRIPTION_CHUNK_SECONDS,
+                'overlap_seconds': TRANSCRIPTION_OVERLAP_SECONDS,
+                'audio_seconds': round(self.audio.written / SAMPLE_RATE, 1),
+                'chunks_transcribed': self.chunks_transcribed,
+                'segments_deduped': self.segments_deduped,
+                'skipped_seconds': round(self.skipped_seconds, 1),
+                'last_latency_seconds': round(self.last_latency, 1) if self.last_latency is not None else None,
+                'last_transcription': self.last_transcription.created_at.isoformat() if self.last_transcription else None
+            }
+        
         return {
             'model_loaded': self.model is not None,
             'is_running': self.is_running,
             'youtube_url': self.youtube_url,
+            'mode': self.mode,
             'interval_minutes': self.transcription_interval // 60,
             'last_transcription': self.last_transcription.created_at.isoformat() if self.last_transcription else None,
             'next_transcription': (datetime.now() + timedelta(seconds=self.transcription_interval)).isoformat() if self.is_running else None